@@ -1,7 +1,8 @@
 import math, os, sys, copy
 import numpy as np
+import scipy.sparse
 from collections import deque
-from gurobipy import *
+from lp_solver import LinearProgram
 import UniformGroupDragonfly
 import traffic_generator.DragonflyAdversarialTrafficGenerator
 import networkx as nx
@@ -95,12 +96,17 @@ class SkewedGroupDragonfly(UniformGroupDragonfly.UniformGroupDragonfly):
         return symmetric_matrix
 
     ## designs the interblock topology, given an expected interblock traffic matrix
-    def _design_target_interblock_topology(self, expected_interblock_traffic) :
+    ## lp_backend - (optional) the lp_solver backend ("gurobi" or "highs"), defaults to Gurobi when installed
+    def _design_target_interblock_topology(self, expected_interblock_traffic, lp_backend=None) :
         interblock_topology = [0] * self.num_groups
         for i in range(self.num_groups):
             interblock_topology[i] = [0] * self.num_groups
-        ## first thing is to copy the expected interblock traffic matrix
-        interblock_tm = copy.deepcopy(expected_interblock_traffic)
+        ## first thing is to copy the expected interblock traffic matrix. A scipy.sparse one is only num_groups x num_groups,
+        ## so it is made dense
+        if scipy.sparse.issparse(expected_interblock_traffic):
+            interblock_tm = expected_interblock_traffic.toarray()
+        else:
+            interblock_tm = copy.deepcopy(expected_interblock_traffic)
         is_symmetrical = True
         for i in range(self.num_groups - 1):
             for j in range(i + 1, self.num_groups, 1):
@@ -118,42 +124,39 @@ class SkewedGroupDragonfly(UniformGroupDragonfly.UniformGroupDragonfly):
         interblock_connectivity = [None] * self.num_groups
         for src_block in range(self.num_groups):
             interblock_connectivity[src_block] = [None] * self.num_groups
-        model = Model("Designing Interblock Topology")
-        model.setParam( 'OutputFlag' , False )
+        model = LinearProgram("Designing Interblock Topology")
         num_links_per_block = self.num_switches_per_group * self.h
-        throughput = model.addVar(obj=0., vtype=GRB.CONTINUOUS, lb=0, ub=GRB.INFINITY, name="throughput")
+        ## maximizing the throughput is minimizing its negative
+        throughput = model.add_variable(lower_bound=0, upper_bound=None, obj=-1.)
         for src_block in range(self.num_groups):
             for dst_block in range(src_block + 1, self.num_groups, 1):
-                optimization_variable = model.addVar(obj=0., vtype=GRB.CONTINUOUS, lb=1, ub=num_links_per_block, name="l_{}_{}".format(src_block, dst_block))
+                optimization_variable = model.add_variable(lower_bound=1, upper_bound=num_links_per_block)
                 interblock_connectivity[src_block][dst_block] = optimization_variable
                 interblock_connectivity[dst_block][src_block] = optimization_variable
         ##
         for src_block in range(self.num_groups):
-            outgoing_links = LinExpr()
-            incoming_links = LinExpr()
+            outgoing_links = []
+            incoming_links = []
             for dst_block in range(self.num_groups):
                 if src_block != dst_block:
-                    outgoing_links += interblock_connectivity[src_block][dst_block]
-                    incoming_links += interblock_connectivity[dst_block][src_block]
-            model.addConstr(lhs=num_links_per_block, sense=GRB.GREATER_EQUAL, rhs=outgoing_links)
-            model.addConstr(lhs=num_links_per_block, sense=GRB.GREATER_EQUAL, rhs=incoming_links)
+                    outgoing_links.append(interblock_connectivity[src_block][dst_block])
+                    incoming_links.append(interblock_connectivity[dst_block][src_block])
+            model.add_constraint(outgoing_links, [1.] * len(outgoing_links), "<=", num_links_per_block)
+            model.add_constraint(incoming_links, [1.] * len(incoming_links), "<=", num_links_per_block)
 
         for src_block in range(self.num_groups):
             for dst_block in range(self.num_groups):
                 if (src_block != dst_block):
-                    throughput_constraint = LinExpr()
-                    model.addConstr(lhs=interblock_connectivity[src_block][dst_block], sense=GRB.GREATER_EQUAL, rhs=throughput*interblock_tm[src_block][dst_block])
-        model.setObjective(throughput, GRB.MAXIMIZE)
-        try:
-            model.optimize()
+                    ## throughput * interblock_tm[src_block][dst_block] <= interblock_connectivity[src_block][dst_block]
+                    model.add_constraint([throughput, interblock_connectivity[src_block][dst_block]], [interblock_tm[src_block][dst_block], -1.], "<=", 0.)
+        solution = model.solve(backend=lp_backend)
+        if solution is not None:
             for i in range(self.num_groups - 1):
                 for j in range(i + 1, self.num_groups, 1):
-                    interblock_topology[i][j] = interblock_connectivity[i][j].x
-                    interblock_topology[j][i] = interblock_connectivity[i][j].x
-        except GurobiError as e:
-            print ("Error code " + str(e. errno ) + ": " + str(e))
-        except AttributeError :
-            print ("Encountered an attribute error ")
+                    interblock_topology[i][j] = solution[interblock_connectivity[i][j]]
+                    interblock_topology[j][i] = solution[interblock_connectivity[i][j]]
+        else:
+            print ("No optimal solution found for the interblock topology")
         print("Fractional interblock connectivity is : \n{}".format(interblock_topology))
         return interblock_topology
 
@@ -196,7 +199,10 @@ class SkewedGroupDragonfly(UniformGroupDragonfly.UniformGroupDragonfly):
                     assert(False)
         return integer_adj_matrix
 
-    def design_full_topology(self, expected_interblock_traffic):
+    ## expected_interblock_traffic - the num_groups x num_groups interblock traffic matrix, dense or scipy.sparse (see
+    ##                               TrafficGenerator.compute_interblock_traffic_from_switch_traffic)
+    ## lp_backend - (optional) the lp_solver backend used to design the interblock topology
+    def design_full_topology(self, expected_interblock_traffic, lp_backend=None):
         # iterate through each group to form the full meshes first
         for group in range(self.num_groups):
             offset = group * self.num_switches_per_group
@@ -205,7 +211,7 @@ class SkewedGroupDragonfly(UniformGroupDragonfly.UniformGroupDragonfly):
 
         ## next, go and design the intergroup topology
         ## Step 2.1 : First, figure out what is the ideal interblock (symmetric) connectivity that is fractional
-        target_interblock_topology = self._design_target_interblock_topology(expected_interblock_traffic)
+        target_interblock_topology = self._design_target_interblock_topology(expected_interblock_traffic, lp_backend=lp_backend)
         ## Step 2.2 : Then, round this symmetric connectivity into integer
         actual_integer_interblock_topology = self.__round_fractional_topology_giant_switch(target_interblock_topology)
         
@@ -1,7 +1,6 @@
 import math, os, sys, copy
 import numpy as np
 from collections import deque
-from gurobipy import *
 import UniformGroupDragonfly
 import traffic_generator.DragonflyAdversarialTrafficGenerator
 import networkx as nx
@@ -1,26 +1,140 @@
 import numpy as np
-from gurobipy import *
+import scipy.sparse
 from collections import deque
 import copy
 import sys, math
+import multiprocessing
+from intrablock_topology import IntrablockTopology
+from path_table import PathTableBuilder
+from path_selection_cache import PathSelectionCache
+from min_cost_flow import solve_transportation_problem
+from split_lp_template import SplitLPTemplate
+from joint_split_lp import JointSplitLPTemplate
+from link_load_evaluator import LinkLoadEvaluator
+from routing_table import build_routing_table
+from traffic_matrix_util import as_traffic_matrix, submatrix, changed_entries, sum_columns_by_group
+
+## state of the worker processes of the path selection pool, set once per worker by _init_path_selection_worker.
+## With the fork start method the router and the block topologies are inherited from the parent, and are only read.
+_path_selection_worker_state = {}
+
+def _init_path_selection_worker(router, block_topologies):
+	_path_selection_worker_state["router"] = router
+	_path_selection_worker_state["block_topologies"] = block_topologies
+	return
+
+## task - a list of (block, local_entry_switches) to enumerate the paths of
+## Returns the PathTable (in local ids) of every entry of task, in the same order
+def _path_selection_worker(task):
+	router = _path_selection_worker_state["router"]
+	block_topologies = _path_selection_worker_state["block_topologies"]
+	local_paths = []
+	for (block, local_entry_switches) in task:
+		local_paths.append(router._local_paths_to_entry_switches(block_topologies[block], local_entry_switches))
+	return local_paths
+
+## state of the worker processes of the load balancing pool, set once per worker by _init_load_balance_worker
+_load_balance_worker_state = {}
+
+def _init_load_balance_worker(router, block_to_switches_map, distance_to_entry_switches, block_topologies=None, sigmas=None):
+	_load_balance_worker_state["router"] = router
+	_load_balance_worker_state["block_to_switches_map"] = block_to_switches_map
+	_load_balance_worker_state["distance_to_entry_switches"] = distance_to_entry_switches
+	_load_balance_worker_state["block_topologies"] = block_topologies
+	_load_balance_worker_state["sigmas"] = sigmas
+	return
+
+## task - the (src_block, dst_block, capacity, entry_switches, traffic_sent_from_each_switch) of a block pair
+## Returns the routing weights of the block pair (a list of them, one per sigma, when sweeping sigmas)
+def _load_balance_worker(task):
+	router = _load_balance_worker_state["router"]
+	(src_block, dst_block, capacity, entry_switches, traffic_sent_from_each_switch) = task
+	return router._for_each_sigma(_load_balance_worker_state["sigmas"], lambda: router._split_traffic_between_block_pair(src_block, dst_block, capacity, _load_balance_worker_state["block_to_switches_map"], entry_switches, traffic_sent_from_each_switch, _load_balance_worker_state["distance_to_entry_switches"]))
+
+## task - the (src_block, dst_blocks, entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks) of a
+##		  source block, see AdaptiveRouting._split_traffic_from_source_block
+## Returns the routing weights of the block pairs of the source block (a list of them, one per sigma, when sweeping sigmas)
+def _joint_load_balance_worker(task):
+	router = _load_balance_worker_state["router"]
+	(src_block, dst_blocks, entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks) = task
+	return router._for_each_sigma(_load_balance_worker_state["sigmas"], lambda: router._split_traffic_from_source_block(src_block, dst_blocks, _load_balance_worker_state["block_topologies"][src_block], _load_balance_worker_state["block_to_switches_map"], entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks, _load_balance_worker_state["distance_to_entry_switches"]))
 
 class AdaptiveRouting(object):
-	def __init__(self, tolerance_fairness, max_intrablock_distance=2):
+	## num_workers - the number of processes used for path selection and for solving the block pair LPs, 1 runs everything
+	##				 in the calling process
+	## max_paths_per_pair - (optional) the maximum number of paths kept from each switch to each entry switch. The shortest
+	##						paths are kept, so path selection time and memory stay bounded however dense the blocks are.
+	## cache_dir - (optional) directory of a PathSelectionCache, path selection results are then reused across runs
+	##			   for the same topology and parameters
+	## solver_threads - (optional) the number of threads of each LP solve. Defaults to the solver's own choice, or to a
+	##					single thread when num_workers > 1 so that the workers do not oversubscribe the cores.
+	## split_solver - how the traffic of a block pair is split between its entry switches : "lp" solves the LP,
+	##				  "min_cost_flow" solves the same problem as a transportation problem, without building any model
+	## lp_backend - (optional) the lp_solver backend ("gurobi" or "highs") of the LPs, defaults to Gurobi when installed
+	## reuse_lp_templates - keep the LP of every block pair (see SplitLPTemplate) across route() calls, so that routing
+	##						the same topology for another traffic matrix only patches and warm starts the LPs. Only the
+	##						LPs solved in the calling process are kept, i.e. when num_workers is 1.
+	## global_formulation - optimize all the block pairs of a source block in one LP (see JointSplitLPTemplate), which
+	##						minimizes the maximum load of the intrablock and interblock links, instead of one LP per
+	##						block pair. Each source block is still solved on its own, and over the pool if num_workers > 1.
+	def __init__(self, tolerance_fairness, max_intrablock_distance=2, num_workers=1, max_paths_per_pair=None, cache_dir=None, solver_threads=None, split_solver="lp", lp_backend=None, reuse_lp_templates=True, global_formulation=False):
 		## records the maximum number of hops we permit packets to traverse within a block
 		self.max_tolerable_intrablock_distance = max_intrablock_distance 
 		self.sigma = tolerance_fairness
+		self.num_workers = num_workers
+		self.solver_threads = solver_threads
+		if split_solver not in ("lp", "min_cost_flow"):
+			raise Exception("Unknown split solver : {}".format(split_solver))
+		self.split_solver = split_solver
+		if global_formulation and split_solver != "lp":
+			raise Exception("The global formulation is only solved as an LP")
+		self.global_formulation = global_formulation
+		self.lp_backend = lp_backend
+		self.max_paths_per_pair = max_paths_per_pair
+		self.path_selection_cache = None
+		if cache_dir is not None:
+			self.path_selection_cache = PathSelectionCache(cache_dir)
+		## intermediate results of the last route() call, used by update_topology
+		self.routing_state = None
+		## map of (src_block, dst_block) to the SplitLPTemplate of the block pair, and of src_block to the
+		## JointSplitLPTemplate of the source block
+		self.split_lp_templates = None
+		self.joint_split_lp_templates = None
+		if reuse_lp_templates:
+			self.split_lp_templates = {}
+			self.joint_split_lp_templates = {}
 		return
 
-	## generates the intrablock topology
-	## helper for _find_all_short_paths_to_entry_switches
-	def __intrablock_topol_gen(self, topology, switches_in_block):
-		intrablock_topology = {}
-		for switch in switches_in_block:
-			intrablock_topology[switch] = []
-			for neighbor in topology[switch]:
-				if neighbor in switches_in_block:
-					intrablock_topology[switch].append(neighbor)
-		return intrablock_topology
+	## generates the intrablock topology (with local switch ids and all-pairs hop distances) of every block
+	## helper for _find_all_short_paths_to_entry_switches and _find_all_distances_to_entry_switches
+	## Blocks with identical intrablock topologies (e.g. all groups of a uniform dragonfly or expander, which only differ
+	## by a switch id offset) share the same template, so their distance matrix is computed only once.
+	## templates - (optional) the map from signature to IntrablockTopology shared by the blocks, see IntrablockTopology
+	def _build_block_topologies(self, topology, block_to_switches_map, templates=None):
+		block_topologies = {}
+		if templates is None:
+			templates = {}
+		for block in block_to_switches_map.keys():
+			block_topologies[block] = IntrablockTopology(topology, block_to_switches_map[block], templates=templates)
+		return block_topologies
+
+	## Returns all (block, target_block) pairs of different blocks, ordered by block and then target_block
+	def _all_block_pairs(self, nblocks):
+		block_pairs = []
+		for block in range(nblocks):
+			for target_block in range(nblocks):
+				if target_block != block:
+					block_pairs.append((block, target_block))
+		return block_pairs
+
+	## Returns a key identifying the (block template, local entry switches) class of a block towards a target block.
+	## The paths and distances within a block only depend on this class, up to relabeling local ids to global ids.
+	def __block_equivalence_class(self, block, block_topology, local_entry_switches):
+		template_id = block_topology.get_template_id()
+		if template_id is None:
+			## not built by _build_block_topologies, so this block cannot be matched with others
+			return ("block", block, tuple(local_entry_switches))
+		return (template_id, tuple(local_entry_switches))
 
 	## Finds the entrance switches from each block to every other block in the network.
 	## Helper to _find_all_short_paths_to_entry_switches
@@ -41,31 +155,164 @@ class AdaptiveRouting(object):
 						block_to_block_entrance_switches[(src_block_id, target_block_id)].append(switch)
 		return block_to_block_entrance_switches
 
+	## Finds the entrance switches from src_block_id to target_block_id only, in the same order as __identify_entrance_switches
+	def __identify_entrance_switches_between(self, topology, switch_to_block_map, block_to_switches_map, src_block_id, target_block_id):
+		entrance_switches = []
+		for switch in block_to_switches_map[src_block_id]:
+			for neighbor in topology[switch]:
+				if switch_to_block_map[neighbor] == target_block_id:
+					entrance_switches.append(switch)
+		return entrance_switches
+
 	## given a topology adjacency list, how each switch id is mapped to a block, and
 	## the total number of blocks, form the number of paths between each switch, block pair
-	def _find_all_short_paths_to_entry_switches(self, topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches):
-		switch_to_entry_switches_paths = {} ## to return
-		## Step 1 : For every pair of blocks, identify the entrance switches
-		block_topologies = {}
-		for block in range(nblocks):
-			block_topologies[block] = self.__intrablock_topol_gen(topology, block_to_switches_map[block])
+	## Paths only traverse the intrablock topology of the source block, and are pruned with the block's hop distance matrix.
+	## The paths are enumerated once per block equivalence class (see __block_equivalence_class) and then relabeled.
+	## The paths are returned in a PathTable keyed by (switch, target_block).
+	## block_pairs - (optional) only finds the paths of the switches of block towards target_block, for every
+	##				 (block, target_block) in block_pairs. Defaults to all pairs of different blocks.
+	def _find_all_short_paths_to_entry_switches(self, topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=None, block_pairs=None):
+		switch_to_entry_switches_paths = PathTableBuilder() ## to return
+		## Step 1 : Generate the intrablock topology of every block
+		if block_topologies is None:
+			block_topologies = self._build_block_topologies(topology, block_to_switches_map)
+		if block_pairs is None:
+			block_pairs = self._all_block_pairs(nblocks)
 
-		## Step 2 : Figure out, for every switch, the path to get to each entry switches
-		for current_switch in topology.keys():
-			current_switch_block = switch_to_block_map[current_switch]
-			for target_block in range(nblocks):
-				## check if the target_block is a different block
-				if target_block == current_switch_block:
-					continue
-				## check if the current switch is an entrance switch to this target block
-				
-				paths_collection = []
-				
-				entry_switches = inter_block_entrance_switches[(current_switch_block, target_block)]
-				for entry_switch in entry_switches:
-					paths_collection += self._short_paths_to_switch(current_switch, entry_switch, topology, entry_switches, self.max_tolerable_intrablock_distance)
-				switch_to_entry_switches_paths[(current_switch, target_block)] = paths_collection
-		return switch_to_entry_switches_paths
+		## Step 2 : Find the equivalence class of every (block, target_block) pair. Each class is enumerated by the first
+		## source block it appears in, so the enumeration is sharded by source block.
+		pair_classes = {}
+		class_tasks = [] ## (equivalence_class, block, local_entry_switches) of every class, ordered by source block
+		seen_classes = set()
+		for (current_switch_block, target_block) in block_pairs:
+			block_topology = block_topologies[current_switch_block]
+			entry_switches = inter_block_entrance_switches[(current_switch_block, target_block)]
+			local_entry_switches = block_topology.to_local_ids(entry_switches)
+			equivalence_class = self.__block_equivalence_class(current_switch_block, block_topology, local_entry_switches)
+			pair_classes[(current_switch_block, target_block)] = equivalence_class
+			if equivalence_class not in seen_classes:
+				seen_classes.add(equivalence_class)
+				class_tasks.append((equivalence_class, current_switch_block, local_entry_switches))
+
+		## Step 3 : Figure out, for every switch, the path to get to each entry switches, once per class
+		local_paths_of_class = self.__enumerate_equivalence_classes(class_tasks, block_topologies)
+
+		## Step 4 : Relabel the paths of each class to the global switch ids of every block
+		for (current_switch_block, target_block) in block_pairs:
+			block_topology = block_topologies[current_switch_block]
+			relabel = np.asarray(block_topology.switches, dtype=np.int32)
+			keys = [(x, target_block) for x in block_topology.switches]
+			switch_to_entry_switches_paths.add_table(local_paths_of_class[pair_classes[(current_switch_block, target_block)]], keys=keys, relabel=relabel)
+		return switch_to_entry_switches_paths.build()
+
+	## class_tasks - a list of (equivalence_class, block, local_entry_switches)
+	## Returns a map of equivalence_class to its PathTable in local ids. The tasks of each source block are run by the same
+	## worker, over a pool of num_workers processes.
+	def __enumerate_equivalence_classes(self, class_tasks, block_topologies):
+		block_classes = {}
+		block_tasks = {}
+		for (equivalence_class, block, local_entry_switches) in class_tasks:
+			if block not in block_tasks:
+				block_classes[block] = []
+				block_tasks[block] = []
+			block_classes[block].append(equivalence_class)
+			block_tasks[block].append((block, local_entry_switches))
+		blocks = sorted(block_tasks.keys())
+		if self.num_workers > 1 and len(blocks) > 1:
+			pool = multiprocessing.Pool(processes=min(self.num_workers, len(blocks)), initializer=_init_path_selection_worker, initargs=(self, block_topologies))
+			try:
+				results = pool.map(_path_selection_worker, [block_tasks[x] for x in blocks])
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			results = []
+			for block in blocks:
+				results.append([self._local_paths_to_entry_switches(block_topologies[x[0]], x[1]) for x in block_tasks[block]])
+		local_paths_of_class = {}
+		for block_index in range(len(blocks)):
+			for (equivalence_class, local_paths) in zip(block_classes[blocks[block_index]], results[block_index]):
+				local_paths_of_class[equivalence_class] = local_paths
+		return local_paths_of_class
+
+	## Enumerates the paths from every switch of a block to the given entry switches (all in local ids).
+	## Returns a PathTable keyed by (local_switch, None).
+	def _local_paths_to_entry_switches(self, block_topology, local_entry_switches):
+		local_paths = PathTableBuilder()
+		prohibited_nodes = set(local_entry_switches)
+		## hop distance of every switch in the block towards each entry switch, used to prune the enumeration
+		distances_to_entry_switches = [block_topology.distance_matrix[:, x].tolist() for x in local_entry_switches]
+		for local_switch in range(block_topology.get_num_switches()):
+			paths_collection = []
+			for entry_index in range(len(local_entry_switches)):
+				local_entry_switch = local_entry_switches[entry_index]
+				paths_collection += self._bounded_paths_iterative(local_switch, local_entry_switch, block_topology.adjacency, prohibited_nodes, self.max_tolerable_intrablock_distance, distances_to_target=distances_to_entry_switches[entry_index], max_paths=self.max_paths_per_pair)
+			local_paths.add_paths(local_switch, None, paths_collection)
+		return local_paths.build()
+
+	## Runs a BFS backwards from entry_switch over the intrablock topology, and returns the hop distance of every switch
+	## that can reach entry_switch within maximum_hop_counts. Just like in path enumeration, the other entry switches
+	## (prohibited_nodes_for_intermediate_hops) may be the start of a path, but never an intermediate hop.
+	def _bounded_distances_to_switch(self, entry_switch, intrablock_topology, prohibited_nodes_for_intermediate_hops, maximum_hop_counts):
+		distances = {entry_switch : 0}
+		queue = deque([entry_switch])
+		while queue:
+			current_switch = queue.popleft()
+			current_distance = distances[current_switch]
+			if current_distance >= maximum_hop_counts:
+				continue
+			## paths cannot go through other entry switches, so do not expand them
+			if current_switch != entry_switch and current_switch in prohibited_nodes_for_intermediate_hops:
+				continue
+			for neighbor in intrablock_topology[current_switch]:
+				if neighbor not in distances:
+					distances[neighbor] = current_distance + 1
+					queue.append(neighbor)
+		return distances
+
+	## Distance-only counterpart of _find_all_short_paths_to_entry_switches. Instead of enumerating every path, computes the
+	## minimum intrablock hop count from every switch to each of its entry switches, which is all that load_balance needs.
+	## Like the paths, the distances are computed once per block equivalence class and then relabeled.
+	## Returns a map of (switch, target_block) to a map of entry_switch to hop count.
+	## block_pairs - (optional) same as in _find_all_short_paths_to_entry_switches
+	def _find_all_distances_to_entry_switches(self, topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=None, block_pairs=None):
+		switch_to_entry_switches_distances = {} ## to return
+		if block_topologies is None:
+			block_topologies = self._build_block_topologies(topology, block_to_switches_map)
+		if block_pairs is None:
+			block_pairs = self._all_block_pairs(nblocks)
+		local_distances_of_class = {} ## equivalence class to the distances of every local switch, in local ids
+		for (block, target_block) in block_pairs:
+			block_topology = block_topologies[block]
+			local_entry_switches = block_topology.to_local_ids(inter_block_entrance_switches[(block, target_block)])
+			equivalence_class = self.__block_equivalence_class(block, block_topology, local_entry_switches)
+			if equivalence_class not in local_distances_of_class:
+				local_distances_of_class[equivalence_class] = self.__local_distances_to_entry_switches(block_topology, local_entry_switches)
+			local_distances = local_distances_of_class[equivalence_class]
+			for local_switch in range(block_topology.get_num_switches()):
+				distances = {}
+				for local_entry_switch in local_distances[local_switch].keys():
+					distances[block_topology.switches[local_entry_switch]] = local_distances[local_switch][local_entry_switch]
+				switch_to_entry_switches_distances[(block_topology.switches[local_switch], target_block)] = distances
+		return switch_to_entry_switches_distances
+
+	## Computes the hop count from every switch of a block to the given entry switches (all in local ids).
+	## Returns a list holding, for each local switch, a map of local entry switch to hop count.
+	def __local_distances_to_entry_switches(self, block_topology, local_entry_switches):
+		local_distances = [{} for _ in range(block_topology.get_num_switches())]
+		prohibited_nodes = set(local_entry_switches)
+		for local_entry_switch in local_entry_switches:
+			distances = self._bounded_distances_to_switch(local_entry_switch, block_topology.adjacency, prohibited_nodes, self.max_tolerable_intrablock_distance)
+			for local_switch in distances.keys():
+				local_distances[local_switch][local_entry_switch] = distances[local_switch]
+		return local_distances
+
+	## Reduces the PathTable found by _find_all_short_paths_to_entry_switches to the minimum path length towards each entry switch
+	def _min_path_lengths_to_entry_switches(self, path_to_entry_switches):
+		switch_to_entry_switches_distances = {}
+		for (switch, target_block) in path_to_entry_switches.keys():
+			switch_to_entry_switches_distances[(switch, target_block)] = path_to_entry_switches.min_path_lengths(switch, target_block)
+		return switch_to_entry_switches_distances
 
 	## helper function to _short_paths_to_switch, and essentially recursively performs DFS to locate paths from source to target
 	def __dfs_recursive__(self, source, target, current_node, topology, current_hop_count, maximum_hop_counts, prohibited_nodes_for_intermediate_hops, all_paths, path):
@@ -85,15 +332,93 @@ class AdaptiveRouting(object):
 					self.__dfs_recursive__(source, target, neighbor, topology, current_hop_count + 1, maximum_hop_counts, prohibited_nodes_for_intermediate_hops, all_paths, new_path)
 		return
 
+	## Iterative counterpart of __dfs_recursive__, which yields exactly the same paths in the same order.
+	## Instead of deep-copying the path at every step, a single path list (and a membership set) is shared by every branch
+	## as the common prefix, and a stack of neighbor iterators replaces the recursion. A tuple is only materialized once
+	## the target is reached.
+	## distances_to_target (optional) - lower bound of the hop distance from every node to target, indexed by node. Branches
+	## whose remaining hop budget is smaller than the distance to the target are pruned.
+	## max_paths (optional) - only returns the max_paths shortest paths, see _k_shortest_bounded_paths
+	def _bounded_paths_iterative(self, source, target, topology, prohibited_nodes_for_intermediate_hops, maximum_hop_counts, distances_to_target=None, max_paths=None):
+		all_paths = []
+		if source == target:
+			all_paths.append((source,))
+			return all_paths
+		if maximum_hop_counts <= 0:
+			return all_paths
+		if distances_to_target is not None and distances_to_target[source] > maximum_hop_counts:
+			return all_paths
+		if max_paths is not None:
+			return self._k_shortest_bounded_paths(source, target, topology, prohibited_nodes_for_intermediate_hops, maximum_hop_counts, max_paths, distances_to_target=distances_to_target)
+		prohibited_nodes = set(prohibited_nodes_for_intermediate_hops)
+		path = [source]
+		nodes_in_path = set(path)
+		neighbor_iterators = [iter(topology[source])]
+		while neighbor_iterators:
+			neighbor = next(neighbor_iterators[-1], None)
+			if neighbor is None:
+				## all neighbors of the node at the top of the stack are exhausted, so backtrack
+				neighbor_iterators.pop()
+				nodes_in_path.discard(path.pop())
+				continue
+			if (neighbor in nodes_in_path) or (neighbor != target and neighbor in prohibited_nodes):
+				continue
+			if neighbor == target:
+				all_paths.append(tuple(path) + (target,))
+			elif len(path) < maximum_hop_counts:
+				## only descend if the neighbor still has hops left to reach the target
+				if distances_to_target is not None and len(path) + distances_to_target[neighbor] > maximum_hop_counts:
+					continue
+				path.append(neighbor)
+				nodes_in_path.add(neighbor)
+				neighbor_iterators.append(iter(topology[neighbor]))
+		return all_paths
+
+	## Returns at most max_paths of the paths found by _bounded_paths_iterative, in nondecreasing order of length.
+	## Runs the same DFS once per exact path length (1, 2, ... maximum_hop_counts hops), only keeping the paths of that
+	## length, and stops as soon as max_paths paths are found. With distances_to_target, the search for length L never
+	## descends into a node that cannot reach target within L hops, so longer paths are never explored once enough
+	## short ones are found.
+	def _k_shortest_bounded_paths(self, source, target, topology, prohibited_nodes_for_intermediate_hops, maximum_hop_counts, max_paths, distances_to_target=None):
+		all_paths = []
+		if max_paths <= 0:
+			return all_paths
+		prohibited_nodes = set(prohibited_nodes_for_intermediate_hops)
+		min_hop_count = 1
+		if distances_to_target is not None:
+			min_hop_count = max(1, distances_to_target[source])
+		for hop_count in range(min_hop_count, maximum_hop_counts + 1):
+			path = [source]
+			nodes_in_path = set(path)
+			neighbor_iterators = [iter(topology[source])]
+			while neighbor_iterators:
+				neighbor = next(neighbor_iterators[-1], None)
+				if neighbor is None:
+					neighbor_iterators.pop()
+					nodes_in_path.discard(path.pop())
+					continue
+				if (neighbor in nodes_in_path) or (neighbor != target and neighbor in prohibited_nodes):
+					continue
+				if neighbor == target:
+					## paths end as soon as they reach the target, so only the ones of exactly hop_count hops are new
+					if len(path) == hop_count:
+						all_paths.append(tuple(path) + (target,))
+						if len(all_paths) >= max_paths:
+							return all_paths
+				elif len(path) < hop_count:
+					if distances_to_target is not None and len(path) + distances_to_target[neighbor] > hop_count:
+						continue
+					path.append(neighbor)
+					nodes_in_path.add(neighbor)
+					neighbor_iterators.append(iter(topology[neighbor]))
+		return all_paths
+
 	## Returns all the short paths for source to destination. Note that the prohibited_nodes_for_intermediate_hops
 	## records the nodes which we cannot use as path of the intermediate nodes in the path to destination.
 	## In the context of this codebase, the prohibited_nodes_for_intermediate_hops includes the entry switches
+	## If source is destination, the only path is the single-switch path (source,).
 	def _short_paths_to_switch(self, source, destination, topology, prohibited_nodes_for_intermediate_hops, maximum_steps):
-		short_paths = []
-		if source == destination:
-			short_paths.append((source,))
-		self.__dfs_recursive__(source, destination, source, topology, 0, maximum_steps, prohibited_nodes_for_intermediate_hops, short_paths, [])
-		return short_paths
+		return self._bounded_paths_iterative(source, destination, topology, prohibited_nodes_for_intermediate_hops, maximum_steps, max_paths=self.max_paths_per_pair)
 
 	##
 	## src_block - the source block id
@@ -102,7 +427,7 @@ class AdaptiveRouting(object):
 	## block_to_switches_map - a map from block_id to a list of all the switch ids belonging to said block
 	## entry_switches - a collection (i.e. list) of all the entry switches from src_block to dst_block
 	## traffic_sent_from_each_switch - the amount of traffic sent from each switch in src_block to dst_block
-	## path_to_entry_switches - the paths of all switches in src_block to the entry switches
+	## distance_to_entry_switches - the minimum path length of all switches in src_block to the entry switches
 	def _split_traffic_between_block_pair(self, 
 										src_block, 
 										dst_block, 
@@ -110,64 +435,65 @@ class AdaptiveRouting(object):
 										block_to_switches_map, 
 										entry_switches, 
 										traffic_sent_from_each_switch, 
-										path_to_entry_switches):
+										distance_to_entry_switches):
 		if src_block == dst_block:
 			return None
 		if len(entry_switches) == 0:
 			assert(False)
 			raise Exception("No entry switch")
 			return None
-		model = Model("split traffic between blocks : {} - {}".format(src_block, dst_block))
-		model.setParam( 'OutputFlag', False )
-		obj_function = LinExpr()
-		omega = {}
-		for src_switch in block_to_switches_map[src_block]:
-			all_paths_to_entry_switches = path_to_entry_switches[(src_switch, dst_block)] ## all paths to ALL entry switches
-			all_paths_switch_to_entry_switch = {} ## all paths to a specific entry switch
-			for path in all_paths_to_entry_switches:
-				assert(path[0] == src_switch)
-				entry_switch = path[-1] 
-				if entry_switch not in all_paths_switch_to_entry_switch:
-					all_paths_switch_to_entry_switch[entry_switch] = []
-				all_paths_switch_to_entry_switch[entry_switch].append(path)
-			for entry_switch in all_paths_switch_to_entry_switch.keys():
-				paths_lengths = [len(x) - 1 for x in all_paths_switch_to_entry_switch[entry_switch]]
-				min_path_length_to_entry_switch = min(paths_lengths)
-				omega[(src_switch, entry_switch)] = model.addVar(obj=0., vtype=GRB.CONTINUOUS, lb=0, ub=1, name="w_{}_{}".format(src_switch, entry_switch))
-				obj_function += omega[(src_switch, entry_switch)] * traffic_sent_from_each_switch[src_switch] * min_path_length_to_entry_switch
-
-		## Programming the constraints
-		## Constraints type 1 : all routing weights have to add to 1
-		for src_switch in block_to_switches_map[src_block]:
-			weight_sum_constraint = LinExpr()
-			for entry_switch in entry_switches:
-				if entry_switch != src_switch:
-					weight_sum_constraint += omega[(src_switch, entry_switch)]
-			model.addConstr(lhs=weight_sum_constraint, sense=GRB.EQUAL, rhs=1.)
-
-		## Constraints type 2 : utilization of interblock links have to be more or less equal
-		traffic_sum_from_src_block = 0.
-		for switch in traffic_sent_from_each_switch.keys():
-			traffic_sum_from_src_block += traffic_sent_from_each_switch[switch]
-		optimal_fair_share = traffic_sum_from_src_block / float(total_capacity_between_blocks)
-		#print("traffic_sent_from_each_switch : {} - sum : {}".format(traffic_sent_from_each_switch, sum(traffic_sent_from_each_switch)))
-		#print("optimal fairshare : {} ".format(sum(traffic_sent_from_each_switch)  / float(total_capacity_between_blocks) ))
-		for entry_switch in entry_switches:
-			entry_switch_traffic_volume = LinExpr()
-			## first, add the volume from itself
-			entry_switch_traffic_volume += traffic_sent_from_each_switch[entry_switch]
-			for src_switch in block_to_switches_map[src_block]:
-				if src_switch not in entry_switches:
-					entry_switch_traffic_volume += (traffic_sent_from_each_switch[src_switch] * omega[(src_switch, entry_switch)])
-			model.addConstr(lhs=optimal_fair_share * (1. + self.sigma), sense=GRB.GREATER_EQUAL, rhs=entry_switch_traffic_volume)
+		if self.split_solver == "min_cost_flow":
+			return self._split_traffic_with_min_cost_flow(src_block, dst_block, total_capacity_between_blocks, block_to_switches_map, entry_switches, traffic_sent_from_each_switch, distance_to_entry_switches)
+		block_switches = block_to_switches_map[src_block]
+		template = None
+		if self.split_lp_templates is not None:
+			template = self.split_lp_templates.get((src_block, dst_block))
+		if template is None or not template.matches(block_switches, entry_switches, distance_to_entry_switches):
+			template = SplitLPTemplate(src_block, dst_block, block_switches, entry_switches, distance_to_entry_switches)
+			if self.split_lp_templates is not None:
+				self.split_lp_templates[(src_block, dst_block)] = template
 		
 		## The final output
-		routing_weights = {}
-		try:
-			model.setObjective(obj_function, GRB.MINIMIZE)
-			model.optimize()
-			for (src_switch, entry_switch) in omega.keys():
-				routing_weights[(src_switch, entry_switch)] = omega[(src_switch, entry_switch)].x
+		solver_threads = self.solver_threads
+		if solver_threads is None and self.num_workers > 1:
+			solver_threads = 1
+		routing_weights = template.solve(total_capacity_between_blocks, traffic_sent_from_each_switch, self.sigma, backend=self.lp_backend, threads=solver_threads, warm_start=self.split_lp_templates is not None)
+		if routing_weights is None:
+			routing_weights = {}
+			print ("No optimal solution found for the split between blocks : {} - {}".format(src_block, dst_block))
+		return self.__finalize_routing_weights(routing_weights, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch)
+
+	## Splits the traffic from src_block to all of dst_blocks at once, with the JointSplitLPTemplate of src_block.
+	## block_topology - the IntrablockTopology of src_block
+	## entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks - the entry_switches and the
+	##		traffic_sent_from_each_switch (see _split_traffic_between_block_pair) of every block of dst_blocks, in order
+	## Returns the routing weights of every block pair (src_block, dst_block), in the order of dst_blocks
+	def _split_traffic_from_source_block(self, src_block, dst_blocks, block_topology, block_to_switches_map, entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks, distance_to_entry_switches):
+		for entry_switches in entry_switches_of_dst_blocks:
+			if len(entry_switches) == 0:
+				raise Exception("No entry switch")
+		template = None
+		if self.joint_split_lp_templates is not None:
+			template = self.joint_split_lp_templates.get(src_block)
+		if template is None or not template.matches(block_topology, dst_blocks, entry_switches_of_dst_blocks, distance_to_entry_switches):
+			template = JointSplitLPTemplate(src_block, block_topology, dst_blocks, entry_switches_of_dst_blocks, distance_to_entry_switches)
+			if self.joint_split_lp_templates is not None:
+				self.joint_split_lp_templates[src_block] = template
+		solver_threads = self.solver_threads
+		if solver_threads is None and self.num_workers > 1:
+			solver_threads = 1
+		routing_weights_of_dst_blocks = template.solve(traffic_sent_from_each_switch_to_dst_blocks, self.sigma, backend=self.lp_backend, threads=solver_threads, warm_start=self.joint_split_lp_templates is not None)
+		if routing_weights_of_dst_blocks is None:
+			print ("No optimal solution found for the joint split from block : {}".format(src_block))
+			routing_weights_of_dst_blocks = [{} for _ in dst_blocks]
+		all_routing_weights = []
+		for index in range(len(dst_blocks)):
+			all_routing_weights.append(self.__finalize_routing_weights(routing_weights_of_dst_blocks[index], src_block, block_to_switches_map, entry_switches_of_dst_blocks[index], traffic_sent_from_each_switch_to_dst_blocks[index]))
+		return all_routing_weights
+
+	## Evens out the routing weights of the switches that send no traffic, or of all switches if no solution was found
+	def __finalize_routing_weights(self, routing_weights, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch):
+		if len(routing_weights.keys()) > 0:
 			## evens out the routing weights if traffic sent from each switch is zero
 			for switch_id in block_to_switches_map[src_block]:
 				if traffic_sent_from_each_switch[switch_id] <= 0:
@@ -175,20 +501,83 @@ class AdaptiveRouting(object):
 					if switch_id not in entry_switches:
 						for entry_switch in entry_switches:
 							routing_weights[(switch_id, entry_switch)] = 1./len(entry_switches)
-		except GurobiError as e:
-			print ("Error code " + str(e. errno ) + ": " + str(e))
-		except AttributeError :
-			print ("Encountered an attribute error ")
-
-		if len(routing_weights.keys()) == 0:
-			## uniformly assign weights
-			# 
-			num_entry_switches = len(entry_switches)
-			for block_switch in block_to_switches_map[src_block]:
-				for entry_switch in entry_switches:
-					routing_weights[(block_switch, entry_switch)] = 1./num_entry_switches
+		else:
+			routing_weights = self.__uniform_routing_weights(src_block, block_to_switches_map, entry_switches)
 		return routing_weights
 
+	## uniformly assign weights
+	def __uniform_routing_weights(self, src_block, block_to_switches_map, entry_switches):
+		routing_weights = {}
+		num_entry_switches = len(entry_switches)
+		for block_switch in block_to_switches_map[src_block]:
+			for entry_switch in entry_switches:
+				routing_weights[(block_switch, entry_switch)] = 1./num_entry_switches
+		return routing_weights
+
+	## Combinatorial counterpart of the LP in _split_traffic_between_block_pair, which is a transportation problem :
+	## every switch that is not an entry switch sends its traffic to the entry switches, the cost per unit of traffic is
+	## the min path length, and each entry switch can take optimal_fair_share * (1 + sigma) minus its own traffic.
+	## An entry switch listed k times (k links to dst_block) counts k times in the weight sum constraint, so it takes k
+	## units of the weight sum per unit of its capacity. Entry switches themselves are not capacity constrained, so each
+	## one just sends all of its weight to the nearest other entry switch.
+	## Returns the same routing weights as the LP (up to ties between optimal solutions).
+	def _split_traffic_with_min_cost_flow(self, src_block, dst_block, total_capacity_between_blocks, block_to_switches_map, entry_switches, traffic_sent_from_each_switch, distance_to_entry_switches):
+		routing_weights = {}
+		traffic_sum_from_src_block = 0.
+		for switch in traffic_sent_from_each_switch.keys():
+			traffic_sum_from_src_block += traffic_sent_from_each_switch[switch]
+		optimal_fair_share = traffic_sum_from_src_block / float(total_capacity_between_blocks)
+		unique_entry_switches = []
+		multiplicity = {}
+		for entry_switch in entry_switches:
+			if entry_switch not in multiplicity:
+				unique_entry_switches.append(entry_switch)
+				multiplicity[entry_switch] = 0
+			multiplicity[entry_switch] += 1
+
+		## Step 1 : the switches that are not entry switches form the sources of the transportation problem
+		sources = [x for x in block_to_switches_map[src_block] if x not in multiplicity]
+		supplies = [traffic_sent_from_each_switch[x] for x in sources]
+		capacities = [multiplicity[x] * (optimal_fair_share * (1. + self.sigma) - traffic_sent_from_each_switch[x]) for x in unique_entry_switches]
+		if min(capacities) < 0:
+			return self.__finalize_routing_weights(routing_weights, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch)
+		costs = []
+		for src_switch in sources:
+			min_path_lengths = distance_to_entry_switches[(src_switch, dst_block)]
+			costs.append([float(min_path_lengths[x]) / multiplicity[x] if x in min_path_lengths else None for x in unique_entry_switches])
+		flows = solve_transportation_problem(supplies, capacities, costs)
+		if flows is None:
+			return self.__finalize_routing_weights(routing_weights, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch)
+
+		## Step 2 : convert the flows back into routing weights
+		for source_index in range(len(sources)):
+			src_switch = sources[source_index]
+			for entry_switch in distance_to_entry_switches[(src_switch, dst_block)].keys():
+				routing_weights[(src_switch, entry_switch)] = 0.
+			if supplies[source_index] <= 0:
+				continue
+			for entry_index in range(len(unique_entry_switches)):
+				entry_switch = unique_entry_switches[entry_index]
+				if flows[source_index][entry_index] > 0:
+					routing_weights[(src_switch, entry_switch)] = flows[source_index][entry_index] / (supplies[source_index] * multiplicity[entry_switch])
+
+		## Step 3 : every entry switch sends all of its weight to the closest other entry switch
+		for src_switch in unique_entry_switches:
+			min_path_lengths = distance_to_entry_switches[(src_switch, dst_block)]
+			closest_entry_switch = None
+			for entry_switch in unique_entry_switches:
+				if entry_switch == src_switch or entry_switch not in min_path_lengths:
+					continue
+				if closest_entry_switch is None or float(min_path_lengths[entry_switch]) / multiplicity[entry_switch] < float(min_path_lengths[closest_entry_switch]) / multiplicity[closest_entry_switch]:
+					closest_entry_switch = entry_switch
+			if closest_entry_switch is None:
+				## the weight sum constraint of this entry switch cannot be met, just like an infeasible LP
+				return self.__finalize_routing_weights({}, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch)
+			for entry_switch in min_path_lengths.keys():
+				routing_weights[(src_switch, entry_switch)] = 0.
+			routing_weights[(src_switch, closest_entry_switch)] = 1. / multiplicity[closest_entry_switch]
+		return self.__finalize_routing_weights(routing_weights, src_block, block_to_switches_map, entry_switches, traffic_sent_from_each_switch)
+
 	################################################################################################################################################################
 	################################################################################################################################################################
 	'''
@@ -198,53 +587,267 @@ class AdaptiveRouting(object):
 	################################################################################################################################################################
 
 	## Selects the paths to use for 
-	def path_selection(self, topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches):
+	## If a cache_dir was given, the paths are loaded from the cache when the topology and parameters match
+	def path_selection(self, topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches, block_topologies=None):
 		nblocks = len(block_to_switches_map.keys())
-		shortest_paths = self._find_all_short_paths_to_entry_switches(topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches)
+		fingerprint = None
+		if self.path_selection_cache is not None:
+			fingerprint = self.path_selection_cache.fingerprint(topology, switch_to_block_map, ("paths", self.max_tolerable_intrablock_distance, self.max_paths_per_pair))
+			shortest_paths = self.path_selection_cache.load_path_table(fingerprint)
+			if shortest_paths is not None:
+				return shortest_paths
+		shortest_paths = self._find_all_short_paths_to_entry_switches(topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=block_topologies)
 		print("printing shortest paths : \n {}".format(shortest_paths))
+		if fingerprint is not None:
+			self.path_selection_cache.save_path_table(fingerprint, shortest_paths)
 		return shortest_paths
 
+	## Computes the minimum intrablock hop count from every switch to its entry switches, without enumerating paths
+	## Uses the cache the same way as path_selection
+	def distance_selection(self, topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches, block_topologies=None):
+		nblocks = len(block_to_switches_map.keys())
+		fingerprint = None
+		if self.path_selection_cache is not None:
+			fingerprint = self.path_selection_cache.fingerprint(topology, switch_to_block_map, ("distances", self.max_tolerable_intrablock_distance))
+			distances = self.path_selection_cache.load_distances(fingerprint)
+			if distances is not None:
+				return distances
+		distances = self._find_all_distances_to_entry_switches(topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=block_topologies)
+		if fingerprint is not None:
+			self.path_selection_cache.save_distances(fingerprint, distances)
+		return distances
+
+	## Counts the number of links from every block to every other block
+	def _interblock_connectivity(self, topology, switch_to_block_map, nblocks):
+		interblock_connectivity = np.zeros((nblocks, nblocks,)) ## records the number of links between blocks
+		switches = list(topology.keys())
+		## every link, once from each end, as flat arrays of the block ids of its two ends
+		num_neighbors = np.array([len(topology[x]) for x in switches], dtype=np.int64)
+		if num_neighbors.sum() == 0:
+			return interblock_connectivity
+		blocks = np.repeat(np.array([switch_to_block_map[x] for x in switches], dtype=np.int64), num_neighbors)
+		neighbors = np.concatenate([np.asarray(topology[x], dtype=np.int64) for x in switches if len(topology[x]) > 0])
+		neighbor_blocks = self._switch_block_ids(switch_to_block_map)[neighbors]
+		interblock = blocks != neighbor_blocks
+		np.add.at(interblock_connectivity, (blocks[interblock], neighbor_blocks[interblock]), 1)
+		return interblock_connectivity
+
+	## Returns an array mapping every switch id to its block id
+	def _switch_block_ids(self, switch_to_block_map):
+		switches = list(switch_to_block_map.keys())
+		switch_block_ids = np.zeros(max(switches) + 1, dtype=np.int64)
+		switch_block_ids[switches] = [switch_to_block_map[x] for x in switches]
+		return switch_block_ids
+
+	## Sums up the traffic sent from each switch in src_block to all switches in dst_block
+	def _traffic_sent_between_blocks(self, src_block, dst_block, block_to_switches_map, switch_to_switch_traffic_matrix):
+		traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix)
+		src_switches = block_to_switches_map[src_block]
+		traffic_sent = submatrix(traffic_matrix, src_switches, block_to_switches_map[dst_block]).sum(axis=1)
+		return dict(zip(src_switches, traffic_sent.tolist()))
+
+	## Returns the order of the switches when grouped by block, and the offset of every block in that order (see
+	## np.add.reduceat)
+	def __block_order(self, block_to_switches_map, nblocks):
+		order = np.concatenate([np.asarray(block_to_switches_map[x], dtype=np.int64) for x in range(nblocks)])
+		offsets = np.cumsum([0] + [len(block_to_switches_map[x]) for x in range(nblocks - 1)])
+		return order, offsets
+
+	## Sums up the traffic sent from each switch to every block, returns a num_switches x nblocks matrix
+	## A sparse traffic matrix is summed up over its nonzero entries only.
+	def _traffic_sent_to_each_block(self, block_to_switches_map, nblocks, switch_to_switch_traffic_matrix):
+		traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix)
+		if scipy.sparse.issparse(traffic_matrix):
+			column_blocks = np.zeros(traffic_matrix.shape[1], dtype=np.int64)
+			for block in range(nblocks):
+				column_blocks[block_to_switches_map[block]] = block
+			return sum_columns_by_group(traffic_matrix, column_blocks, nblocks)
+		order, offsets = self.__block_order(block_to_switches_map, nblocks)
+		## the columns only need to be gathered if the switches of a block are not already contiguous
+		if not np.array_equal(order, np.arange(traffic_matrix.shape[1])):
+			traffic_matrix = traffic_matrix[:, order]
+		return np.add.reduceat(traffic_matrix, offsets, axis=1)
+
+	## Sums up the traffic sent from every block to every other block, returns an nblocks x nblocks matrix
+	## traffic_sent_to_each_block - (optional) the output of _traffic_sent_to_each_block, if already computed
+	def _interblock_demand(self, block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, traffic_sent_to_each_block=None):
+		if traffic_sent_to_each_block is None:
+			traffic_sent_to_each_block = self._traffic_sent_to_each_block(block_to_switches_map, nblocks, switch_to_switch_traffic_matrix)
+		order, offsets = self.__block_order(block_to_switches_map, nblocks)
+		return np.add.reduceat(traffic_sent_to_each_block[order], offsets, axis=0)
+
 	## Runs LP to figure out how the fair share is distributed
-	def load_balance(self, topology, switch_to_block_map, block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, inter_block_entrance_switches, path_to_entry_switches):
+	## Block pairs without any traffic between them skip the LP : they just split uniformly across the entry switches,
+	## the same weights the LP falls back to.
+	## block_pairs - (optional) only computes the routing weights of these (src_block, dst_block) pairs, defaults to all pairs.
+	##				 With global_formulation, the pairs of a source block are optimized together.
+	## interblock_connectivity - (optional) the number of links between blocks, computed from topology if not given
+	## block_topologies - (optional) the IntrablockTopology of every block, used by global_formulation and computed from
+	##					  topology if not given
+	## sigmas - (optional) solves for every one of these tolerance_fairness values instead of the router's own sigma, and
+	##			returns a list of the routing weights of each. Every LP is built once, and only re-solved for each sigma.
+	def load_balance(self, topology, switch_to_block_map, block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, inter_block_entrance_switches, distance_to_entry_switches, block_pairs=None, interblock_connectivity=None, block_topologies=None, sigmas=None):
 		all_routing_weights = {}
-		#for src_block in range(nblocks - 1):
-			#for dst_block in range(src_block + 1, nblocks, 1):
-				#all_routing_weights[(src_block_dst_bloc)]
 		## first, derive the interblock connectivity
-		interblock_connectivity = np.zeros((nblocks, nblocks,)) ## records the number of links between blocks
-		for switch in switch_to_block_map.keys():
-			block = switch_to_block_map[switch]
-			for neighbor in topology[switch]:
-				neighbor_block = switch_to_block_map[neighbor]
-				if neighbor_block != block:
-					interblock_connectivity[block][neighbor_block] += 1
-					#assert(interblock_connectivity[block][neighbor_block] >= 1)
-
-		for src_block in range(nblocks - 1):
-			for dst_block in range(src_block + 1, nblocks, 1):
-				switch_to_switch_traffic_matrix1 = {}
-				switch_to_switch_traffic_matrix2 = {}
-				
-				for switch in block_to_switches_map[src_block]:
-					switch_to_switch_traffic_matrix1[switch] = 0.
-					for neighbor in block_to_switches_map[dst_block]:
-						switch_to_switch_traffic_matrix1[switch] += switch_to_switch_traffic_matrix[switch][neighbor]
-				for switch in block_to_switches_map[dst_block]:
-					switch_to_switch_traffic_matrix2[switch] = 0.
-					for neighbor in block_to_switches_map[src_block]:
-						switch_to_switch_traffic_matrix2[switch] += switch_to_switch_traffic_matrix[switch][neighbor]
-
-				capacity1 = interblock_connectivity[src_block][dst_block]
-				capacity2 = interblock_connectivity[dst_block][src_block]
-				entry_switches1 = inter_block_entrance_switches[(src_block, dst_block)]
-				entry_switches2 = inter_block_entrance_switches[(dst_block, src_block)]
-
-				all_routing_weights[(src_block, dst_block)] = self._split_traffic_between_block_pair(src_block, dst_block, capacity1, block_to_switches_map, entry_switches1, switch_to_switch_traffic_matrix1, path_to_entry_switches)
-				all_routing_weights[(dst_block, src_block)] = self._split_traffic_between_block_pair(dst_block, src_block, capacity2, block_to_switches_map, entry_switches2, switch_to_switch_traffic_matrix2, path_to_entry_switches)
+		if interblock_connectivity is None:
+			interblock_connectivity = self._interblock_connectivity(topology, switch_to_block_map, nblocks)
+		if block_pairs is None:
+			block_pairs = []
+			for src_block in range(nblocks - 1):
+				for dst_block in range(src_block + 1, nblocks, 1):
+					block_pairs.append((src_block, dst_block))
+					block_pairs.append((dst_block, src_block))
+
+		## the traffic from every switch to every block, and from every block to every block, in one pass over the traffic matrix
+		traffic_sent_to_each_block = self._traffic_sent_to_each_block(block_to_switches_map, nblocks, switch_to_switch_traffic_matrix)
+		interblock_demand = self._interblock_demand(block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, traffic_sent_to_each_block=traffic_sent_to_each_block)
+		routing_weights_of_pair = {}
+		tasks = []
+		for (src_block, dst_block) in block_pairs:
+			entry_switches = inter_block_entrance_switches[(src_block, dst_block)]
+			if src_block != dst_block and interblock_demand[src_block][dst_block] <= 0 and len(entry_switches) > 0:
+				routing_weights_of_pair[(src_block, dst_block)] = self._for_each_sigma(sigmas, lambda: self.__uniform_routing_weights(src_block, block_to_switches_map, entry_switches))
+				continue
+			src_switches = block_to_switches_map[src_block]
+			traffic_sent_from_each_switch = dict(zip(src_switches, traffic_sent_to_each_block[src_switches, dst_block].tolist()))
+			capacity = interblock_connectivity[src_block][dst_block]
+			tasks.append((src_block, dst_block, capacity, entry_switches, traffic_sent_from_each_switch))
+
+		if self.global_formulation:
+			if block_topologies is None:
+				block_topologies = self._build_block_topologies(topology, block_to_switches_map)
+			tasks, results = self.__load_balance_source_blocks(tasks, block_to_switches_map, distance_to_entry_switches, block_topologies, sigmas)
+		## the LPs of the block pairs are independent, so with num_workers > 1 they are solved over a process pool.
+		## pool.map returns the results in the order of tasks, so the routing weights do not depend on completion order.
+		elif self.num_workers > 1 and len(tasks) > 1:
+			pool = multiprocessing.Pool(processes=min(self.num_workers, len(tasks)), initializer=_init_load_balance_worker, initargs=(self, block_to_switches_map, distance_to_entry_switches, None, sigmas))
+			try:
+				results = pool.map(_load_balance_worker, tasks)
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			results = []
+			for (src_block, dst_block, capacity, entry_switches, traffic_sent_from_each_switch) in tasks:
+				results.append(self._for_each_sigma(sigmas, lambda: self._split_traffic_between_block_pair(src_block, dst_block, capacity, block_to_switches_map, entry_switches, traffic_sent_from_each_switch, distance_to_entry_switches)))
+		for (task, routing_weights) in zip(tasks, results):
+			routing_weights_of_pair[(task[0], task[1])] = routing_weights
+		if sigmas is not None:
+			return [dict([(x, routing_weights_of_pair[x][index]) for x in block_pairs]) for index in range(len(sigmas))]
+		for block_pair in block_pairs:
+			all_routing_weights[block_pair] = routing_weights_of_pair[block_pair]
 		return all_routing_weights
+
+	## Calls solve() with the router's own sigma if sigmas is None, and otherwise once with every value of sigmas,
+	## returning the list of the results. The LP templates make every call after the first only change right hand sides.
+	def _for_each_sigma(self, sigmas, solve):
+		if sigmas is None:
+			return solve()
+		sigma = self.sigma
+		results = []
+		try:
+			for x in sigmas:
+				self.sigma = x
+				results.append(solve())
+		finally:
+			self.sigma = sigma
+		return results
+
+	## Groups the block pair tasks of load_balance by source block, and solves the joint LP of every source block.
+	## Returns the tasks in the order of the results, and the routing weights of every task
+	def __load_balance_source_blocks(self, tasks, block_to_switches_map, distance_to_entry_switches, block_topologies, sigmas=None):
+		source_block_tasks = []
+		source_block_indices = {}
+		for (src_block, dst_block, capacity, entry_switches, traffic_sent_from_each_switch) in tasks:
+			if src_block == dst_block:
+				continue
+			if src_block not in source_block_indices:
+				source_block_indices[src_block] = len(source_block_tasks)
+				source_block_tasks.append((src_block, [], [], []))
+			source_block_task = source_block_tasks[source_block_indices[src_block]]
+			source_block_task[1].append(dst_block)
+			source_block_task[2].append(entry_switches)
+			source_block_task[3].append(traffic_sent_from_each_switch)
+		if self.num_workers > 1 and len(source_block_tasks) > 1:
+			pool = multiprocessing.Pool(processes=min(self.num_workers, len(source_block_tasks)), initializer=_init_load_balance_worker, initargs=(self, block_to_switches_map, distance_to_entry_switches, block_topologies, sigmas))
+			try:
+				source_block_results = pool.map(_joint_load_balance_worker, source_block_tasks)
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			source_block_results = []
+			for (src_block, dst_blocks, entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks) in source_block_tasks:
+				source_block_results.append(self._for_each_sigma(sigmas, lambda: self._split_traffic_from_source_block(src_block, dst_blocks, block_topologies[src_block], block_to_switches_map, entry_switches_of_dst_blocks, traffic_sent_from_each_switch_to_dst_blocks, distance_to_entry_switches)))
+		ordered_tasks = [(x[0], x[1]) for x in tasks if x[0] == x[1]]
+		results = [self._for_each_sigma(sigmas, lambda: None)] * len(ordered_tasks)
+		for (source_block_task, source_block_result) in zip(source_block_tasks, source_block_results):
+			for index in range(len(source_block_task[1])):
+				ordered_tasks.append((source_block_task[0], source_block_task[1][index]))
+				if sigmas is None:
+					results.append(source_block_result[index])
+				else:
+					results.append([x[index] for x in source_block_result])
+		return ordered_tasks, results
+
 	##
 	## topology - the adjacency list of the topology, NOTE: it's not adjacency matrix.
-	def route(self, topology, switch_to_block_map, switch_to_switch_traffic_matrix):
+	## distance_only - if True, skips path enumeration and feeds the BFS hop distances to the entry switches straight into the LP
+	## as_routing_table - if True, returns the routing weights as a RoutingTable (see routing_table.py) instead of a map of
+	##					  (src_block, dst_block) to a map of (switch, entry_switch) to weight
+	## The intermediate results are kept in routing_state, so that update_topology can later recompute only what changed.
+	def route(self, topology, switch_to_block_map, switch_to_switch_traffic_matrix, distance_only=False, as_routing_table=False):
+		self.routing_state = None
+		state = self.__select_paths(topology, switch_to_block_map, distance_only)
+		routing_weights = self.load_balance(topology, switch_to_block_map, state["block_to_switches_map"], state["nblocks"], switch_to_switch_traffic_matrix, state["inter_block_entrance_switches"], state["distance_to_entry_switches"], interblock_connectivity=state["interblock_connectivity"], block_topologies=state["block_topologies"])
+		state["switch_to_switch_traffic_matrix"] = switch_to_switch_traffic_matrix
+		state["traffic_matrix"] = as_traffic_matrix(switch_to_switch_traffic_matrix, copy=True)
+		## the traffic sent from each switch to each block, as last solved for by the LP of its block pair (see reroute)
+		state["solved_traffic_sent_to_each_block"] = self._traffic_sent_to_each_block(state["block_to_switches_map"], state["nblocks"], switch_to_switch_traffic_matrix)
+		state["routing_weights"] = routing_weights
+		self.routing_state = state
+		if as_routing_table:
+			return build_routing_table(routing_weights, topology, switch_to_block_map)
+		return routing_weights
+
+	## Routes the traffic once for every value of sigmas (tolerance_fairness) : the entrance switches, the path selection
+	## and every LP are only computed or built once, and the LPs are then re-solved with the right hand sides of each
+	## sigma. routing_state and the router's own sigma are left unchanged.
+	## Returns (routing_weights_of_sigmas, objective_values), where routing_weights_of_sigmas[i] are the routing weights
+	## (see route) for sigmas[i], and objective_values[i] is what the split LPs minimize summed over all block pairs, i.e.
+	## the total hop count sum_{s, e} traffic[s] * min_path_length[s][e] * w[s][e] of the traffic leaving the blocks.
+	def sweep_tolerance_fairness(self, topology, switch_to_block_map, switch_to_switch_traffic_matrix, sigmas, distance_only=False):
+		state = self.__select_paths(topology, switch_to_block_map, distance_only)
+		block_to_switches_map = state["block_to_switches_map"]
+		## the LPs are re-solved from their templates, even when the router does not keep them across route() calls
+		split_lp_templates, joint_split_lp_templates = self.split_lp_templates, self.joint_split_lp_templates
+		if split_lp_templates is None:
+			self.split_lp_templates, self.joint_split_lp_templates = {}, {}
+		try:
+			routing_weights_of_sigmas = self.load_balance(topology, switch_to_block_map, block_to_switches_map, state["nblocks"], switch_to_switch_traffic_matrix, state["inter_block_entrance_switches"], state["distance_to_entry_switches"], interblock_connectivity=state["interblock_connectivity"], block_topologies=state["block_topologies"], sigmas=sigmas)
+		finally:
+			if split_lp_templates is None:
+				self.split_lp_templates, self.joint_split_lp_templates = None, None
+		traffic_sent_to_each_block = self._traffic_sent_to_each_block(block_to_switches_map, state["nblocks"], switch_to_switch_traffic_matrix)
+		objective_values = [self._routing_objective_value(x, traffic_sent_to_each_block, state["distance_to_entry_switches"]) for x in routing_weights_of_sigmas]
+		return routing_weights_of_sigmas, objective_values
+
+	## the total hop count of the traffic leaving the blocks under routing_weights, see sweep_tolerance_fairness
+	def _routing_objective_value(self, routing_weights, traffic_sent_to_each_block, distance_to_entry_switches):
+		objective_value = 0.
+		for ((src_block, dst_block), block_pair_routing_weights) in routing_weights.items():
+			if block_pair_routing_weights is None:
+				continue
+			for ((src_switch, entry_switch), weight) in block_pair_routing_weights.items():
+				min_path_lengths = distance_to_entry_switches[(src_switch, dst_block)]
+				if weight > 0 and entry_switch in min_path_lengths:
+					objective_value += traffic_sent_to_each_block[src_switch][dst_block] * min_path_lengths[entry_switch] * weight
+		return objective_value
+
+	## The traffic independent part of route() : identifies the entrance switches, builds the intrablock topologies and
+	## selects the paths (or only the distances) to the entry switches.
+	## Returns the intermediate results, which become the routing_state once the traffic is load balanced.
+	def __select_paths(self, topology, switch_to_block_map, distance_only):
 		block_to_switches_map = {}
 		for switch in switch_to_block_map.keys():
 			block_id = switch_to_block_map[switch]
@@ -253,56 +856,199 @@ class AdaptiveRouting(object):
 			block_to_switches_map[block_id].append(switch)
 		nblocks = len(block_to_switches_map.keys())
 		inter_block_entrance_switches = self.__identify_entrance_switches(topology, switch_to_block_map, block_to_switches_map, nblocks)
-		all_paths_to_entry_switches = self.path_selection(topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches)
-		routing_weights = self.load_balance(topology, switch_to_block_map, block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, inter_block_entrance_switches, all_paths_to_entry_switches)
-		return routing_weights
+		## the intrablock topologies and their hop distance matrices are computed once per route() call
+		templates = {}
+		block_topologies = self._build_block_topologies(topology, block_to_switches_map, templates=templates)
+		if distance_only:
+			distance_to_entry_switches = self.distance_selection(topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches, block_topologies=block_topologies)
+		else:
+			all_paths_to_entry_switches = self.path_selection(topology, switch_to_block_map, block_to_switches_map, inter_block_entrance_switches, block_topologies=block_topologies)
+			distance_to_entry_switches = self._min_path_lengths_to_entry_switches(all_paths_to_entry_switches)
+		interblock_connectivity = self._interblock_connectivity(topology, switch_to_block_map, nblocks)
+		return {
+			"topology" : dict([(x, list(topology[x])) for x in topology.keys()]),
+			"switch_to_block_map" : switch_to_block_map,
+			"block_to_switches_map" : block_to_switches_map,
+			"nblocks" : nblocks,
+			"distance_only" : distance_only,
+			"templates" : templates,
+			"block_topologies" : block_topologies,
+			"inter_block_entrance_switches" : inter_block_entrance_switches,
+			"interblock_connectivity" : interblock_connectivity,
+			"distance_to_entry_switches" : distance_to_entry_switches,
+		}
 
-	def evaluate_interblock_link_utilization(topology, switch_to_block_map, routing_weights, switch_to_switch_traffic_matrix):
-		nswitches = len(switch_to_block_map.keys())
-		block_map = {}
-		for switch in switch_to_block_map.keys():
-			block_map[switch_to_block_map[switch]] = True
-		nblocks = len(block_map.keys())
-		## Step 1 : initialize the interblock link utilizations
-		interblock_traffic_load = {}
-		switch_interblock_links = {}
-		for switch in topology.keys():
-			src_block = switch_to_block_map[switch]
-			for neighbor in topology[switch]:
-				dst_block = switch_to_block_map[neighbor]
-				if dst_block != src_block:
-					interblock_traffic_load[(switch, neighbor)] = 0.
-					if (switch, dst_block) not in switch_interblock_links.keys():
-						switch_interblock_links[(switch, dst_block)] = []
-					switch_interblock_links[(switch, dst_block)].append((switch, neighbor))
-
-		## Step 2 : count the interblock traffic in each link
-		## add in the traffic load for the interpod traffic
-		for src_block in range(nblocks - 1):
-			for dst_block in range(src_block + 1, nblocks, 1):
-				## combination 1, src_block - dst_block
-				b2b_routing_weights = routing_weights[(src_block, dst_block)] ## now we get a map of routing weights
-				for (switch, entry_switch) in b2b_routing_weights.keys():
-					switch_traffic_to_dst_block = 0
-					for neighbor in topology[switch]:
-						if switch_to_block_map[neighbor] == dst_block:
-							switch_traffic_dst_block += switch_to_switch_traffic_matrix[switch][neighbor]
-					load_at_entry_switch = b2b_routing_weights[(switch, entry_switch)] * switch_traffic_dst_block
-					number_of_links = len(switch_interblock_links[(entry_switches, dst_block)])
-					for link in switch_interblock_links[(entry_switches, dst_block)]:
-						interblock_traffic_load[link] += (load_at_entry_switch / number_of_links)
-				## combination 2,  dst_block - src_block
-				b2b_routing_weights = routing_weights[(dst_block, src_block)] ## now we get a map of routing weights
-				for (switch, entry_switch) in b2b_routing_weights.keys():
-					switch_traffic_to_dst_block = 0
-					for neighbor in topology[switch]:
-						if switch_to_block_map[neighbor] == src_block:
-							switch_traffic_dst_block += switch_to_switch_traffic_matrix[switch][neighbor]
-					load_at_entry_switch = b2b_routing_weights[(switch, entry_switch)] * switch_traffic_dst_block
-					number_of_links = len(switch_interblock_links[(entry_switches, src_block)])
-					for link in switch_interblock_links[(entry_switches, src_block)]:
-						interblock_traffic_load[link] += (load_at_entry_switch / number_of_links)
-		return interblock_traffic_load
+	## Checks the link changes of update_topology against the current topology, without applying any of them, so that an
+	## invalid update leaves the routing state untouched. Raises a ValueError if a link has a switch that is not in the
+	## topology, if a removed link does not exist (counting parallel links, and the links added or removed before it), or
+	## if the update leaves two blocks without any link between them : like route(), the routing weights need entry
+	## switches between every pair of blocks.
+	def __check_link_changes(self, topology, switch_to_block_map, interblock_connectivity, added_links, removed_links):
+		num_links = {}
+		interblock_link_changes = {}
+		link_changes = [(x, 1) for x in added_links] + [(x, -1) for x in removed_links]
+		for ((switch1, switch2), change) in link_changes:
+			if switch1 not in topology or switch2 not in topology:
+				raise ValueError("link ({}, {}) has a switch that is not in the topology".format(switch1, switch2))
+			link = (min(switch1, switch2), max(switch1, switch2))
+			if link not in num_links:
+				num_links[link] = topology[link[0]].count(link[1])
+			num_links[link] += change
+			if num_links[link] < 0:
+				raise ValueError("cannot remove link ({}, {}), which is not in the topology".format(switch1, switch2))
+			block1 = switch_to_block_map[switch1]
+			block2 = switch_to_block_map[switch2]
+			if block1 != block2:
+				block_pair = (min(block1, block2), max(block1, block2))
+				interblock_link_changes[block_pair] = interblock_link_changes.get(block_pair, 0) + change
+		for (block1, block2) in sorted(interblock_link_changes.keys()):
+			if interblock_connectivity[block1][block2] + interblock_link_changes[(block1, block2)] <= 0:
+				raise ValueError("the update would disconnect block pair ({}, {}) : routing needs at least one link between every pair of blocks".format(block1, block2))
+		return
+
+	## Updates the routing weights of the last route() call after the topology is reconfigured.
+	## added_links, removed_links - lists of (switch1, switch2) links, each connecting both ways. Parallel links are
+	##								added / removed one at a time.
+	## switch_to_switch_traffic_matrix - (optional) the new traffic matrix, defaults to the traffic matrix of the last call
+	## Only the block pairs whose intrablock topology, entrance switches, interblock capacity or traffic changed get their
+	## distances to the entry switches and LPs recomputed. Returns the routing weights of all block pairs.
+	## Raises a ValueError, before anything is changed, if the update is invalid (see __check_link_changes).
+	def update_topology(self, added_links, removed_links, switch_to_switch_traffic_matrix=None):
+		state = self.routing_state
+		if state is None:
+			raise Exception("update_topology needs the state of a previous route() call")
+		topology = state["topology"]
+		switch_to_block_map = state["switch_to_block_map"]
+		block_to_switches_map = state["block_to_switches_map"]
+		nblocks = state["nblocks"]
+		block_topologies = state["block_topologies"]
+		inter_block_entrance_switches = state["inter_block_entrance_switches"]
+		interblock_connectivity = state["interblock_connectivity"]
+		self.__check_link_changes(topology, switch_to_block_map, interblock_connectivity, added_links, removed_links)
+
+		## Step 1 : apply the link changes, and record which blocks and block pairs they affect
+		changed_blocks = set()
+		changed_block_pairs = set()
+		link_changes = [(x, 1) for x in added_links] + [(x, -1) for x in removed_links]
+		for ((switch1, switch2), change) in link_changes:
+			if change > 0:
+				topology[switch1].append(switch2)
+				topology[switch2].append(switch1)
+			else:
+				topology[switch1].remove(switch2)
+				topology[switch2].remove(switch1)
+			block1 = switch_to_block_map[switch1]
+			block2 = switch_to_block_map[switch2]
+			if block1 == block2:
+				changed_blocks.add(block1)
+			else:
+				changed_block_pairs.add((block1, block2))
+				changed_block_pairs.add((block2, block1))
+				interblock_connectivity[block1][block2] += change
+				interblock_connectivity[block2][block1] += change
+
+		## Step 2 : rebuild the intrablock topologies and the entrance switches that changed
+		for block in changed_blocks:
+			block_topologies[block] = IntrablockTopology(topology, block_to_switches_map[block], templates=state["templates"])
+		for (src_block, dst_block) in changed_block_pairs:
+			entrance_switches = self.__identify_entrance_switches_between(topology, switch_to_block_map, block_to_switches_map, src_block, dst_block)
+			if len(entrance_switches) > 0:
+				inter_block_entrance_switches[(src_block, dst_block)] = entrance_switches
+			else:
+				inter_block_entrance_switches.pop((src_block, dst_block), None)
+
+		## Step 3 : recompute the distances to the entry switches of the affected block pairs
+		affected_block_pairs = set(changed_block_pairs)
+		for block in changed_blocks:
+			for target_block in range(nblocks):
+				if target_block != block:
+					affected_block_pairs.add((block, target_block))
+		affected_block_pairs = sorted(affected_block_pairs)
+		if state["distance_only"]:
+			distances = self._find_all_distances_to_entry_switches(topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=block_topologies, block_pairs=affected_block_pairs)
+		else:
+			paths = self._find_all_short_paths_to_entry_switches(topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches, block_topologies=block_topologies, block_pairs=affected_block_pairs)
+			distances = self._min_path_lengths_to_entry_switches(paths)
+		state["distance_to_entry_switches"].update(distances)
+
+		## Step 4 : find the block pairs whose traffic changed
+		lp_block_pairs = set(affected_block_pairs)
+		if switch_to_switch_traffic_matrix is not None:
+			traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix, copy=True)
+			changed_rows, changed_columns = changed_entries(traffic_matrix, state["traffic_matrix"])
+			for (src_switch, dst_switch) in zip(changed_rows.tolist(), changed_columns.tolist()):
+				src_block = switch_to_block_map[src_switch]
+				dst_block = switch_to_block_map[dst_switch]
+				if src_block != dst_block:
+					lp_block_pairs.add((src_block, dst_block))
+			state["switch_to_switch_traffic_matrix"] = switch_to_switch_traffic_matrix
+			state["traffic_matrix"] = traffic_matrix
+
+		## Step 5 : re-solve the LPs of the affected block pairs only. The joint LP of a source block covers all of its
+		## block pairs, so all of them are re-solved.
+		if self.global_formulation:
+			lp_src_blocks = set([x[0] for x in lp_block_pairs])
+			lp_block_pairs = set([x for x in state["routing_weights"].keys() if x[0] in lp_src_blocks]) | lp_block_pairs
+		routing_weights = self.load_balance(topology, switch_to_block_map, block_to_switches_map, nblocks, state["switch_to_switch_traffic_matrix"], inter_block_entrance_switches, state["distance_to_entry_switches"], block_pairs=sorted(lp_block_pairs), interblock_connectivity=interblock_connectivity, block_topologies=block_topologies)
+		self.__record_solved_traffic(routing_weights.keys(), state["traffic_matrix"])
+		state["routing_weights"].update(routing_weights)
+		return dict(state["routing_weights"])
+
+	## Updates the routing weights of the last route() call for a new estimate of the traffic matrix, re-solving only the
+	## block pairs whose traffic drifted : a block pair is re-solved when the vector of the traffic sent from each switch
+	## of src_block to dst_block moved by more than relative_threshold (in L1 norm) from the traffic its weights were last
+	## solved for. The other block pairs keep their weights, and the traffic they were solved for, so that a slow drift
+	## still triggers a re-solve once it adds up past the threshold.
+	## Returns the routing weights of all block pairs.
+	def reroute(self, switch_to_switch_traffic_matrix, relative_threshold=0.05):
+		state = self.routing_state
+		if state is None:
+			raise Exception("reroute needs the state of a previous route() call")
+		block_to_switches_map = state["block_to_switches_map"]
+		nblocks = state["nblocks"]
+		traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix, copy=True)
+		traffic_sent_to_each_block = self._traffic_sent_to_each_block(block_to_switches_map, nblocks, traffic_matrix)
+		solved_traffic_sent_to_each_block = state["solved_traffic_sent_to_each_block"]
+
+		## Step 1 : the per block pair demand deltas, relative to the traffic each block pair was solved for
+		lp_block_pairs = set()
+		for src_block in range(nblocks):
+			switches = block_to_switches_map[src_block]
+			deltas = np.abs(traffic_sent_to_each_block[switches] - solved_traffic_sent_to_each_block[switches]).sum(axis=0)
+			solved_demands = np.abs(solved_traffic_sent_to_each_block[switches]).sum(axis=0)
+			for dst_block in np.nonzero(deltas > relative_threshold * solved_demands)[0].tolist():
+				if dst_block != src_block and (src_block, dst_block) in state["routing_weights"]:
+					lp_block_pairs.add((src_block, dst_block))
+		state["switch_to_switch_traffic_matrix"] = switch_to_switch_traffic_matrix
+		state["traffic_matrix"] = traffic_matrix
+		if len(lp_block_pairs) == 0:
+			return dict(state["routing_weights"])
+		if self.global_formulation:
+			lp_src_blocks = set([x[0] for x in lp_block_pairs])
+			lp_block_pairs = set([x for x in state["routing_weights"].keys() if x[0] in lp_src_blocks])
+
+		## Step 2 : re-solve the block pairs that drifted
+		routing_weights = self.load_balance(state["topology"], state["switch_to_block_map"], block_to_switches_map, nblocks, switch_to_switch_traffic_matrix, state["inter_block_entrance_switches"], state["distance_to_entry_switches"], block_pairs=sorted(lp_block_pairs), interblock_connectivity=state["interblock_connectivity"], block_topologies=state["block_topologies"])
+		self.__record_solved_traffic(routing_weights.keys(), traffic_matrix, traffic_sent_to_each_block)
+		state["routing_weights"].update(routing_weights)
+		return dict(state["routing_weights"])
+
+	## records the traffic the given block pairs were just solved for, see reroute
+	def __record_solved_traffic(self, block_pairs, traffic_matrix, traffic_sent_to_each_block=None):
+		state = self.routing_state
+		block_to_switches_map = state["block_to_switches_map"]
+		if traffic_sent_to_each_block is None:
+			traffic_sent_to_each_block = self._traffic_sent_to_each_block(block_to_switches_map, state["nblocks"], traffic_matrix)
+		for (src_block, dst_block) in block_pairs:
+			switches = block_to_switches_map[src_block]
+			state["solved_traffic_sent_to_each_block"][switches, dst_block] = traffic_sent_to_each_block[switches, dst_block]
+		return
+
+	## Predicts the load of every directed link under routing_weights (as returned by route) and the given traffic matrix,
+	## with the fluid model of LinkLoadEvaluator. Returns the LinkLoadEvaluator.utilization_summary : the load and
+	## utilization of every link, and the max and mean utilization of the interblock and of the intrablock links.
+	def evaluate_interblock_link_utilization(self, topology, switch_to_block_map, routing_weights, switch_to_switch_traffic_matrix):
+		return LinkLoadEvaluator(topology, switch_to_block_map).evaluate(routing_weights, switch_to_switch_traffic_matrix)
 
 
 '''
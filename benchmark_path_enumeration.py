@@ -0,0 +1,98 @@
+import sys, os, time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traffic_generator'))
+import numpy as np
+from adaptive_routing import *
+import UniformGroupExpander
+import SkewedGroupExpander
+
+'''
+Compares the original recursive DFS (__dfs_recursive__) against the iterative path enumerator used by
+_short_paths_to_switch, on the expander sizes used in routing_simulator.py.
+'''
+
+## finds the entrance switches from each block to every other block (same as AdaptiveRouting)
+def find_entrance_switches(topology, switch_to_block_map):
+	entrance_switches = {}
+	for switch in topology.keys():
+		for neighbor in topology[switch]:
+			src_block = switch_to_block_map[switch]
+			dst_block = switch_to_block_map[neighbor]
+			if src_block != dst_block:
+				if (src_block, dst_block) not in entrance_switches:
+					entrance_switches[(src_block, dst_block)] = []
+				entrance_switches[(src_block, dst_block)].append(switch)
+	return entrance_switches
+
+## collects every (source, entry_switch, prohibited entry switches) query issued by path_selection
+def collect_queries(topology, switch_to_block_map, nblocks, max_sources=None):
+	entrance_switches = find_entrance_switches(topology, switch_to_block_map)
+	queries = []
+	sources = sorted(topology.keys())
+	if max_sources is not None:
+		sources = sources[:max_sources]
+	for switch in sources:
+		for target_block in range(nblocks):
+			if target_block == switch_to_block_map[switch]:
+				continue
+			entry_switches = entrance_switches[(switch_to_block_map[switch], target_block)]
+			for entry_switch in entry_switches:
+				queries.append((switch, entry_switch, entry_switches))
+	return queries
+
+def time_recursive_dfs(router, topology, queries, max_hops):
+	all_paths = []
+	start = time.time()
+	for (source, entry_switch, entry_switches) in queries:
+		paths = []
+		router.__dfs_recursive__(source, entry_switch, source, topology, 0, max_hops, entry_switches, paths, [])
+		all_paths.append(paths)
+	return time.time() - start, all_paths
+
+def time_iterative_enumerator(router, topology, queries, max_hops):
+	all_paths = []
+	start = time.time()
+	for (source, entry_switch, entry_switches) in queries:
+		all_paths.append(router._short_paths_to_switch(source, entry_switch, topology, entry_switches, max_hops))
+	return time.time() - start, all_paths
+
+def run_benchmark(name, topology, switch_to_block_map, nblocks, max_hops, max_sources=None):
+	router = AdaptiveRouting(0., max_intrablock_distance=max_hops)
+	queries = collect_queries(topology, switch_to_block_map, nblocks, max_sources=max_sources)
+	recursive_time, recursive_paths = time_recursive_dfs(router, topology, queries, max_hops)
+	iterative_time, iterative_paths = time_iterative_enumerator(router, topology, queries, max_hops)
+	assert(recursive_paths == iterative_paths)
+	num_paths = sum([len(x) for x in iterative_paths])
+	print("{} (max hops = {}) : {} queries, {} paths".format(name, max_hops, len(queries), num_paths))
+	print("\trecursive DFS : {:.3f} s".format(recursive_time))
+	print("\titerative     : {:.3f} s".format(iterative_time))
+	print("\tspeedup       : {:.2f}x".format(recursive_time / max(iterative_time, 1E-9)))
+	return recursive_time, iterative_time
+
+## same parameters as uniform_expander_simulation() in routing_simulator.py
+def uniform_expander_benchmark(max_sources=None):
+	number_links_between_each_group = 4
+	number_of_groups = 8
+	number_of_switches_per_group = (number_of_groups - 1) * number_links_between_each_group
+	num_intragroup_links_per_switch = int(0.7 * (number_of_switches_per_group - 1))
+	uniform_expander = UniformGroupExpander.UniformGroupExpander(number_of_groups, number_of_switches_per_group, number_links_between_each_group, num_intragroup_links_per_switch)
+	uniform_expander.design_full_topology()
+	return run_benchmark(uniform_expander.get_name(), uniform_expander.get_adjacency_list(), uniform_expander.get_switch_id_to_block_id_map(), number_of_groups, 2, max_sources=max_sources)
+
+## same parameters as skewed_expander_simulation() in routing_simulator.py, designed for a uniform interblock traffic matrix
+def skewed_expander_benchmark(max_sources=None):
+	number_links_between_each_group = 4
+	number_of_groups = 8
+	number_of_switches_per_group = (number_of_groups - 1) * number_links_between_each_group
+	num_intragroup_links_per_switch = int(0.7 * (number_of_switches_per_group - 1))
+	skewed_expander = SkewedGroupExpander.SkewedGroupExpander(number_of_groups, number_of_switches_per_group, number_links_between_each_group, num_intragroup_links_per_switch)
+	block_traffic_matrix = np.ones((number_of_groups, number_of_groups)) - np.identity(number_of_groups)
+	skewed_expander.design_full_topology(block_traffic_matrix)
+	return run_benchmark(skewed_expander.get_name(), skewed_expander.get_adjacency_list(), skewed_expander.get_switch_id_to_block_id_map(), number_of_groups, 3, max_sources=max_sources)
+
+if __name__ == "__main__":
+	## the recursive DFS takes very long with 3 hops, so optionally only benchmark the first few source switches
+	max_sources = None
+	if len(sys.argv) > 1:
+		max_sources = int(sys.argv[1])
+	uniform_expander_benchmark(max_sources=max_sources)
+	skewed_expander_benchmark(max_sources=max_sources)
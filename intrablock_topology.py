@@ -0,0 +1,121 @@
+import numpy as np
+from collections import deque
+
+## hop distance recorded for switch pairs that cannot reach each other within a block
+UNREACHABLE_DISTANCE = np.iinfo(np.int32).max
+
+'''
+The intrablock topology of a single block, with switches relabeled to contiguous local ids (0 ... num_switches - 1).
+Local id i corresponds to the global switch id switches[i].
+'''
+class IntrablockTopology(object):
+	## topology - the adjacency list of the whole network
+	## switches_in_block - the global ids of all switches in this block
+	## templates - (optional) a map from signature to an already built IntrablockTopology. If a block with the exact same
+	##			   local adjacency was already built, its adjacency and distance matrix are shared instead of being recomputed,
+	##			   otherwise this block is added to templates.
+	def __init__(self, topology, switches_in_block, templates=None):
+		self.switches = list(switches_in_block)
+		self.local_ids = {}
+		for local_id in range(len(self.switches)):
+			self.local_ids[self.switches[local_id]] = local_id
+		## adjacency list in local ids, only keeping the links that stay within the block (parallel links are kept)
+		self.adjacency = []
+		for switch in self.switches:
+			neighbors = []
+			for neighbor in topology[switch]:
+				if neighbor in self.local_ids:
+					neighbors.append(self.local_ids[neighbor])
+			self.adjacency.append(neighbors)
+		## two blocks with the same signature are identical up to the relabeling of local ids to global ids
+		self.signature = tuple([tuple(x) for x in self.adjacency])
+		## blocks sharing a template_id have the same signature (None if no templates were given)
+		self.template_id = None
+		if templates is not None and self.signature in templates:
+			self.adjacency = templates[self.signature].adjacency
+			self.distance_matrix = templates[self.signature].distance_matrix
+			self.template_id = templates[self.signature].template_id
+		else:
+			self.distance_matrix = self.__all_pairs_hop_distances()
+			if templates is not None:
+				self.template_id = len(templates)
+				templates[self.signature] = self
+		return
+
+	## runs a BFS from every switch, returns a num_switches x num_switches matrix of hop distances
+	def __all_pairs_hop_distances(self):
+		num_switches = len(self.switches)
+		distance_matrix = np.full((num_switches, num_switches), UNREACHABLE_DISTANCE, dtype=np.int32)
+		for source in range(num_switches):
+			distance_row = distance_matrix[source]
+			distance_row[source] = 0
+			queue = deque([source])
+			while queue:
+				current = queue.popleft()
+				for neighbor in self.adjacency[current]:
+					if distance_row[neighbor] == UNREACHABLE_DISTANCE:
+						distance_row[neighbor] = distance_row[current] + 1
+						queue.append(neighbor)
+		return distance_matrix
+
+	def get_num_switches(self):
+		return len(self.switches)
+
+	def get_signature(self):
+		return self.signature
+
+	def get_template_id(self):
+		return self.template_id
+
+	def to_local_ids(self, switches):
+		return [self.local_ids[x] for x in switches]
+
+	def to_global_path(self, local_path):
+		return tuple([self.switches[x] for x in local_path])
+
+
+## BFS towards entry_switch (a local id) over the paths whose intermediate hops are not entry switches, i.e. those with
+## is_entry_switch[x] set. Passing no entry switch at all gives the plain shortest paths.
+## Returns (distances, path_counts, next_hops), with next_hops[x] the neighbors of x on its shortest paths to entry_switch
+## and path_counts[x] the number of these shortest paths
+def shortest_paths_towards(adjacency, entry_switch, is_entry_switch):
+	num_switches = len(adjacency)
+	distances = [None] * num_switches
+	path_counts = [0.] * num_switches
+	next_hops = [[] for _ in range(num_switches)]
+	distances[entry_switch] = 0
+	path_counts[entry_switch] = 1.
+	queue = deque([entry_switch])
+	while queue:
+		current = queue.popleft()
+		## other entry switches can start a path, but cannot be an intermediate hop
+		if current != entry_switch and is_entry_switch[current]:
+			continue
+		for neighbor in set(adjacency[current]):
+			if distances[neighbor] is None:
+				distances[neighbor] = distances[current] + 1
+				queue.append(neighbor)
+			if distances[neighbor] == distances[current] + 1:
+				path_counts[neighbor] += path_counts[current]
+				next_hops[neighbor].append(current)
+	return distances, path_counts, next_hops
+
+## Returns the (link, fraction) of every directed link that carries traffic from source to entry_switch, when the
+## traffic is split evenly across all the shortest paths
+def ecmp_link_fractions(source, entry_switch, shortest_paths):
+	distances, path_counts, next_hops = shortest_paths
+	if distances[source] is None:
+		return []
+	link_fractions = []
+	frontier = {source : 1.}
+	while len(frontier) > 0:
+		next_frontier = {}
+		for switch in frontier.keys():
+			if switch == entry_switch:
+				continue
+			for next_hop in next_hops[switch]:
+				fraction = frontier[switch] * path_counts[next_hop] / path_counts[switch]
+				link_fractions.append(((switch, next_hop), fraction))
+				next_frontier[next_hop] = next_frontier.get(next_hop, 0.) + fraction
+		frontier = next_frontier
+	return link_fractions
@@ -0,0 +1,146 @@
+import numpy as np
+from lp_solver import LinearProgram
+from intrablock_topology import shortest_paths_towards, ecmp_link_fractions
+from split_lp_template import SplitLPLayout
+
+'''
+Joint counterpart of the SplitLPTemplate LPs : instead of splitting the traffic towards every destination block on its
+own, all the block pairs of one source block are optimized together, so that the traffic towards different destination
+blocks does not pile up on the same intrablock links. With w_d the weights of the split LP towards dst_block d, t_d the
+traffic sent by every switch towards d and k_d[e] the number of links from the entry switch e to d :
+	minimize	U
+	subject to	the weight sum constraints of the split LP of every d
+				sum_{s not an entry switch} t_d[s] * w_d[s][e] + t_d[e] <= U									for every d and entry switch e towards d
+				sum_d sum_{s not an entry switch, e} t_d[s] * k_d[e] * w_d[s][e] * f_d[s][e](l) <= capacity(l) * U		for every intrablock link l
+so U bounds the load of the interblock links out of src_block, counted per entry switch as in the split LP, and the
+load that the traffic leaving src_block puts on its intrablock links. U is not the maximum link load of the network :
+the intrablock links only carry the outgoing traffic here, not the traffic between two switches of src_block, nor the
+traffic from other blocks that lands in src_block and crosses its links towards the destination switch. Among the weights
+within (1 + sigma) of the minimum U, a second solve then picks those with the shortest paths, i.e. the objective of the
+split LP summed over all d.
+f_d[s][e](l) is the fraction of the traffic from s to e on the directed link l, under ECMP across the shortest paths
+from s to e that do not go through other entry switches towards d, which are the paths the distances to the entry
+switches are measured on. Every link carries one unit of capacity, the unit of the fair share of the split LP, and
+parallel links add up.
+
+Like SplitLPTemplate the LP is built once, and solve patches the traffic in place.
+'''
+class JointSplitLPTemplate(object):
+	## block_topology - the IntrablockTopology of src_block
+	## dst_blocks - the destination blocks optimized together
+	## entry_switches_of_dst_blocks - the entry switches towards each of dst_blocks, in the same order
+	def __init__(self, src_block, block_topology, dst_blocks, entry_switches_of_dst_blocks, distance_to_entry_switches):
+		self.src_block = src_block
+		self.block_topology = block_topology
+		self.block_switches = list(block_topology.switches)
+		self.dst_blocks = list(dst_blocks)
+		self.layouts = [SplitLPLayout(dst_blocks[index], self.block_switches, entry_switches_of_dst_blocks[index], distance_to_entry_switches) for index in range(len(dst_blocks))]
+		self.links, link_capacities = self.__directed_links()
+		self.model = LinearProgram("joint split of the traffic from block : {}".format(src_block))
+		self.variables = [self.model.add_variables(x.get_num_variables(), 0., 1., 0.) for x in self.layouts]
+		self.max_link_load = self.model.add_variable(0., None, 0.)
+		for index in range(len(self.layouts)):
+			self.layouts[index].add_weight_sum_constraints(self.model, self.variables[index])
+
+		## the interblock links of every entry switch, the coefficients of the weights are set by solve
+		self.interblock_constraints = []
+		for index in range(len(self.layouts)):
+			layout = self.layouts[index]
+			num_entry_switches = len(layout.unique_entry_switches)
+			rows = np.concatenate((layout.entry_indices[layout.in_capacity], np.arange(num_entry_switches)))
+			variables = np.concatenate((self.variables[index][layout.in_capacity], np.full(num_entry_switches, self.max_link_load, dtype=np.int64)))
+			self.interblock_constraints.append(self.model.add_constraints(rows, variables, np.zeros(len(rows)), "<=", np.zeros(num_entry_switches)))
+
+		## the intrablock links. Every term is the traffic of its source switch (set by solve) times a fixed coefficient
+		rows, variables, coefficients, traffic_indices = [], [], [], []
+		for index in range(len(self.layouts)):
+			link_rows, link_variables, link_coefficients = self.__intrablock_link_terms(self.layouts[index])
+			rows.append(link_rows)
+			variables.append(self.variables[index][link_variables])
+			coefficients.append(link_coefficients)
+			traffic_indices.append(self.layouts[index].variable_sources[link_variables] + index * len(self.block_switches))
+		rows.append(np.arange(len(self.links)))
+		variables.append(np.full(len(self.links), self.max_link_load, dtype=np.int64))
+		self.intrablock_coefficients = np.concatenate(coefficients)
+		self.intrablock_traffic_indices = np.concatenate(traffic_indices)
+		self.link_capacities = link_capacities
+		self.intrablock_constraints = self.model.add_constraints(np.concatenate(rows), np.concatenate(variables), np.zeros(len(self.intrablock_coefficients) + len(self.links)), "<=", np.zeros(len(self.links)))
+
+		## caps U for the second solve
+		self.max_link_load_constraint = self.model.add_constraints([0], [self.max_link_load], [1.], "<=", [0.])
+		return
+
+	## whether the LP of this template is still the LP for the given destination blocks, entry switches and distances
+	def matches(self, block_topology, dst_blocks, entry_switches_of_dst_blocks, distance_to_entry_switches):
+		if block_topology.adjacency != self.block_topology.adjacency or list(block_topology.switches) != self.block_switches or list(dst_blocks) != self.dst_blocks:
+			return False
+		for index in range(len(self.layouts)):
+			if not self.layouts[index].matches(self.block_switches, entry_switches_of_dst_blocks[index], distance_to_entry_switches):
+				return False
+		return True
+
+	## lists the directed links (local_switch, local_neighbor) of the block, and the number of parallel links of each
+	def __directed_links(self):
+		capacities = {}
+		for switch in range(len(self.block_switches)):
+			for neighbor in self.block_topology.adjacency[switch]:
+				capacities[(switch, neighbor)] = capacities.get((switch, neighbor), 0) + 1
+		links = sorted(capacities.keys())
+		return links, np.array([capacities[x] for x in links], dtype=float)
+
+	## Returns the (rows, variables, coefficients) of the load of the intrablock links, for the variables of the given
+	## layout : rows are link indices, variables index the variables of the layout, and coefficients are k_d[e] * f_d[s][e](l)
+	def __intrablock_link_terms(self, layout):
+		link_indices = dict([(self.links[x], x) for x in range(len(self.links))])
+		is_entry_switch = layout.is_entry_switch.tolist()
+		rows, variables, coefficients = [], [], []
+		capacity_variables = np.nonzero(layout.in_capacity)[0].tolist()
+		variable_sources = layout.variable_sources.tolist()
+		entry_switches = layout.variable_entry_switches.tolist()
+		ecmp_graphs = {}
+		for variable in capacity_variables:
+			entry_switch = self.block_topology.local_ids[entry_switches[variable]]
+			if entry_switch not in ecmp_graphs:
+				ecmp_graphs[entry_switch] = shortest_paths_towards(self.block_topology.adjacency, entry_switch, is_entry_switch)
+			multiplicity = layout.multiplicities[layout.entry_indices[variable]]
+			for (link, fraction) in ecmp_link_fractions(variable_sources[variable], entry_switch, ecmp_graphs[entry_switch]):
+				rows.append(link_indices[link])
+				variables.append(variable)
+				coefficients.append(multiplicity * fraction)
+		return np.array(rows, dtype=np.int64), np.array(variables, dtype=np.int64), np.array(coefficients, dtype=float)
+
+	## traffic_sent_from_each_switch_to_dst_blocks - the traffic sent from each switch to each of dst_blocks, in the same order
+	## Returns the routing weights of every destination block (see SplitLPTemplate.solve), or None if no optimal
+	## solution was found
+	def solve(self, traffic_sent_from_each_switch_to_dst_blocks, sigma, backend=None, threads=None, warm_start=False):
+		traffic = np.array([[x[switch] for switch in self.block_switches] for x in traffic_sent_from_each_switch_to_dst_blocks], dtype=float)
+		for index in range(len(self.layouts)):
+			layout = self.layouts[index]
+			coefficients = np.concatenate((traffic[index][layout.variable_sources[layout.in_capacity]], np.full(len(layout.unique_entry_switches), -1.)))
+			self.model.set_constraint_coefficients(self.interblock_constraints[index], coefficients)
+			self.model.set_constraint_rhs(self.interblock_constraints[index], -traffic[index][layout.entry_switch_positions])
+		self.model.set_constraint_coefficients(self.intrablock_constraints, np.concatenate((self.intrablock_coefficients * traffic.ravel()[self.intrablock_traffic_indices], -self.link_capacities)))
+		## no link carries more than all the traffic of the block, plus the traffic of an entry switch itself
+		self.model.set_constraint_rhs(self.max_link_load_constraint, [2. * traffic.sum() + 1.])
+
+		## Step 1 : minimize U, the bound on the link loads counted above
+		objective = np.zeros(self.model.get_num_variables())
+		objective[self.max_link_load] = 1.
+		self.model.set_objective(objective)
+		solution = self.model.solve(backend=backend, threads=threads, warm_start=warm_start)
+		if solution is None:
+			return None
+
+		## Step 2 : shortest paths, within (1 + sigma) of the minimum U
+		max_link_load = solution[self.max_link_load]
+		objective = np.zeros(self.model.get_num_variables())
+		for index in range(len(self.layouts)):
+			layout = self.layouts[index]
+			objective[self.variables[index]] = traffic[index][layout.variable_sources] * layout.variable_distances
+		self.model.set_objective(objective)
+		self.model.set_constraint_rhs(self.max_link_load_constraint, [max_link_load * (1. + sigma) + 1E-9 * max(1., max_link_load)])
+		shortest_solution = self.model.solve(backend=backend, threads=threads, warm_start=warm_start)
+		if shortest_solution is not None:
+			solution = shortest_solution
+		return [self.layouts[index].routing_weights(solution[self.variables[index]]) for index in range(len(self.layouts))]
+
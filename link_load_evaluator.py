@@ -0,0 +1,212 @@
+import numpy as np
+import scipy.sparse
+from intrablock_topology import IntrablockTopology, shortest_paths_towards, ecmp_link_fractions
+from traffic_matrix_util import as_traffic_matrix, submatrix, sum_columns_by_group
+from routing_table import RoutingTable
+
+'''
+Fluid model of the load a routing puts on every directed link of the network, to pre-screen routings without a packet
+simulation. The traffic from a switch s towards a switch d of another block goes :
+	1. from s to an entry switch e, picked with the routing weights : s sends k[e] * w[s][e] of its traffic through e,
+	   since e is listed once per each of its k[e] links to the block of d. It follows ECMP across the shortest paths
+	   from s to e that do not go through other entry switches towards that block. An entry switch sends its own
+	   traffic over its own links.
+	2. evenly over the k[e] interblock links of e to the block of d
+	3. from the switch x it lands on to d, following ECMP across the shortest paths of the block of d
+and the traffic between two switches of the same block follows ECMP across the shortest paths of the block.
+Every hop sequence with a single traffic volume is a flow class : (s, e) for the steps 1 and 2, and (x, d) for step 3
+and for the traffic within a block. incidence[c, l] is the fraction of the traffic of flow class c on the directed
+link l, so the link loads are incidence^T * demand.
+Every link carries one unit of capacity, in the unit of the traffic matrix, and parallel links add up.
+'''
+class LinkLoadEvaluator(object):
+	## topology - the adjacency list of the whole network
+	## switch_to_block_map - the block of every switch
+	def __init__(self, topology, switch_to_block_map):
+		self.topology = topology
+		self.switch_to_block_map = switch_to_block_map
+		self.num_switches = max(switch_to_block_map.keys()) + 1
+		self.nblocks = max(switch_to_block_map.values()) + 1
+		self.block_to_switches_map = {}
+		for switch in sorted(switch_to_block_map.keys()):
+			self.block_to_switches_map.setdefault(switch_to_block_map[switch], []).append(switch)
+		self.switch_block_ids = np.zeros(self.num_switches, dtype=np.int64)
+		self.switch_block_ids[list(switch_to_block_map.keys())] = list(switch_to_block_map.values())
+
+		## the directed links (switch, neighbor), and the number of parallel links of each
+		capacities = {}
+		for switch in topology.keys():
+			for neighbor in topology[switch]:
+				capacities[(switch, neighbor)] = capacities.get((switch, neighbor), 0) + 1
+		self.links = sorted(capacities.keys())
+		self.link_capacities = np.array([capacities[x] for x in self.links], dtype=float)
+		link_array = np.array(self.links, dtype=np.int64).reshape((len(self.links), 2))
+		self.link_switches = link_array[:, 0]
+		self.link_neighbors = link_array[:, 1]
+		self.is_interblock = self.switch_block_ids[self.link_switches] != self.switch_block_ids[self.link_neighbors]
+		link_indices = dict([(self.links[x], x) for x in range(len(self.links))])
+
+		## the intrablock topology of every block, and the global index of the link between every pair of local ids
+		templates = {}
+		self.block_topologies = {}
+		self.block_link_indices = {}
+		for block in self.block_to_switches_map.keys():
+			block_topology = IntrablockTopology(topology, self.block_to_switches_map[block], templates=templates)
+			self.block_topologies[block] = block_topology
+			local_link_indices = np.full((block_topology.get_num_switches(), block_topology.get_num_switches()), -1, dtype=np.int64)
+			for switch in range(block_topology.get_num_switches()):
+				for neighbor in block_topology.adjacency[switch]:
+					local_link_indices[switch, neighbor] = link_indices[(block_topology.switches[switch], block_topology.switches[neighbor])]
+			self.block_link_indices[block] = local_link_indices
+
+		## the interblock links of every switch towards every block, parallel links being listed once per link, the even
+		## split across them, and the fraction of the traffic sent over them that lands on every switch of the block
+		interblock_links = {}
+		for index in np.nonzero(self.is_interblock)[0].tolist():
+			switch, neighbor = self.links[index]
+			interblock_links.setdefault((switch, switch_to_block_map[neighbor]), []).extend([index] * capacities[(switch, neighbor)])
+		self.interblock_links = {}
+		self.interblock_link_fractions = {}
+		self.landing_fractions = {}
+		self.entry_switches = {}
+		for (switch, target_block) in sorted(interblock_links.keys()):
+			links = np.array(interblock_links[(switch, target_block)], dtype=np.int64)
+			landing_switches = [self.block_topologies[target_block].local_ids[x] for x in self.link_neighbors[links].tolist()]
+			self.interblock_links[(switch, target_block)] = links
+			self.interblock_link_fractions[(switch, target_block)] = np.full(len(links), 1. / len(links))
+			self.landing_fractions[(switch, target_block)] = np.bincount(landing_switches, minlength=len(self.block_to_switches_map[target_block])) / float(len(links))
+			self.entry_switches.setdefault((switch_to_block_map[switch], target_block), []).append(switch)
+
+		self.shortest_paths = {}
+		self.local_link_fractions = {}
+		return
+
+	def get_links(self):
+		return self.links
+
+	## Returns the (links, fractions) of the ECMP split of the traffic from source to target within block, source and
+	## target being local ids, and links the global link indices. The shortest paths do not go through the switches of
+	## prohibited_switches (local ids), unless only such paths exist.
+	def _intrablock_link_fractions(self, block, source, target, prohibited_switches=()):
+		block_topology = self.block_topologies[block]
+		## blocks sharing a template have the same local adjacency, so they share their fractions
+		key = (block_topology.get_template_id(), prohibited_switches, source, target)
+		if key not in self.local_link_fractions:
+			paths_key = (block_topology.get_template_id(), prohibited_switches, target)
+			if paths_key not in self.shortest_paths:
+				is_prohibited = [False] * block_topology.get_num_switches()
+				for switch in prohibited_switches:
+					is_prohibited[switch] = True
+				self.shortest_paths[paths_key] = shortest_paths_towards(block_topology.adjacency, target, is_prohibited)
+			link_fractions = ecmp_link_fractions(source, target, self.shortest_paths[paths_key])
+			if len(link_fractions) == 0 and source != target and len(prohibited_switches) > 0:
+				## e.g. the uniform fallback weights may pick an entry switch that is only reachable through other ones
+				return self._intrablock_link_fractions(block, source, target)
+			local_links = np.array([x[0] for x in link_fractions], dtype=np.int64).reshape((len(link_fractions), 2))
+			self.local_link_fractions[key] = (local_links[:, 0], local_links[:, 1], np.array([x[1] for x in link_fractions], dtype=float))
+		link_switches, link_neighbors, fractions = self.local_link_fractions[key]
+		return self.block_link_indices[block][link_switches, link_neighbors], fractions
+
+	## Returns the (switch, entry_switch, weight) of every routing weight of the block pair, from either a RoutingTable
+	## or a map of block pairs to maps of (switch, entry_switch) to weight
+	def __block_pair_weights(self, routing_weights, src_block, dst_block):
+		if isinstance(routing_weights, RoutingTable):
+			switches, entry_switches, weights, _ = routing_weights.block_pair_rows(src_block, dst_block)
+			return zip(switches.tolist(), entry_switches.tolist(), weights.tolist())
+		return [(x[0][0], x[0][1], x[1]) for x in routing_weights[(src_block, dst_block)].items()]
+
+	## Returns the (num_switches x nblocks) traffic sent from every switch to every block
+	def _traffic_sent_to_each_block(self, switch_to_switch_traffic_matrix):
+		return sum_columns_by_group(as_traffic_matrix(switch_to_switch_traffic_matrix), self.switch_block_ids, self.nblocks)
+
+	## Builds the flow classes of the routing given by routing_weights (see AdaptiveRouting.route) under
+	## switch_to_switch_traffic_matrix. Returns the (num_flow_classes x num_links) incidence matrix in CSR form, and the
+	## traffic of every flow class.
+	def flow_classes(self, routing_weights, switch_to_switch_traffic_matrix):
+		traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix)
+		traffic_sent_to_each_block = self._traffic_sent_to_each_block(traffic_matrix)
+		## the links and fractions of the flow classes, in segments : segment i belongs to flow class segment_classes[i]
+		segment_links, segment_fractions, segment_classes = [], [], []
+		demands = []
+
+		## the traffic from every switch to every switch of its own block. The traffic landing on the switches of a block
+		## from the other blocks is added to it, so the last hops of both are routed together.
+		intrablock_traffic = {}
+		for block in self.block_to_switches_map.keys():
+			switches = self.block_to_switches_map[block]
+			intrablock_traffic[block] = np.array(submatrix(traffic_matrix, switches, switches))
+
+		## Steps 1 and 2 : to the entry switches, and over their interblock links
+		for (src_block, dst_block) in sorted(self.entry_switches.keys()):
+			src_switches = self.block_to_switches_map[src_block]
+			traffic_sent = traffic_sent_to_each_block[src_switches, dst_block]
+			if not np.any(traffic_sent > 0.):
+				continue
+			local_ids = self.block_topologies[src_block].local_ids
+			entry_switches = self.entry_switches[(src_block, dst_block)]
+			prohibited_switches = tuple(sorted([local_ids[x] for x in entry_switches]))
+			entry_indices = dict([(entry_switches[x], x) for x in range(len(entry_switches))])
+			## the fraction of the traffic of every switch of src_block towards dst_block that goes through every entry switch
+			entry_fractions = np.zeros((len(src_switches), len(entry_switches)))
+			for entry_switch in entry_switches:
+				entry_fractions[local_ids[entry_switch], entry_indices[entry_switch]] = 1.
+			for (switch, entry_switch, weight) in self.__block_pair_weights(routing_weights, src_block, dst_block):
+				if weight > 0. and switch not in entry_indices and entry_switch in entry_indices:
+					## weight is counted once per link of the entry switch
+					entry_fractions[local_ids[switch], entry_indices[entry_switch]] = weight * len(self.interblock_links[(entry_switch, dst_block)])
+			sources, entries = np.nonzero(entry_fractions * traffic_sent[:, np.newaxis] > 0.)
+			for (source, entry) in zip(sources.tolist(), entries.tolist()):
+				entry_switch = entry_switches[entry]
+				links = self.interblock_links[(entry_switch, dst_block)]
+				if source != local_ids[entry_switch]:
+					intrablock_links, intrablock_fractions = self._intrablock_link_fractions(src_block, source, local_ids[entry_switch], prohibited_switches)
+					segment_links.append(intrablock_links)
+					segment_fractions.append(intrablock_fractions)
+					segment_classes.append(len(demands))
+				segment_links.append(links)
+				segment_fractions.append(self.interblock_link_fractions[(entry_switch, dst_block)])
+				segment_classes.append(len(demands))
+				demands.append(traffic_sent[source] * entry_fractions[source, entry])
+			landing_fractions = entry_fractions.dot(np.array([self.landing_fractions[(x, dst_block)] for x in entry_switches]))
+			intrablock_traffic[dst_block] += landing_fractions.T.dot(submatrix(traffic_matrix, src_switches, self.block_to_switches_map[dst_block]))
+
+		## Step 3, and the traffic within every block
+		for block in sorted(self.block_to_switches_map.keys()):
+			block_traffic = intrablock_traffic[block]
+			np.fill_diagonal(block_traffic, 0.)
+			sources, targets = np.nonzero(block_traffic > 0.)
+			for (source, target) in zip(sources.tolist(), targets.tolist()):
+				links, fractions = self._intrablock_link_fractions(block, source, target)
+				segment_links.append(links)
+				segment_fractions.append(fractions)
+				segment_classes.append(len(demands))
+				demands.append(block_traffic[source, target])
+
+		rows = np.repeat(np.array(segment_classes, dtype=np.int64), [len(x) for x in segment_links])
+		if len(segment_links) > 0:
+			columns, data = np.concatenate(segment_links), np.concatenate(segment_fractions)
+		else:
+			columns, data = np.zeros(0, dtype=np.int64), np.zeros(0)
+		incidence = scipy.sparse.csr_matrix((data, (rows, columns)), shape=(len(demands), len(self.links)))
+		return incidence, np.array(demands, dtype=float)
+
+	## Returns the load of every link (in the order of get_links) given by the flow classes
+	def link_loads(self, incidence, demands):
+		return incidence.T.dot(demands)
+
+	## Summarizes link_loads : the load and utilization of every link (in the order of get_links), and the max and mean
+	## utilization of all the links, of the interblock links and of the intrablock links
+	def utilization_summary(self, link_loads):
+		link_utilizations = link_loads / self.link_capacities
+		summary = {"links" : self.links, "link_loads" : link_loads, "link_capacities" : self.link_capacities,
+				"link_utilizations" : link_utilizations, "is_interblock" : self.is_interblock}
+		for (name, mask) in [("", np.ones(len(self.links), dtype=bool)), ("interblock_", self.is_interblock), ("intrablock_", ~self.is_interblock)]:
+			utilizations = link_utilizations[mask]
+			summary["max_{}utilization".format(name)] = float(utilizations.max()) if len(utilizations) > 0 else 0.
+			summary["mean_{}utilization".format(name)] = float(utilizations.mean()) if len(utilizations) > 0 else 0.
+		return summary
+
+	## Returns the utilization_summary of the routing given by routing_weights under switch_to_switch_traffic_matrix
+	def evaluate(self, routing_weights, switch_to_switch_traffic_matrix):
+		incidence, demands = self.flow_classes(routing_weights, switch_to_switch_traffic_matrix)
+		return self.utilization_summary(self.link_loads(incidence, demands))
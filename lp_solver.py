@@ -0,0 +1,231 @@
+import numpy as np
+import scipy.sparse
+
+## gurobipy is optional, only the machines with a Gurobi licence can use the "gurobi" backend
+try:
+	import gurobipy
+except ImportError:
+	gurobipy = None
+
+LP_BACKENDS = ["gurobi", "highs"]
+
+## the backend used when none is given : Gurobi if it is installed, SciPy's HiGHS otherwise
+def default_lp_backend():
+	if gurobipy is not None:
+		return "gurobi"
+	return "highs"
+
+'''
+A linear program in matrix form, that can be solved by any of the LP_BACKENDS:
+	minimize	objective^T x
+	subject to	A_ub x <= b_ub
+				A_eq x == b_eq
+				lower_bounds <= x <= upper_bounds
+Variables and constraints are added in blocks of numpy arrays, and the constraint matrices are kept as sparse
+(row, column, coefficient) triplets. Repeated triplets are summed up, just like adding the same variable twice to a
+gurobipy LinExpr.
+The objective, and the coefficients and right hand sides of a block of constraints, can be changed in place after the
+program was built, so the same program can be re-solved for new data. With warm_start, the gurobi backend keeps its
+model between solves and only pushes the changes, so that it re-optimizes from the previous basis.
+'''
+class LinearProgram(object):
+	def __init__(self, name=""):
+		self.name = name
+		self.num_variables = 0
+		## (lower_bounds, upper_bounds, objective) arrays of every block of variables
+		self.variable_blocks = []
+		## (rows, columns, coefficients, rhs) arrays of every block of constraints, for the <= rows and for the == rows
+		self.ub_blocks = []
+		self.eq_blocks = []
+		self.num_ub_rows = 0
+		self.num_eq_rows = 0
+		## the gurobi model kept between warm started solves
+		self.gurobi_state = None
+		return
+
+	## the backend model cannot be pickled (e.g. to be sent to a worker process), it is simply rebuilt on the next solve
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state["gurobi_state"] = None
+		return state
+
+	def get_num_variables(self):
+		return self.num_variables
+
+	## adds count variables with lower_bounds <= x <= upper_bounds (None means unbounded) and objective coefficients
+	## objective. Each of them is either a scalar or an array of length count. Returns the indices of the new variables.
+	def add_variables(self, count, lower_bounds=0., upper_bounds=None, objective=0.):
+		if lower_bounds is None:
+			lower_bounds = -np.inf
+		if upper_bounds is None:
+			upper_bounds = np.inf
+		self.variable_blocks.append((np.broadcast_to(np.asarray(lower_bounds, dtype=float), (count,)),
+									np.broadcast_to(np.asarray(upper_bounds, dtype=float), (count,)),
+									np.broadcast_to(np.asarray(objective, dtype=float), (count,))))
+		self.num_variables += count
+		return np.arange(self.num_variables - count, self.num_variables)
+
+	## adds a single variable, returns its index
+	def add_variable(self, lower_bound=0., upper_bound=None, obj=0.):
+		return int(self.add_variables(1, lower_bound, upper_bound, obj)[0])
+
+	## adds the constraints sum_{i : rows[i] == r} coefficients[i] * x[variables[i]] <sense> rhs[r] for every r, where sense
+	## is one of "<=", ">=", "==" and rows are numbered from 0 to len(rhs) - 1.
+	## Returns a handle to the block of constraints, for set_constraint_coefficients and set_constraint_rhs.
+	def add_constraints(self, rows, variables, coefficients, sense, rhs):
+		rows = np.asarray(rows, dtype=np.int64)
+		variables = np.asarray(variables, dtype=np.int64)
+		coefficients = np.array(coefficients, dtype=float)
+		rhs = np.array(rhs, dtype=float)
+		if sense == "<=":
+			self.ub_blocks.append([rows + self.num_ub_rows, variables, coefficients, rhs])
+			self.num_ub_rows += len(rhs)
+			return (self.ub_blocks, len(self.ub_blocks) - 1, 1.)
+		elif sense == ">=":
+			self.ub_blocks.append([rows + self.num_ub_rows, variables, -coefficients, -rhs])
+			self.num_ub_rows += len(rhs)
+			return (self.ub_blocks, len(self.ub_blocks) - 1, -1.)
+		elif sense == "==":
+			self.eq_blocks.append([rows + self.num_eq_rows, variables, coefficients, rhs])
+			self.num_eq_rows += len(rhs)
+			return (self.eq_blocks, len(self.eq_blocks) - 1, 1.)
+		raise Exception("Unknown constraint sense : {}".format(sense))
+
+	## adds the single constraint sum_i coefficients[i] * x[variables[i]] <sense> rhs
+	def add_constraint(self, variables, coefficients, sense, rhs):
+		self.add_constraints(np.zeros(len(variables), dtype=np.int64), variables, coefficients, sense, [rhs])
+		return
+
+	## replaces the coefficients of a block of constraints, given in the same order as when the block was added
+	def set_constraint_coefficients(self, constraints, coefficients):
+		blocks, index, sign = constraints
+		blocks[index][2] = sign * np.asarray(coefficients, dtype=float)
+		return
+
+	## replaces the right hand sides of a block of constraints
+	def set_constraint_rhs(self, constraints, rhs):
+		blocks, index, sign = constraints
+		blocks[index][3] = sign * np.asarray(rhs, dtype=float)
+		return
+
+	## replaces the objective coefficients of all the variables
+	def set_objective(self, objective):
+		lower_bounds, upper_bounds, _ = self.get_variable_arrays()
+		self.variable_blocks = [(lower_bounds, upper_bounds, np.asarray(objective, dtype=float))]
+		return
+
+	## returns the (lower_bounds, upper_bounds, objective) arrays of all variables
+	def get_variable_arrays(self):
+		if len(self.variable_blocks) == 0:
+			return np.zeros(0), np.zeros(0), np.zeros(0)
+		return tuple([np.concatenate([x[index] for x in self.variable_blocks]) for index in range(3)])
+
+	def __assemble(self, blocks, num_rows):
+		if num_rows == 0:
+			return None, None
+		rows = np.concatenate([x[0] for x in blocks])
+		columns = np.concatenate([x[1] for x in blocks])
+		coefficients = np.concatenate([x[2] for x in blocks])
+		rhs = np.concatenate([x[3] for x in blocks])
+		return scipy.sparse.coo_matrix((coefficients, (rows, columns)), shape=(num_rows, self.num_variables)).tocsr(), rhs
+
+	## returns the (A_ub, b_ub, A_eq, b_eq) of the program, with A_ub and A_eq in CSR form (or None if there are no rows)
+	def get_constraint_matrices(self):
+		A_ub, b_ub = self.__assemble(self.ub_blocks, self.num_ub_rows)
+		A_eq, b_eq = self.__assemble(self.eq_blocks, self.num_eq_rows)
+		return A_ub, b_ub, A_eq, b_eq
+
+	## backend - one of LP_BACKENDS, defaults to default_lp_backend()
+	## threads - (optional) the number of threads the solver may use
+	## warm_start - keep the solver's model after solving, to warm start the next solve of this program
+	## Returns the optimal x as a numpy array, or None if no optimal solution was found (e.g. the program is infeasible)
+	def solve(self, backend=None, threads=None, warm_start=False):
+		if backend is None:
+			backend = default_lp_backend()
+		A_ub, b_ub, A_eq, b_eq = self.get_constraint_matrices()
+		if backend == "gurobi":
+			if warm_start:
+				return self.__solve_gurobi_warm_started(A_ub, b_ub, A_eq, b_eq, threads)
+			return self.__solve_gurobi(A_ub, b_ub, A_eq, b_eq, threads)
+		elif backend == "highs":
+			return self.__solve_highs(A_ub, b_ub, A_eq, b_eq, threads)
+		raise Exception("Unknown LP backend : {}".format(backend))
+
+	def __build_gurobi_model(self, A_ub, b_ub, A_eq, b_eq, threads):
+		if gurobipy is None:
+			raise Exception("The gurobi LP backend needs gurobipy")
+		lower_bounds, upper_bounds, objective = self.get_variable_arrays()
+		model = gurobipy.Model(self.name)
+		model.setParam( 'OutputFlag', False )
+		if threads is not None:
+			model.setParam( 'Threads', threads )
+		lower_bounds = np.maximum(lower_bounds, -gurobipy.GRB.INFINITY)
+		upper_bounds = np.minimum(upper_bounds, gurobipy.GRB.INFINITY)
+		x = model.addMVar(self.num_variables, lb=lower_bounds, ub=upper_bounds, obj=objective, vtype=gurobipy.GRB.CONTINUOUS)
+		ub_constraints, eq_constraints = None, None
+		if A_ub is not None:
+			ub_constraints = model.addMConstr(A_ub, x, gurobipy.GRB.LESS_EQUAL, b_ub)
+		if A_eq is not None:
+			eq_constraints = model.addMConstr(A_eq, x, gurobipy.GRB.EQUAL, b_eq)
+		return model, x, ub_constraints, eq_constraints
+
+	def __solve_gurobi(self, A_ub, b_ub, A_eq, b_eq, threads):
+		model, x, _, _ = self.__build_gurobi_model(A_ub, b_ub, A_eq, b_eq, threads)
+		return self.__optimize_gurobi_model(model, x)
+
+	## Re-uses the model of the previous solve if the program still has the same shape and sparsity, pushing only the
+	## objective, the right hand sides and the coefficients that changed. Gurobi then starts from the previous basis.
+	def __solve_gurobi_warm_started(self, A_ub, b_ub, A_eq, b_eq, threads):
+		state = self.gurobi_state
+		if state is None or not self.__same_sparsity(state["A_ub"], A_ub) or not self.__same_sparsity(state["A_eq"], A_eq):
+			model, x, ub_constraints, eq_constraints = self.__build_gurobi_model(A_ub, b_ub, A_eq, b_eq, threads)
+			state = {"model" : model, "x" : x, "variables" : x.tolist(), "A_ub" : A_ub, "A_eq" : A_eq,
+					"ub_constraints" : ub_constraints, "eq_constraints" : eq_constraints}
+			self.gurobi_state = state
+		else:
+			_, _, objective = self.get_variable_arrays()
+			state["x"].setAttr("Obj", objective)
+			state["A_ub"] = self.__update_gurobi_constraints(state["model"], state["variables"], state["ub_constraints"], state["A_ub"], A_ub, b_ub)
+			state["A_eq"] = self.__update_gurobi_constraints(state["model"], state["variables"], state["eq_constraints"], state["A_eq"], A_eq, b_eq)
+		return self.__optimize_gurobi_model(state["model"], state["x"])
+
+	def __same_sparsity(self, previous_matrix, matrix):
+		if previous_matrix is None or matrix is None:
+			return previous_matrix is None and matrix is None
+		return previous_matrix.shape == matrix.shape and np.array_equal(previous_matrix.indptr, matrix.indptr) and np.array_equal(previous_matrix.indices, matrix.indices)
+
+	def __update_gurobi_constraints(self, model, variables, constraints, previous_matrix, matrix, rhs):
+		if matrix is None:
+			return matrix
+		constraints.setAttr("RHS", rhs)
+		changed = np.nonzero(previous_matrix.data != matrix.data)[0]
+		if len(changed) > 0:
+			constraint_list = constraints.tolist()
+			rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))[changed].tolist()
+			columns = matrix.indices[changed].tolist()
+			values = matrix.data[changed].tolist()
+			for index in range(len(changed)):
+				model.chgCoeff(constraint_list[rows[index]], variables[columns[index]], values[index])
+		return matrix
+
+	def __optimize_gurobi_model(self, model, x):
+		try:
+			model.optimize()
+		except gurobipy.GurobiError as e:
+			print ("Error code " + str(e. errno ) + ": " + str(e))
+			return None
+		if model.Status != gurobipy.GRB.OPTIMAL:
+			return None
+		return np.array(x.X)
+
+	## HiGHS' simplex runs on a single thread, so threads is ignored. SciPy cannot warm start HiGHS, so every solve starts
+	## from scratch (a re-solved program still saves rebuilding its constraints).
+	def __solve_highs(self, A_ub, b_ub, A_eq, b_eq, threads):
+		## imported here since only recent SciPy versions ship HiGHS
+		from scipy.optimize import linprog
+		lower_bounds, upper_bounds, objective = self.get_variable_arrays()
+		bounds = np.column_stack((lower_bounds, upper_bounds))
+		result = linprog(objective, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method="highs")
+		if result.status != 0:
+			return None
+		return np.array(result.x)
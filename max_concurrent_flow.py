@@ -0,0 +1,154 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+from lp_solver import LinearProgram
+
+'''
+The maximum concurrent flow of a network under a traffic matrix : the largest throughput such that throughput times
+the traffic matrix can be routed without exceeding the capacity of any link, with any routing (multi-commodity flow).
+It upper bounds the throughput of every routing scheme, so it is the reference to normalize simulated throughputs against.
+Every directed link carries one unit of capacity, and parallel links add up.
+The commodities are aggregated per source switch : the flow of source s is a single flow from s to all the switches
+it sends traffic to, which is equivalent since flows with the same source can always be decomposed into paths.
+	solve_exact			- the LP over the per source flows, with num_sources x num_links variables
+	solve_approximate	- Garg-Koenemann style multiplicative weights for the fabrics where the LP is too large. Every
+						  round routes the traffic of every source along its shortest path tree under the link lengths,
+						  and grows the lengths of the links by their congestion. It returns a lower bound (a feasible
+						  flow) and an upper bound (the LP duality bound of the link lengths) of the throughput.
+'''
+class MaxConcurrentFlow(object):
+	## topology - the adjacency list of the whole network
+	## lp_backend - (optional) the lp_solver backend ("gurobi" or "highs") of the exact LP, defaults to Gurobi when installed
+	def __init__(self, topology, lp_backend=None):
+		self.lp_backend = lp_backend
+		capacities = {}
+		for switch in topology.keys():
+			for neighbor in topology[switch]:
+				capacities[(switch, neighbor)] = capacities.get((switch, neighbor), 0) + 1
+		self.links = sorted(capacities.keys())
+		self.link_capacities = np.array([capacities[x] for x in self.links], dtype=float)
+		link_array = np.array(self.links, dtype=np.int64).reshape((len(self.links), 2))
+		self.link_switches = link_array[:, 0]
+		self.link_neighbors = link_array[:, 1]
+		self.num_switches = max(topology.keys()) + 1
+		## the links sorted by switch * num_switches + neighbor, to find the index of a link with np.searchsorted
+		self.link_keys = self.link_switches * self.num_switches + self.link_neighbors
+		return
+
+	def get_links(self):
+		return self.links
+
+	## Returns the sources, and the (num_sources x num_switches) traffic they send to every switch
+	def __demands(self, switch_to_switch_traffic_matrix):
+		traffic_matrix = scipy.sparse.csr_matrix(switch_to_switch_traffic_matrix, dtype=float)
+		traffic_matrix.setdiag(0.)
+		traffic_matrix.eliminate_zeros()
+		sources = np.nonzero(np.diff(traffic_matrix.indptr) > 0)[0]
+		return sources, traffic_matrix[sources].toarray()
+
+	## Solves the LP
+	##	maximize	throughput
+	##	subject to	sum_{l into v} f[s][l] - sum_{l out of v} f[s][l] == throughput * demand[s][v]		for every source s and switch v
+	##				sum_s f[s][l] <= capacity(l)																for every link l
+	## with demand[s][v] the traffic from s to v, and demand[s][s] minus all the traffic of s.
+	## Returns the throughput, or None if no optimal solution was found
+	def solve_exact(self, switch_to_switch_traffic_matrix):
+		sources, demands = self.__demands(switch_to_switch_traffic_matrix)
+		if len(sources) == 0:
+			return float("inf")
+		num_sources, num_links = len(sources), len(self.links)
+		demands[np.arange(num_sources), sources] = -demands.sum(axis=1)
+		model = LinearProgram("maximum concurrent flow")
+		flows = model.add_variables(num_sources * num_links, 0., None, 0.)
+		throughput = model.add_variable(0., None, -1.)
+
+		## flow conservation, row s * num_switches + v
+		source_offsets = np.repeat(np.arange(num_sources), num_links)
+		rows = np.concatenate((source_offsets * self.num_switches + np.tile(self.link_neighbors, num_sources),
+							source_offsets * self.num_switches + np.tile(self.link_switches, num_sources)))
+		variables = np.concatenate((flows, flows))
+		coefficients = np.concatenate((np.ones(len(flows)), -np.ones(len(flows))))
+		demand_rows = np.nonzero(demands.ravel())[0]
+		rows = np.concatenate((rows, demand_rows))
+		variables = np.concatenate((variables, np.full(len(demand_rows), throughput, dtype=np.int64)))
+		coefficients = np.concatenate((coefficients, -demands.ravel()[demand_rows]))
+		model.add_constraints(rows, variables, coefficients, "==", np.zeros(num_sources * self.num_switches))
+
+		## link capacities
+		model.add_constraints(np.tile(np.arange(num_links), num_sources), flows, np.ones(len(flows)), "<=", self.link_capacities)
+		solution = model.solve(backend=self.lp_backend)
+		if solution is None:
+			return None
+		return float(solution[throughput])
+
+	## Routes the traffic of every source along its shortest path tree, given by predecessors (as returned by
+	## scipy.sparse.csgraph.dijkstra). Returns the load of every link.
+	def __route_on_trees(self, sources, demands, predecessors):
+		num_sources = len(sources)
+		has_parent = predecessors >= 0
+		source_indices, switches = np.nonzero(has_parent)
+		parents = predecessors[source_indices, switches]
+		## the traffic through every switch of every tree is its own, plus the traffic through its children. The trees
+		## have no cycles, so after k rounds it is exact at the switches at most k levels above the leaves.
+		children = scipy.sparse.csr_matrix((np.ones(len(switches)), (source_indices * self.num_switches + parents, source_indices * self.num_switches + switches)), shape=(num_sources * self.num_switches, num_sources * self.num_switches))
+		own_traffic = demands.ravel()
+		traffic = own_traffic
+		while True:
+			next_traffic = own_traffic + children.dot(traffic)
+			if np.array_equal(next_traffic, traffic):
+				break
+			traffic = next_traffic
+		links = np.searchsorted(self.link_keys, parents * self.num_switches + switches)
+		return np.bincount(links, weights=traffic[source_indices * self.num_switches + switches], minlength=len(self.links))
+
+	## Approximates the throughput with multiplicative weights, until the lower bound is within (1 - epsilon) of the
+	## upper bound, or after max_rounds rounds.
+	## Returns the (lower_bound, upper_bound) of the throughput
+	def solve_approximate(self, switch_to_switch_traffic_matrix, epsilon=0.1, max_rounds=1000):
+		sources, demands = self.__demands(switch_to_switch_traffic_matrix)
+		if len(sources) == 0:
+			return float("inf"), float("inf")
+		demands = demands.copy()
+		lengths = 1. / self.link_capacities
+		link_flows = np.zeros(len(self.links))
+		routed = 0.
+		lower_bound, upper_bound = 0., float("inf")
+		for round_index in range(max_rounds):
+			graph = scipy.sparse.csr_matrix((lengths, (self.link_switches, self.link_neighbors)), shape=(self.num_switches, self.num_switches))
+			distances, predecessors = scipy.sparse.csgraph.dijkstra(graph, indices=sources, return_predecessors=True)
+			if round_index == 0 and np.any(np.isinf(distances[demands > 0.])):
+				## some traffic cannot be routed at all
+				return 0., 0.
+			## any lengths bound the throughput : all of the traffic needs at least sum_{s, v} demand[s][v] * distance[s][v]
+			## of the length-weighted capacity sum_l capacity(l) * length(l)
+			upper_bound = min(upper_bound, np.dot(self.link_capacities, lengths) / (demands * distances).sum())
+			tree_flows = self.__route_on_trees(sources, demands, predecessors)
+			## route as much as saturates the most congested link once
+			congestion = tree_flows / self.link_capacities
+			step = 1. / congestion.max()
+			link_flows += step * tree_flows
+			routed += step
+			lower_bound = max(lower_bound, routed / (link_flows / self.link_capacities).max())
+			if lower_bound >= (1. - epsilon) * upper_bound:
+				break
+			lengths = lengths * (1. + epsilon * step * congestion)
+			## only the ratios of the lengths matter
+			lengths /= lengths.max()
+		return lower_bound, upper_bound
+
+
+## Returns the maximum load level at which the traffic matrix can be routed on topology (a UniformGroupDragonfly,
+## SkewedGroupExpander, ...), in the load levels of routing_simulator (see saturation_estimator.FluidModel.saturation_load)
+## exact - solves the exact LP if True, otherwise returns the lower bound of MaxConcurrentFlow.solve_approximate
+def max_concurrent_load(topology, switch_to_switch_traffic_matrix, exact=True, lp_backend=None, epsilon=0.1, network_link_capacity=1., injection_link_capacity=1., concentration=1):
+	solver = MaxConcurrentFlow(topology.get_adjacency_list(), lp_backend=lp_backend)
+	if exact:
+		throughput = solver.solve_exact(switch_to_switch_traffic_matrix)
+	else:
+		throughput = solver.solve_approximate(switch_to_switch_traffic_matrix, epsilon=epsilon)[0]
+	if throughput is None:
+		return None
+	## at load level 1, the average switch injects injection_link_capacity * concentration
+	traffic_matrix = scipy.sparse.csr_matrix(switch_to_switch_traffic_matrix, dtype=float)
+	unit_demand_scale = solver.num_switches / traffic_matrix.sum()
+	return throughput / unit_demand_scale * network_link_capacity / (injection_link_capacity * concentration)
@@ -0,0 +1,97 @@
+## flows and capacities below this are treated as zero
+FLOW_EPSILON = 1E-12
+
+'''
+Solves the transportation problem
+	minimize	sum_{s, e} costs[s][e] * flows[s][e]
+	subject to	sum_e flows[s][e] = supplies[s]			for every source s
+				sum_s flows[s][e] <= capacities[e]		for every sink e
+				flows[s][e] >= 0
+with successive shortest paths : the supply is pushed one augmenting path at a time, each path being a shortest path
+(in cost) of the residual graph from a source with remaining supply to a sink with remaining capacity. Residual arcs
+going back from a sink to a source carry negative costs, so the shortest paths are found with Bellman-Ford, which is
+cheap since the bipartite graphs here only have a few tens of nodes.
+
+supplies - a list of the supply of every source
+capacities - a list of the capacity of every sink
+costs - costs[s][e] is the cost per unit of flow from source s to sink e, or None if there is no arc from s to e
+
+Returns flows, a list of lists with flows[s][e] the flow from s to e, or None if the supplies cannot all be routed.
+'''
+def solve_transportation_problem(supplies, capacities, costs):
+	nsources = len(supplies)
+	nsinks = len(capacities)
+	flows = [[0.] * nsinks for _ in range(nsources)]
+	remaining_supplies = [float(x) for x in supplies]
+	remaining_capacities = [float(x) for x in capacities]
+	arcs = [[e for e in range(nsinks) if costs[s][e] is not None] for s in range(nsources)]
+	while True:
+		sources_left = [s for s in range(nsources) if remaining_supplies[s] > FLOW_EPSILON]
+		if len(sources_left) == 0:
+			return flows
+		path = _shortest_augmenting_path(sources_left, remaining_capacities, costs, arcs, flows)
+		if path is None:
+			return None
+		## the path alternates source, sink, source, ... sink, push as much as its bottleneck allows
+		bottleneck = min(remaining_supplies[path[0]], remaining_capacities[path[-1]])
+		for index in range(1, len(path) - 1, 2):
+			bottleneck = min(bottleneck, flows[path[index + 1]][path[index]])
+		for index in range(0, len(path) - 1, 2):
+			flows[path[index]][path[index + 1]] += bottleneck
+		for index in range(1, len(path) - 1, 2):
+			flows[path[index + 1]][path[index]] -= bottleneck
+		remaining_supplies[path[0]] -= bottleneck
+		remaining_capacities[path[-1]] -= bottleneck
+
+## Bellman-Ford from all sources with remaining supply at once. Forward arcs go from a source to a sink, and residual
+## arcs go from a sink back to every source that currently sends flow to it.
+## Returns the path as [source, sink, source, ..., sink], or None if no sink with remaining capacity can be reached.
+def _shortest_augmenting_path(sources_left, remaining_capacities, costs, arcs, flows):
+	nsources = len(arcs)
+	nsinks = len(remaining_capacities)
+	source_distances = [None] * nsources
+	source_predecessors = [None] * nsources
+	sink_distances = [None] * nsinks
+	sink_predecessors = [None] * nsinks
+	for s in sources_left:
+		source_distances[s] = 0.
+	for _ in range(nsources + nsinks):
+		updated = False
+		for s in range(nsources):
+			if source_distances[s] is None:
+				continue
+			for e in arcs[s]:
+				distance = source_distances[s] + costs[s][e]
+				if sink_distances[e] is None or distance < sink_distances[e] - FLOW_EPSILON:
+					sink_distances[e] = distance
+					sink_predecessors[e] = s
+					updated = True
+		for s in range(nsources):
+			for e in arcs[s]:
+				if flows[s][e] <= FLOW_EPSILON or sink_distances[e] is None:
+					continue
+				distance = sink_distances[e] - costs[s][e]
+				if source_distances[s] is None or distance < source_distances[s] - FLOW_EPSILON:
+					source_distances[s] = distance
+					source_predecessors[s] = e
+					updated = True
+		if not updated:
+			break
+	## pick the closest sink that can still take flow
+	best_sink = None
+	for e in range(nsinks):
+		if remaining_capacities[e] > FLOW_EPSILON and sink_distances[e] is not None:
+			if best_sink is None or sink_distances[e] < sink_distances[best_sink]:
+				best_sink = e
+	if best_sink is None:
+		return None
+	path = [best_sink]
+	current_source = sink_predecessors[best_sink]
+	while True:
+		path.append(current_source)
+		if source_predecessors[current_source] is None:
+			break
+		path.append(source_predecessors[current_source])
+		current_source = sink_predecessors[source_predecessors[current_source]]
+	path.reverse()
+	return path
@@ -1,16 +1,19 @@
 import numpy as np
-from gurobipy import *
 from collections import deque
 import copy
 import sys, math
+from path_table import PathTableBuilder
+from lp_solver import LinearProgram
 
 
 ## the simplest class of router, which only picks one minimal path, and route all traffic there.
 class MinimalRouting(object):
-	def __init__(self):
+	## lp_backend - (optional) the lp_solver backend ("gurobi" or "highs") of the LPs, defaults to Gurobi when installed
+	def __init__(self, tolerance_fairness, max_intrablock_distance=2, lp_backend=None):
 		## records the maximum number of hops we permit packets to traverse within a block
 		self.max_tolerable_intrablock_distance = max_intrablock_distance 
 		self.sigma = tolerance_fairness
+		self.lp_backend = lp_backend
 		return
 
 	## generates the intrablock topology
@@ -46,7 +49,7 @@ class MinimalRouting(object):
 	## given a topology adjacency list, how each switch id is mapped to a block, and
 	## the total number of blocks, form the number of paths between each switch, block pair
 	def _find_all_short_paths_to_entry_switches(self, topology, switch_to_block_map, block_to_switches_map, nblocks, inter_block_entrance_switches):
-		switch_to_entry_switches_paths = {} ## to return
+		switch_to_entry_switches_paths = PathTableBuilder() ## to return
 		## Step 1 : For every pair of blocks, identify the entrance switches
 		block_topologies = {}
 		for block in range(nblocks):
@@ -68,8 +71,8 @@ class MinimalRouting(object):
 					entry_switches = inter_block_entrance_switches[(current_switch_block, target_block)]
 					for entry_switch in entry_switches:
 						paths_collection += self._short_paths_to_switch(current_switch, entry_switch, topology, entry_switches, self.max_tolerable_intrablock_distance)
-				switch_to_entry_switches_paths[(current_switch, target_block)] = paths_collection
-		return switch_to_entry_switches_paths
+				switch_to_entry_switches_paths.add_paths(current_switch, target_block, paths_collection)
+		return switch_to_entry_switches_paths.build()
 
 	## helper function to _short_paths_to_switch, and essentially recursively performs DFS to locate paths from source to target
 	def __dfs_recursive__(self, source, target, current_node, topology, current_hop_count, maximum_hop_counts, prohibited_nodes_for_intermediate_hops, all_paths, path):
@@ -109,33 +112,20 @@ class MinimalRouting(object):
 		if len(entry_switches) == 0:
 			raise Exception("No entry switch")
 			return None
-		model = Model("split traffic between blocks : {} - {}".format(src_block, dst_block))
-		model.setParam( 'OutputFlag', False )
-		obj_function = LinExpr()
+		model = LinearProgram("split traffic between blocks : {} - {}".format(src_block, dst_block))
 		omega = {}
 		for src_switch in block_to_switches_map[src_block]:
-			all_paths_to_entry_switches = path_to_entry_switches[(src_switch, dst_block)] ## all paths to ALL entry switches
-			all_paths_switch_to_entry_switch = {} ## all paths to a specific entry switch
-			for path in all_paths_to_entry_switches:
-				assert(path[0] == src_switch)
-				entry_switch = path[-1] 
-				if entry_switch not in all_paths_switch_to_entry_switch:
-					all_paths_switch_to_entry_switch[entry_switch] = []
-				all_paths_switch_to_entry_switch[entry_switch].append(path)
-			for entry_switch in all_paths_switch_to_entry_switch.keys():
-				paths_lengths = [len(x) - 1 for x in all_paths_switch_to_entry_switch[entry_switch]]
-				min_path_length_to_entry_switch = min(paths_lengths)
-				omega[(src_switch, entry_switch)] = model.addVar(obj=0., vtype=GRB.CONTINUOUS, lb=0, ub=1, name="w_{}_{}".format(src_switch, entry_switch))
-				obj_function += omega[(src_switch, entry_switch)] * traffic_sent_from_each_switch[src_switch] * min_path_length_to_entry_switch
+			min_path_lengths = path_to_entry_switches.min_path_lengths(src_switch, dst_block) ## minimum path length to each entry switch
+			for entry_switch in min_path_lengths.keys():
+				min_path_length_to_entry_switch = min_path_lengths[entry_switch]
+				omega[(src_switch, entry_switch)] = model.add_variable(lower_bound=0, upper_bound=1, obj=traffic_sent_from_each_switch[src_switch] * min_path_length_to_entry_switch)
 
 		## Programming the constraints
 		## Constraints type 1 : all routing weights have to add to 1
 		for src_switch in block_to_switches_map[src_block]:
 			if src_switch not in entry_switches:
-				weight_sum_constraint = LinExpr()
-				for entry_switch in entry_switches:
-					weight_sum_constraint += omega[(src_switch, entry_switch)]
-				model.addConstr(lhs=weight_sum_constraint, sense=GRB.EQUAL, rhs=1)
+				weight_sum_variables = [omega[(src_switch, entry_switch)] for entry_switch in entry_switches]
+				model.add_constraint(weight_sum_variables, [1.] * len(weight_sum_variables), "==", 1)
 		## Constraints type 2 : utilization of interblock links have to be more or less equal
 		traffic_sum_from_src_block = 0.
 		for switch in traffic_sent_from_each_switch.keys():
@@ -144,24 +134,22 @@ class MinimalRouting(object):
 		#print("traffic_sent_from_each_switch : {} - sum : {}".format(traffic_sent_from_each_switch, sum(traffic_sent_from_each_switch)))
 		#print("optimal fairshare : {} ".format(sum(traffic_sent_from_each_switch)  / float(total_capacity_between_blocks) ))
 		for entry_switch in entry_switches:
-			entry_switch_traffic_volume = LinExpr()
-			## first, add the volume from itself
-			entry_switch_traffic_volume += traffic_sent_from_each_switch[entry_switch]
+			## the volume from the entry switch itself is moved to the right hand side
+			entry_switch_traffic_variables = []
+			entry_switch_traffic_coefficients = []
 			for src_switch in block_to_switches_map[src_block]:
 				if src_switch not in entry_switches:
-					entry_switch_traffic_volume += (traffic_sent_from_each_switch[src_switch] * omega[(src_switch, entry_switch)])
-			model.addConstr(lhs=optimal_fair_share * (1. + self.sigma), sense=GRB.GREATER_EQUAL, rhs=entry_switch_traffic_volume)
+					entry_switch_traffic_variables.append(omega[(src_switch, entry_switch)])
+					entry_switch_traffic_coefficients.append(traffic_sent_from_each_switch[src_switch])
+			model.add_constraint(entry_switch_traffic_variables, entry_switch_traffic_coefficients, "<=", optimal_fair_share * (1. + self.sigma) - traffic_sent_from_each_switch[entry_switch])
 		routing_weights = {}
-		try:
-			model.setObjective(obj_function, GRB.MINIMIZE)
-			model.optimize()
+		solution = model.solve(backend=self.lp_backend)
+		if solution is not None:
 			for (src_switch, entry_switch) in omega.keys():
-				routing_weights[(src_switch, entry_switch)] = omega[(src_switch, entry_switch)].x
-		except GurobiError as e:
-			print ("Error code " + str(e. errno ) + ": " + str(e))
-		except AttributeError :
-			print ("Encountered an attribute error ")
-		print routing_weights
+				routing_weights[(src_switch, entry_switch)] = float(solution[omega[(src_switch, entry_switch)]])
+		else:
+			print ("No optimal solution found for the split between blocks : {} - {}".format(src_block, dst_block))
+		print(routing_weights)
 		return routing_weights
 
 	################################################################################################################################################################
@@ -211,7 +199,7 @@ class MinimalRouting(object):
 				entry_switches2 = inter_block_entrance_switches[(dst_block, src_block)]
 
 				all_routing_weights[(src_block, dst_block)] = self._split_traffic_between_block_pair(src_block, dst_block, capacity1, block_to_switches_map, entry_switches1, switch_to_switch_traffic_matrix1, path_to_entry_switches)
-				all_routing_weights[(src_block, dst_block)] = self._split_traffic_between_block_pair(dst_block, src_block, capacity2, block_to_switches_map, entry_switches2, switch_to_switch_traffic_matrix2, path_to_entry_switches)
+				all_routing_weights[(dst_block, src_block)] = self._split_traffic_between_block_pair(dst_block, src_block, capacity2, block_to_switches_map, entry_switches2, switch_to_switch_traffic_matrix2, path_to_entry_switches)
 		return all_routing_weights
 	##
 	## topology - the adjacency list of the topology, NOTE: it's not adjacency matrix.
@@ -0,0 +1,108 @@
+import os, hashlib
+import numpy as np
+from path_table import PathTable
+
+## bump whenever the file layout, or what path selection computes, changes, so that stale cache files are never read
+CACHE_FORMAT_VERSION = 2
+
+## Returns a hashlib.sha1 of the adjacency list (including the order of the neighbors, which determines the order of the
+## paths), the switch to block map, and the repr of the given parameters (e.g. max intrablock distance). More data can
+## still be added to the returned hash with update().
+def topology_fingerprint(topology, switch_to_block_map, parameters):
+	switches = sorted(topology.keys())
+	neighbor_offsets = [0]
+	neighbors = []
+	for switch in switches:
+		neighbors += [int(x) for x in topology[switch]]
+		neighbor_offsets.append(len(neighbors))
+	digest = hashlib.sha1()
+	digest.update(np.array([int(x) for x in switches], dtype=np.int64).tobytes())
+	digest.update(np.array(neighbor_offsets, dtype=np.int64).tobytes())
+	digest.update(np.array(neighbors, dtype=np.int64).tobytes())
+	digest.update(np.array([int(switch_to_block_map[x]) for x in switches], dtype=np.int64).tobytes())
+	digest.update(repr(tuple(parameters)).encode("utf-8"))
+	return digest
+
+'''
+Content-addressed on-disk cache of path selection results (PathTables, or the distances to the entry switches).
+Every entry lives in its own .npz file named after the fingerprint of the topology and the path selection parameters,
+so a topology that does not change between experiments only has its paths enumerated once.
+'''
+class PathSelectionCache(object):
+	def __init__(self, cache_dir):
+		self.cache_dir = cache_dir
+		return
+
+	## Hashes everything that path selection depends on, see topology_fingerprint
+	def fingerprint(self, topology, switch_to_block_map, parameters):
+		return topology_fingerprint(topology, switch_to_block_map, (CACHE_FORMAT_VERSION,) + tuple(parameters)).hexdigest()
+
+	def __filename(self, fingerprint):
+		return os.path.join(self.cache_dir, "{}.npz".format(fingerprint))
+
+	## writes to a temporary file first, so that an interrupted write never leaves a corrupt cache entry behind
+	def __save(self, fingerprint, arrays):
+		if not os.path.exists(self.cache_dir):
+			os.makedirs(self.cache_dir)
+		temporary_filename = self.__filename(fingerprint) + ".{}.tmp".format(os.getpid())
+		with open(temporary_filename, 'wb') as f:
+			np.savez(f, **arrays)
+		os.rename(temporary_filename, self.__filename(fingerprint))
+		return
+
+	def __load(self, fingerprint):
+		filename = self.__filename(fingerprint)
+		if not os.path.exists(filename):
+			return None
+		with np.load(filename) as arrays:
+			return dict([(x, arrays[x]) for x in arrays.files])
+
+	## Returns the cached PathTable, or None on a cache miss
+	def load_path_table(self, fingerprint):
+		arrays = self.__load(fingerprint)
+		if arrays is None:
+			return None
+		keys = [tuple(x) for x in arrays["keys"].tolist()]
+		return PathTable(keys, arrays["key_offsets"], arrays["group_entry_switches"], arrays["group_min_lengths"], arrays["group_offsets"], arrays["path_offsets"], arrays["nodes"])
+
+	def save_path_table(self, fingerprint, path_table):
+		keys = np.array(path_table.keys(), dtype=np.int64).reshape((len(path_table), 2))
+		self.__save(fingerprint, {"keys" : keys,
+								"key_offsets" : path_table.key_offsets,
+								"group_entry_switches" : path_table.group_entry_switches,
+								"group_min_lengths" : path_table.group_min_lengths,
+								"group_offsets" : path_table.group_offsets,
+								"path_offsets" : path_table.path_offsets,
+								"nodes" : path_table.nodes})
+		return
+
+	## Returns the cached map of (switch, target_block) to a map of entry_switch to hop count, or None on a cache miss
+	def load_distances(self, fingerprint):
+		arrays = self.__load(fingerprint)
+		if arrays is None:
+			return None
+		keys = arrays["keys"].tolist()
+		key_offsets = arrays["key_offsets"].tolist()
+		entry_switches = arrays["entry_switches"].tolist()
+		hop_counts = arrays["hop_counts"].tolist()
+		distances = {}
+		for index in range(len(keys)):
+			start, end = key_offsets[index], key_offsets[index + 1]
+			distances[tuple(keys[index])] = dict(zip(entry_switches[start:end], hop_counts[start:end]))
+		return distances
+
+	def save_distances(self, fingerprint, distances):
+		keys = sorted(distances.keys())
+		key_offsets = [0]
+		entry_switches = []
+		hop_counts = []
+		for key in keys:
+			for entry_switch in sorted(distances[key].keys()):
+				entry_switches.append(entry_switch)
+				hop_counts.append(distances[key][entry_switch])
+			key_offsets.append(len(entry_switches))
+		self.__save(fingerprint, {"keys" : np.array(keys, dtype=np.int64).reshape((len(keys), 2)),
+								"key_offsets" : np.array(key_offsets, dtype=np.int64),
+								"entry_switches" : np.array(entry_switches, dtype=np.int32),
+								"hop_counts" : np.array(hop_counts, dtype=np.int32)})
+		return
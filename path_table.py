@@ -0,0 +1,220 @@
+import numpy as np
+from array import array
+
+'''
+Array-backed storage of the paths from every switch to the entry switches of every target block.
+
+All switch ids of all paths are stored back to back in a single int32 buffer (nodes), and a CSR-like hierarchy of
+offset arrays indexes into it:
+	key k = (switch, target_block) owns the entry switch groups key_offsets[k] ... key_offsets[k + 1] - 1
+	group g owns the paths group_offsets[g] ... group_offsets[g + 1] - 1, which all end at group_entry_switches[g]
+	path p owns the nodes path_offsets[p] ... path_offsets[p + 1] - 1
+The minimum path length (in hops) of each group is kept in group_min_lengths, so that min-length queries never touch
+the paths themselves.
+
+PathTable supports the read-only part of the dict interface (keys, items, iteration over the keys, [], in, len), where
+table[(switch, target_block)] returns the paths as a list of tuples, so it can stand in for the
+{(switch, target_block) : [path, ...]} map path_selection used to return.
+'''
+class PathTable(object):
+	def __init__(self, keys, key_offsets, group_entry_switches, group_min_lengths, group_offsets, path_offsets, nodes):
+		self.keys_list = list(keys)
+		self.key_offsets = np.asarray(key_offsets, dtype=np.int64)
+		self.group_entry_switches = np.asarray(group_entry_switches, dtype=np.int32)
+		self.group_min_lengths = np.asarray(group_min_lengths, dtype=np.int32)
+		self.group_offsets = np.asarray(group_offsets, dtype=np.int64)
+		self.path_offsets = np.asarray(path_offsets, dtype=np.int64)
+		self.nodes = np.asarray(nodes, dtype=np.int32)
+		self.key_index = {}
+		for index in range(len(self.keys_list)):
+			self.key_index[self.keys_list[index]] = index
+		return
+
+	##########################################################################################
+	## dict-like interface
+	##########################################################################################
+	def keys(self):
+		return list(self.keys_list)
+
+	## iterates through the ((switch, target_block), paths) of every key, in the order of keys()
+	def items(self):
+		for key in self.keys_list:
+			yield key, self[key]
+
+	def __iter__(self):
+		return iter(self.keys_list)
+
+	def __len__(self):
+		return len(self.keys_list)
+
+	def __contains__(self, key):
+		return key in self.key_index
+
+	def __getitem__(self, key):
+		return list(self.iter_paths(key[0], key[1]))
+
+	def __repr__(self):
+		return "PathTable(keys={}, paths={}, nodes={}, bytes={})".format(len(self.keys_list), self.get_num_paths(), len(self.nodes), self.nbytes())
+
+	##########################################################################################
+	## queries
+	##########################################################################################
+	def get_num_paths(self):
+		return len(self.path_offsets) - 1
+
+	## total memory held by the arrays, in bytes
+	def nbytes(self):
+		return self.key_offsets.nbytes + self.group_entry_switches.nbytes + self.group_min_lengths.nbytes + self.group_offsets.nbytes + self.path_offsets.nbytes + self.nodes.nbytes
+
+	def __group_range(self, switch, target_block):
+		key = self.key_index[(switch, target_block)]
+		return self.key_offsets[key], self.key_offsets[key + 1]
+
+	def __iter_group_paths(self, group):
+		path_offsets = self.path_offsets
+		for path in range(self.group_offsets[group], self.group_offsets[group + 1]):
+			yield tuple(self.nodes[path_offsets[path]:path_offsets[path + 1]].tolist())
+
+	## iterates through all paths from switch to the entry switches towards target_block
+	def iter_paths(self, switch, target_block):
+		first_group, last_group = self.__group_range(switch, target_block)
+		for group in range(first_group, last_group):
+			for path in self.__iter_group_paths(group):
+				yield path
+
+	## iterates through all paths from switch to a single entry switch towards target_block
+	def iter_paths_to_entry_switch(self, switch, target_block, entry_switch):
+		first_group, last_group = self.__group_range(switch, target_block)
+		for group in range(first_group, last_group):
+			if self.group_entry_switches[group] == entry_switch:
+				for path in self.__iter_group_paths(group):
+					yield path
+
+	## iterates through (switch, target_block, path) for every path in the table
+	def iter_all_paths(self):
+		for (switch, target_block) in self.keys_list:
+			for path in self.iter_paths(switch, target_block):
+				yield switch, target_block, path
+
+	## returns the entry switches reachable from switch towards target_block
+	def entry_switches(self, switch, target_block):
+		first_group, last_group = self.__group_range(switch, target_block)
+		return self.group_entry_switches[first_group:last_group].tolist()
+
+	## returns a map of entry_switch to the minimum path length (in hops) from switch to entry_switch
+	def min_path_lengths(self, switch, target_block):
+		first_group, last_group = self.__group_range(switch, target_block)
+		entry_switches = self.group_entry_switches[first_group:last_group].tolist()
+		min_lengths = self.group_min_lengths[first_group:last_group].tolist()
+		return dict(zip(entry_switches, min_lengths))
+
+
+'''
+Incrementally builds a PathTable. Paths are appended straight into compact arrays, so only the paths of the
+(switch, target_block) currently being added need to exist as Python objects.
+Whole PathTables can also be appended (optionally relabeling their switch ids), which is done on the arrays directly.
+'''
+class PathTableBuilder(object):
+	def __init__(self):
+		self.keys = []
+		## finished segments, each a tuple of (key_offsets, group_entry_switches, group_min_lengths, group_offsets, path_offsets, nodes)
+		## with offsets relative to the start of the segment
+		self.segments = []
+		self.__reset_buffers()
+		return
+
+	def __reset_buffers(self):
+		self.key_offsets = array('l', [0])
+		self.group_entry_switches = array('i')
+		self.group_min_lengths = array('i')
+		self.group_offsets = array('l', [0])
+		self.path_offsets = array('l', [0])
+		self.nodes = array('i')
+		return
+
+	## paths - all the paths from switch towards target_block, each path is a sequence of switch ids ending at an entry switch.
+	## Paths are grouped by their entry switch, in order of first appearance.
+	def add_paths(self, switch, target_block, paths):
+		groups = {}
+		group_order = []
+		for path in paths:
+			entry_switch = path[-1]
+			if entry_switch not in groups:
+				groups[entry_switch] = []
+				group_order.append(entry_switch)
+			groups[entry_switch].append(path)
+		for entry_switch in group_order:
+			min_length = None
+			for path in groups[entry_switch]:
+				self.nodes.extend(path)
+				self.path_offsets.append(len(self.nodes))
+				if min_length is None or len(path) - 1 < min_length:
+					min_length = len(path) - 1
+			self.group_entry_switches.append(entry_switch)
+			self.group_min_lengths.append(min_length)
+			self.group_offsets.append(len(self.path_offsets) - 1)
+		self.keys.append((switch, target_block))
+		self.key_offsets.append(len(self.group_entry_switches))
+		return
+
+	## appends all the paths of path_table.
+	## keys - (optional) the keys to store the paths of path_table under, one for each key of path_table (in order)
+	## relabel - (optional) an array mapping every switch id used in path_table to the switch id to store instead
+	def add_table(self, path_table, keys=None, relabel=None):
+		if keys is None:
+			keys = path_table.keys()
+		assert(len(keys) == len(path_table))
+		self.__flush()
+		group_entry_switches = path_table.group_entry_switches
+		nodes = path_table.nodes
+		if relabel is not None:
+			relabel = np.asarray(relabel, dtype=np.int32)
+			group_entry_switches = relabel[group_entry_switches]
+			nodes = relabel[nodes]
+		self.keys.extend(keys)
+		self.segments.append((path_table.key_offsets, group_entry_switches, path_table.group_min_lengths, path_table.group_offsets, path_table.path_offsets, nodes))
+		return
+
+	## views an array.array as a numpy array without copying
+	def __as_numpy(self, values):
+		if len(values) == 0:
+			return np.zeros(0, dtype=np.dtype(values.typecode))
+		return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+	## moves the paths added through add_paths into a new segment
+	def __flush(self):
+		if len(self.key_offsets) > 1:
+			self.segments.append((self.__as_numpy(self.key_offsets),
+								self.__as_numpy(self.group_entry_switches),
+								self.__as_numpy(self.group_min_lengths),
+								self.__as_numpy(self.group_offsets),
+								self.__as_numpy(self.path_offsets),
+								self.__as_numpy(self.nodes)))
+			self.__reset_buffers()
+		return
+
+	def build(self):
+		self.__flush()
+		if len(self.segments) == 0:
+			return PathTable([], [0], [], [], [0], [0], [])
+		if len(self.segments) == 1:
+			return PathTable(self.keys, *self.segments[0])
+		## concatenate the segments, shifting every offset array by the size of the segments before it
+		key_offsets = [np.zeros(1, dtype=np.int64)]
+		group_offsets = [np.zeros(1, dtype=np.int64)]
+		path_offsets = [np.zeros(1, dtype=np.int64)]
+		num_groups, num_paths, num_nodes = 0, 0, 0
+		for segment in self.segments:
+			key_offsets.append(segment[0][1:] + num_groups)
+			group_offsets.append(segment[3][1:] + num_paths)
+			path_offsets.append(segment[4][1:] + num_nodes)
+			num_groups += len(segment[1])
+			num_paths += len(segment[4]) - 1
+			num_nodes += len(segment[5])
+		return PathTable(self.keys,
+						np.concatenate(key_offsets),
+						np.concatenate([x[1] for x in self.segments]),
+						np.concatenate([x[2] for x in self.segments]),
+						np.concatenate(group_offsets),
+						np.concatenate(path_offsets),
+						np.concatenate([x[5] for x in self.segments]))
@@ -0,0 +1,151 @@
+import os
+from collections import OrderedDict
+import numpy as np
+from path_selection_cache import topology_fingerprint
+from traffic_matrix_util import as_traffic_matrix, coo_traffic_matrix, nonzero_entries
+from routing_table import build_routing_table
+from lp_solver import default_lp_backend
+
+## bump whenever the file layout, the fingerprint, or what route() computes, changes, so that stale files are never read
+MEMO_FORMAT_VERSION = 3
+
+'''
+Memoizes the routing weights returned by AdaptiveRouting.route, keyed by a hash of the adjacency list, the switch to
+block map, the nonzero entries of the traffic matrix rounded to traffic_decimals decimals (so that the same traffic
+matrix gets the same key, whether it is dense or scipy.sparse), and every parameter of the router that changes the
+weights (sigma, max intrablock distance, ..., and the LP backend, as different solvers may return different optimal
+weights).
+The most recent results are kept in memory (an LRU of at most capacity entries), and if cache_dir is given, every result
+is also stored in its own .npz file there, so it survives across runs.
+A memoized result does not run the router, so the router's routing_state (see AdaptiveRouting.update_topology) stays
+the one of the last route() call that actually ran.
+'''
+class RoutingMemoizer(object):
+	def __init__(self, router, capacity=64, cache_dir=None, traffic_decimals=9):
+		self.router = router
+		self.capacity = capacity
+		self.cache_dir = cache_dir
+		self.traffic_decimals = traffic_decimals
+		self.entries = OrderedDict()
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		return
+
+	## same arguments and return value as AdaptiveRouting.route
+	def route(self, topology, switch_to_block_map, switch_to_switch_traffic_matrix, distance_only=False, as_routing_table=False):
+		key = self.fingerprint(topology, switch_to_block_map, switch_to_switch_traffic_matrix, distance_only)
+		if key in self.entries:
+			routing_weights = self.entries.pop(key)
+			self.entries[key] = routing_weights
+			self.hits += 1
+			if as_routing_table:
+				return build_routing_table(routing_weights, topology, switch_to_block_map)
+			return self.__copy_routing_weights(routing_weights)
+		routing_weights = self.__load(key)
+		if routing_weights is not None:
+			self.disk_hits += 1
+		else:
+			self.misses += 1
+			routing_weights = self.router.route(topology, switch_to_block_map, switch_to_switch_traffic_matrix, distance_only=distance_only)
+			self.__save(key, routing_weights)
+		self.entries[key] = self.__copy_routing_weights(routing_weights)
+		while len(self.entries) > self.capacity:
+			self.entries.popitem(last=False)
+		if as_routing_table:
+			return build_routing_table(routing_weights, topology, switch_to_block_map)
+		return routing_weights
+
+	def fingerprint(self, topology, switch_to_block_map, switch_to_switch_traffic_matrix, distance_only=False):
+		router = self.router
+		## the backend the LPs are actually solved with, so that router.lp_backend = None shares its key with the default
+		lp_backend = router.lp_backend
+		if lp_backend is None:
+			lp_backend = default_lp_backend()
+		parameters = (MEMO_FORMAT_VERSION, router.sigma, router.max_tolerable_intrablock_distance, router.max_paths_per_pair, router.split_solver, router.global_formulation, lp_backend, distance_only, self.traffic_decimals)
+		digest = topology_fingerprint(topology, switch_to_block_map, parameters)
+		traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix)
+		rows, columns, values = nonzero_entries(traffic_matrix)
+		## adding 0. turns -0. into 0., which have different bytes, and the entries that round to 0. are dropped
+		values = np.round(values, self.traffic_decimals) + 0.
+		kept = values != 0.
+		traffic_matrix = coo_traffic_matrix(rows[kept], columns[kept], values[kept], traffic_matrix.shape[0])
+		digest.update(np.array(traffic_matrix.shape, dtype=np.int64).tobytes())
+		digest.update(traffic_matrix.indptr.astype(np.int64).tobytes())
+		digest.update(traffic_matrix.indices.astype(np.int64).tobytes())
+		digest.update(traffic_matrix.data.tobytes())
+		return digest.hexdigest()
+
+	## Returns the hits (in memory and on disk) and misses since the memoizer was created
+	def get_statistics(self):
+		requests = self.hits + self.disk_hits + self.misses
+		hit_rate = 0.
+		if requests > 0:
+			hit_rate = float(self.hits + self.disk_hits) / requests
+		return {"hits" : self.hits, "disk_hits" : self.disk_hits, "misses" : self.misses, "hit_rate" : hit_rate, "entries" : len(self.entries)}
+
+	def clear(self):
+		self.entries = OrderedDict()
+		return
+
+	## the callers get their own copy, so that changing it does not change the memoized result
+	def __copy_routing_weights(self, routing_weights):
+		copied_routing_weights = {}
+		for block_pair in routing_weights.keys():
+			if routing_weights[block_pair] is None:
+				copied_routing_weights[block_pair] = None
+			else:
+				copied_routing_weights[block_pair] = dict(routing_weights[block_pair])
+		return copied_routing_weights
+
+	def __filename(self, key):
+		return os.path.join(self.cache_dir, "routing_{}.npz".format(key))
+
+	## the weights of all block pairs are stored back to back, block pair k owning the weights
+	## weight_offsets[k] ... weight_offsets[k + 1] - 1. Block pairs without weights (None) are flagged in is_none.
+	def __save(self, key, routing_weights):
+		if self.cache_dir is None:
+			return
+		block_pairs = list(routing_weights.keys())
+		weight_offsets = [0]
+		is_none = []
+		switches, entry_switches, weights = [], [], []
+		for block_pair in block_pairs:
+			is_none.append(routing_weights[block_pair] is None)
+			if routing_weights[block_pair] is not None:
+				for ((switch, entry_switch), weight) in routing_weights[block_pair].items():
+					switches.append(switch)
+					entry_switches.append(entry_switch)
+					weights.append(weight)
+			weight_offsets.append(len(weights))
+		if not os.path.exists(self.cache_dir):
+			os.makedirs(self.cache_dir)
+		temporary_filename = self.__filename(key) + ".{}.tmp".format(os.getpid())
+		with open(temporary_filename, 'wb') as f:
+			np.savez(f, block_pairs=np.array(block_pairs, dtype=np.int64).reshape((len(block_pairs), 2)),
+					is_none=np.array(is_none, dtype=bool),
+					weight_offsets=np.array(weight_offsets, dtype=np.int64),
+					switches=np.array(switches, dtype=np.int64),
+					entry_switches=np.array(entry_switches, dtype=np.int64),
+					weights=np.array(weights, dtype=float))
+		os.rename(temporary_filename, self.__filename(key))
+		return
+
+	def __load(self, key):
+		if self.cache_dir is None or not os.path.exists(self.__filename(key)):
+			return None
+		with np.load(self.__filename(key)) as arrays:
+			block_pairs = arrays["block_pairs"].tolist()
+			is_none = arrays["is_none"].tolist()
+			weight_offsets = arrays["weight_offsets"].tolist()
+			switches = arrays["switches"].tolist()
+			entry_switches = arrays["entry_switches"].tolist()
+			weights = arrays["weights"].tolist()
+		routing_weights = {}
+		for index in range(len(block_pairs)):
+			if is_none[index]:
+				routing_weights[tuple(block_pairs[index])] = None
+				continue
+			start, end = weight_offsets[index], weight_offsets[index + 1]
+			routing_weights[tuple(block_pairs[index])] = dict(zip(zip(switches[start:end], entry_switches[start:end]), weights[start:end]))
+		return routing_weights
@@ -1,5 +1,8 @@
 import sys, os
 from enum import Enum
+import scipy.sparse
+from traffic_matrix_util import rescale_sparse_square_matrix, nonzero_entries
+from routing_table import RoutingTable
 
 class ROUTING(Enum):
 	ECMP = 1
@@ -11,7 +14,10 @@ class ROUTING(Enum):
 
 
 ##Given a orig_size x orig_size matrix, rescales it to a new_size x new_size matrix
+## A scipy.sparse matrix is rescaled in sparse form.
 def rescale_square_matrix(orig_matrix, new_size):
+	if scipy.sparse.issparse(orig_matrix):
+		return rescale_sparse_square_matrix(orig_matrix, new_size)
 	orig_size = len(orig_matrix)
 	# if new_size is the same as original size, then do nothing
 	if (new_size == orig_size):
@@ -42,6 +48,8 @@ def rescale_square_matrix(orig_matrix, new_size):
 
 ## normalizes a square matrix to "norm"
 def normalize_square_matrix(matrix, norm):
+	if scipy.sparse.issparse(matrix):
+		return scipy.sparse.csr_matrix(matrix, dtype=float) * (float(norm) / matrix.sum())
 	num_entries = len(matrix)
 	new_matrix = [0] * num_entries
 	total = sum([sum(x) for x in matrix])
@@ -86,23 +94,27 @@ def write_topology_file(topology_filename, topology_adj_list, concentration=1):
 ### Note that this function expects the traffic probability to be between servers, not switches
 ## This means that if the concentration factor is 1, then things might work. But if the traffic matrix is for switch to switch
 ## bu the concentration factor for each ToR is greater than 1, then there will be weird bugs in Netbench later on
+## traffic_probability_matrix can be dense or scipy.sparse, only its nonzero entries are visited
 def write_traffic_probability_file(traffic_probability_filename, traffic_probability_matrix, num_switches):
-	str_builder = "#tor_pair_id,src,dst,pdf_num_bytes\n"
+	lines = ["#tor_pair_id,src,dst,pdf_num_bytes\n"]
 	offset = num_switches
-	num_servers = len(traffic_probability_matrix)
 	current_pair = 0
-	for i in range(num_servers):
-		for j in range(num_servers):
-			if i != j and traffic_probability_matrix[i][j] > 0:
-				str_builder += "{},{},{},{:.6E}\n".format(current_pair, i + offset, j + offset, traffic_probability_matrix[i][j])
-				current_pair += 1
-	str_builder += "\n"
+	rows, columns, values = nonzero_entries(traffic_probability_matrix)
+	for (i, j, probability) in zip(rows.tolist(), columns.tolist(), values.tolist()):
+		if i != j and probability > 0:
+			lines.append("{},{},{},{:.6E}\n".format(current_pair, i + offset, j + offset, probability))
+			current_pair += 1
+	lines.append("\n")
 	with open(traffic_probability_filename, "w+") as f:
-		f.write(str_builder)
+		f.write("".join(lines))
 	return
 
-## routing_weights is a dictionary of (src_block, dst_block) to a dictionary of key (switch, entry_switch) to weight
+## routing_weights is a dictionary of (src_block, dst_block) to a dictionary of key (switch, entry_switch) to weight,
+## or a RoutingTable, which writes its arrays straight out
 def write_routing_weights_file(routing_weights_filename, routing_weights):
+	if isinstance(routing_weights, RoutingTable):
+		routing_weights.write(routing_weights_filename)
+		return
 	str_builder = "##switchID, targetBlock, entrySwitch, weight\n"
 	print("{}\n\n".format( routing_weights))
 	for (src_block, dst_block) in routing_weights.keys():
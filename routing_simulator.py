@@ -190,7 +190,7 @@ def uniform_dragonfly_simulation():
 
 	## Traffic aware source routing (start cracking the routing weights)
 	tolerance_fairness = 0.00
-	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=1)
+	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=1, cache_dir=base_directory + "/path_selection_cache")
 	routing_weights = adaptive_router.route(uniform_dfly.get_adjacency_list(), uniform_dfly.get_switch_id_to_block_id_map(), switch_traffic_matrix)
 	routing_weights_filename = base_directory + "/netbench_simulations/{}/{}/".format(uniform_dfly_name_str, traffic_generator.to_string()) + "routing_weights.txt"
 	util.write_routing_weights_file(routing_weights_filename, routing_weights)
@@ -304,7 +304,7 @@ def uniform_expander_simulation():
 
 	## Traffic aware source routing (start cracking the routing weights)
 	tolerance_fairness = 0.00
-	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=2)
+	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=2, cache_dir=base_directory + "/path_selection_cache")
 	routing_weights = adaptive_router.route(uniform_expander.get_adjacency_list(), uniform_expander.get_switch_id_to_block_id_map(), switch_traffic_matrix)
 	routing_weights_filename = base_directory + "/netbench_simulations/{}/{}/".format(uniform_expander_name_str, traffic_generator.to_string()) + "routing_weights.txt"
 	util.write_routing_weights_file(routing_weights_filename, routing_weights)
@@ -420,7 +420,7 @@ def skewed_dragonfly_simulation():
 
 	## Traffic aware source routing (start cracking the routing weights)
 	tolerance_fairness = 0.00
-	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=1)
+	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=1, cache_dir=base_directory + "/path_selection_cache")
 	routing_weights = adaptive_router.route(skewed_dfly.get_adjacency_list(), skewed_dfly.get_switch_id_to_block_id_map(), switch_traffic_matrix)
 	routing_weights_filename = base_directory + "/netbench_simulations/{}/{}/".format(skewed_dfly_name_str, traffic_generator.to_string()) + "routing_weights.txt"
 	util.write_routing_weights_file(routing_weights_filename, routing_weights)
@@ -535,7 +535,7 @@ def skewed_expander_simulation():
 
 	## Traffic aware source routing (start cracking the routing weights)
 	tolerance_fairness = 0.00
-	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=3)
+	adaptive_router = AdaptiveRouting(tolerance_fairness, max_intrablock_distance=3, cache_dir=base_directory + "/path_selection_cache")
 	routing_weights = adaptive_router.route(skewed_expander.get_adjacency_list(), skewed_expander.get_switch_id_to_block_id_map(), switch_traffic_matrix)
 	routing_weights_filename = base_directory + "/netbench_simulations/{}/{}/".format(skewed_expander_name_str, traffic_generator.to_string()) + "routing_weights.txt"
 	util.write_routing_weights_file(routing_weights_filename, routing_weights)
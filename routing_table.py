@@ -0,0 +1,202 @@
+import numpy as np
+import scipy.sparse
+
+'''
+Array-backed storage of the routing weights of all block pairs, the compact counterpart of the
+{(src_block, dst_block) : {(switch, entry_switch) : weight}} maps returned by AdaptiveRouting.route.
+
+Every (switch, entry_switch, weight) of every block pair is one row of the parallel arrays
+	src_blocks, dst_blocks, switches, entry_switches	- int32
+	weights												- float64, as solved by the LPs
+	multiplicities										- int32, the number of links from entry_switch to dst_block : switch
+														  sends multiplicities * weights of its traffic through entry_switch
+sorted by block pair, then by switch and entry switch. Block pair k = block_pairs[k] owns the rows
+offsets[k] ... offsets[k + 1] - 1, and block pairs without weights (None in the map) own no rows and are flagged in
+has_weights.
+
+RoutingTable supports the read-only part of the dict interface (keys, items, [], in, len), where
+table[(src_block, dst_block)] returns the weights of the block pair as a map of (switch, entry_switch) to weight.
+'''
+class RoutingTable(object):
+	def __init__(self, block_pairs, has_weights, offsets, switches, entry_switches, weights, multiplicities):
+		self.block_pairs = np.asarray(block_pairs, dtype=np.int32).reshape((len(has_weights), 2))
+		self.has_weights = np.asarray(has_weights, dtype=bool)
+		self.offsets = np.asarray(offsets, dtype=np.int64)
+		self.switches = np.asarray(switches, dtype=np.int32)
+		self.entry_switches = np.asarray(entry_switches, dtype=np.int32)
+		self.weights = np.asarray(weights, dtype=np.float64)
+		self.multiplicities = np.asarray(multiplicities, dtype=np.int32)
+		rows_of_block_pairs = np.diff(self.offsets)
+		self.src_blocks = np.repeat(self.block_pairs[:, 0], rows_of_block_pairs)
+		self.dst_blocks = np.repeat(self.block_pairs[:, 1], rows_of_block_pairs)
+		self.block_pair_index = {}
+		for index in range(len(self.block_pairs)):
+			self.block_pair_index[tuple(self.block_pairs[index].tolist())] = index
+		## the rows sorted by (switch, dst_block, entry_switch), which switch_weights and lookup search through
+		self.num_switches = 1
+		if len(self.switches) > 0:
+			self.num_switches = int(max(self.switches.max(), self.entry_switches.max())) + 1
+		self.nblocks = 1
+		if len(self.block_pairs) > 0:
+			self.nblocks = int(self.block_pairs.max()) + 1
+		row_keys = self.__row_keys(self.switches, self.dst_blocks, self.entry_switches)
+		self.lookup_order = np.argsort(row_keys, kind="mergesort")
+		self.lookup_keys = row_keys[self.lookup_order]
+		return
+
+	def __row_keys(self, switches, dst_blocks, entry_switches):
+		switches = np.asarray(switches, dtype=np.int64)
+		return (switches * self.nblocks + np.asarray(dst_blocks, dtype=np.int64)) * self.num_switches + np.asarray(entry_switches, dtype=np.int64)
+
+	##########################################################################################
+	## dict-like interface
+	##########################################################################################
+	def keys(self):
+		return [tuple(x) for x in self.block_pairs.tolist()]
+
+	def items(self):
+		return [(x, self[x]) for x in self.keys()]
+
+	def __len__(self):
+		return len(self.block_pairs)
+
+	def __contains__(self, block_pair):
+		return block_pair in self.block_pair_index
+
+	def __getitem__(self, block_pair):
+		index = self.block_pair_index[block_pair]
+		if not self.has_weights[index]:
+			return None
+		start, end = self.offsets[index], self.offsets[index + 1]
+		return dict(zip(zip(self.switches[start:end].tolist(), self.entry_switches[start:end].tolist()), self.weights[start:end].tolist()))
+
+	def __repr__(self):
+		return "RoutingTable(block_pairs={}, rows={}, bytes={})".format(len(self.block_pairs), len(self.switches), self.nbytes())
+
+	##########################################################################################
+	## queries
+	##########################################################################################
+	def get_num_rows(self):
+		return len(self.switches)
+
+	## total memory held by the arrays, in bytes
+	def nbytes(self):
+		return (self.block_pairs.nbytes + self.has_weights.nbytes + self.offsets.nbytes + self.src_blocks.nbytes + self.dst_blocks.nbytes + self.switches.nbytes
+				+ self.entry_switches.nbytes + self.weights.nbytes + self.multiplicities.nbytes + self.lookup_order.nbytes + self.lookup_keys.nbytes)
+
+	## Returns the (switches, entry_switches, weights, multiplicities) arrays of the rows of the block pair, which are
+	## views into the table, or None if the block pair has no weights
+	def block_pair_rows(self, src_block, dst_block):
+		index = self.block_pair_index[(src_block, dst_block)]
+		if not self.has_weights[index]:
+			return None
+		start, end = self.offsets[index], self.offsets[index + 1]
+		return self.switches[start:end], self.entry_switches[start:end], self.weights[start:end], self.multiplicities[start:end]
+
+	## Returns the (entry_switches, weights) arrays of switch towards dst_block
+	def switch_weights(self, switch, dst_block):
+		first_key = self.__row_keys(switch, dst_block, 0)
+		start, end = np.searchsorted(self.lookup_keys, [first_key, first_key + self.num_switches])
+		rows = self.lookup_order[start:end]
+		return self.entry_switches[rows], self.weights[rows]
+
+	## Returns the weights of every (switches[i], dst_blocks[i], entry_switches[i]), or 0 where the table has no such row.
+	## The arguments are arrays (or scalars) of the same shape, or that broadcast together.
+	def lookup(self, switches, dst_blocks, entry_switches):
+		switches, dst_blocks, entry_switches = np.broadcast_arrays(np.asarray(switches, dtype=np.int64), np.asarray(dst_blocks, dtype=np.int64), np.asarray(entry_switches, dtype=np.int64))
+		in_range = (switches >= 0) & (switches < self.num_switches) & (dst_blocks >= 0) & (dst_blocks < self.nblocks) & (entry_switches >= 0) & (entry_switches < self.num_switches)
+		keys = self.__row_keys(np.where(in_range, switches, 0), np.where(in_range, dst_blocks, 0), np.where(in_range, entry_switches, 0))
+		positions = np.minimum(np.searchsorted(self.lookup_keys, keys), max(len(self.lookup_keys) - 1, 0))
+		weights = np.zeros(keys.shape, dtype=np.float64)
+		if len(self.lookup_keys) > 0:
+			found = in_range & (self.lookup_keys[positions] == keys)
+			weights[found] = self.weights[self.lookup_order[positions[found]]]
+		return weights
+
+	## Returns the (switches, dst_blocks, weight_sums) of every switch that is not an entry switch of its block pair,
+	## where weight_sums is the fraction of its traffic the switch sends out : sum_e multiplicities[e] * weights[e].
+	## The entry switches send their own traffic over their own links, so their weights do not add up to anything.
+	def weight_sums(self):
+		block_pair_ids = np.repeat(np.arange(len(self.block_pairs), dtype=np.int64), np.diff(self.offsets))
+		switch_keys = block_pair_ids * self.num_switches + self.switches
+		is_entry_switch = np.isin(switch_keys, block_pair_ids * self.num_switches + self.entry_switches)
+		unique_keys, groups = np.unique(switch_keys[~is_entry_switch], return_inverse=True)
+		sums = np.bincount(groups, weights=(self.multiplicities.astype(float) * self.weights)[~is_entry_switch], minlength=len(unique_keys))
+		return (unique_keys % self.num_switches).astype(np.int32), self.block_pairs[unique_keys // self.num_switches, 1], sums
+
+	## Raises an Exception if a weight is negative, or if the weights of a switch that is not an entry switch do not add up
+	## to 1 (see weight_sums) within tolerance
+	def validate(self, tolerance=1E-5):
+		if np.any(self.weights < 0.):
+			row = int(np.nonzero(self.weights < 0.)[0][0])
+			raise Exception("negative routing weight {} from switch {} to entry switch {} towards block {}".format(self.weights[row], self.switches[row], self.entry_switches[row], self.dst_blocks[row]))
+		switches, dst_blocks, sums = self.weight_sums()
+		invalid = np.nonzero(np.abs(sums - 1.) > tolerance)[0]
+		if len(invalid) > 0:
+			raise Exception("the routing weights of switch {} towards block {} add up to {} instead of 1".format(switches[invalid[0]], dst_blocks[invalid[0]], sums[invalid[0]]))
+		return
+
+	##########################################################################################
+	## export
+	##########################################################################################
+	## Returns the {(src_block, dst_block) : {(switch, entry_switch) : weight}} map of the routing weights
+	def to_routing_weights(self):
+		return dict(self.items())
+
+	## Returns the arrays of the table by name, the arguments of RoutingTable
+	def to_arrays(self):
+		return {"block_pairs" : self.block_pairs, "has_weights" : self.has_weights, "offsets" : self.offsets, "switches" : self.switches,
+				"entry_switches" : self.entry_switches, "weights" : self.weights, "multiplicities" : self.multiplicities}
+
+	## stores the table in a .npz file, read back with load_routing_table
+	def save(self, filename):
+		with open(filename, 'wb') as f:
+			np.savez(f, **self.to_arrays())
+		return
+
+	## writes the routing weights file read by the simulator, see routing_simulation_util.write_routing_weights_file
+	def write(self, routing_weights_filename):
+		lines = ["##switchID, targetBlock, entrySwitch, weight\n"]
+		for (switch_id, dst_block, entry_id, weight) in zip(self.switches.tolist(), self.dst_blocks.tolist(), self.entry_switches.tolist(), self.weights.tolist()):
+			lines.append("{},{},{},{:.6E}\n".format(switch_id, dst_block, entry_id, weight))
+		lines.append("\n")
+		with open(routing_weights_filename, "w+") as f:
+			f.write("".join(lines))
+		return
+
+
+## Builds the RoutingTable of routing_weights, a map of (src_block, dst_block) to a map of (switch, entry_switch) to weight
+## as returned by AdaptiveRouting.route, on the topology (adjacency list) and blocks it was routed on
+def build_routing_table(routing_weights, topology, switch_to_block_map):
+	block_pairs = sorted(routing_weights.keys())
+	has_weights = []
+	offsets = [0]
+	switches, entry_switches, weights, dst_blocks = [], [], [], []
+	for block_pair in block_pairs:
+		block_pair_routing_weights = routing_weights[block_pair]
+		has_weights.append(block_pair_routing_weights is not None)
+		if block_pair_routing_weights is not None:
+			for (switch, entry_switch) in sorted(block_pair_routing_weights.keys()):
+				switches.append(switch)
+				entry_switches.append(entry_switch)
+				weights.append(block_pair_routing_weights[(switch, entry_switch)])
+			dst_blocks.extend([block_pair[1]] * len(block_pair_routing_weights))
+		offsets.append(len(switches))
+
+	## the number of links from every switch to every block
+	num_switches = max(max(topology.keys()), max(switch_to_block_map.keys())) + 1
+	nblocks = max(switch_to_block_map.values()) + 1
+	link_switches, link_blocks = [], []
+	for switch in topology.keys():
+		link_switches.extend([switch] * len(topology[switch]))
+		link_blocks.extend([switch_to_block_map[x] for x in topology[switch]])
+	links_to_blocks = scipy.sparse.csr_matrix((np.ones(len(link_switches)), (link_switches, link_blocks)), shape=(num_switches, nblocks))
+	multiplicities = np.zeros(len(switches), dtype=np.int32)
+	if len(switches) > 0:
+		multiplicities = np.asarray(links_to_blocks[entry_switches, dst_blocks]).ravel()
+	return RoutingTable(np.array(block_pairs, dtype=np.int32).reshape((len(block_pairs), 2)), has_weights, offsets, switches, entry_switches, weights, multiplicities)
+
+## reads a RoutingTable stored by RoutingTable.save
+def load_routing_table(filename):
+	with np.load(filename) as arrays:
+		return RoutingTable(arrays["block_pairs"], arrays["has_weights"], arrays["offsets"], arrays["switches"], arrays["entry_switches"], arrays["weights"], arrays["multiplicities"])
@@ -0,0 +1,240 @@
+import numpy as np
+import scipy.sparse
+from routing_simulation_util import ROUTING
+from link_load_evaluator import LinkLoadEvaluator
+from adaptive_routing import AdaptiveRouting
+
+'''
+Fluid model of the routing schemes of routing_simulation_util.ROUTING, to find the load level at which a routing
+saturates without sweeping load levels in Netbench. Traffic is a fluid that splits at every switch as the routing
+would split its flows, and the saturation load is the load level at which the most utilized link reaches its capacity,
+i.e. the inverse of the maximum link utilization at unit demand. At unit demand, the traffic matrix is scaled so that
+the average switch injects one unit of traffic, and every link carries one unit of capacity.
+	ECMP				- every switch splits the traffic towards a destination evenly across its links on the shortest
+						  paths to the destination
+	SIMPLE_FORWARDING	- every switch forwards the traffic towards a destination over its first link (lowest neighbor
+						  id) on the shortest paths to the destination
+	BLOCK_VALIANT		- the traffic between two blocks goes through a switch picked uniformly in a random other block,
+						  with ECMP to it and then to the destination. The traffic within a block uses ECMP.
+	UGAL_G				- a mix of ECMP and BLOCK_VALIANT, where the fraction of the traffic sent along the non minimal
+						  paths minimizes the maximum utilization of all links (global knowledge)
+	UGAL_L				- the same mix, with the fraction minimizing the maximum utilization of the first hops only,
+						  which is all the source switch sees of the network (local knowledge)
+	TRAFFIC_AWARE_SRC	- the routing weights of AdaptiveRouting, see LinkLoadEvaluator
+Both UGAL variants use a single fraction for all the traffic, so they approximate the adaptive schemes from below when
+the best fraction differs across the network.
+The hop-by-hop schemes route the traffic towards a chunk of destinations at a time, over the shortest path DAG of each :
+the traffic at every switch is pushed over its links with sparse matrix products, one round per hop.
+'''
+class FluidModel(object):
+	## topology - the adjacency list of the whole network
+	## switch_to_block_map - the block of every switch
+	## chunk_size - (optional) the number of destinations routed together, defaults to about 4 million (link, destination)
+	##				pairs at a time
+	def __init__(self, topology, switch_to_block_map, chunk_size=None):
+		self.evaluator = LinkLoadEvaluator(topology, switch_to_block_map)
+		evaluator = self.evaluator
+		self.num_switches = evaluator.num_switches
+		self.nblocks = evaluator.nblocks
+		self.switch_block_ids = evaluator.switch_block_ids
+		self.block_sizes = np.bincount(self.switch_block_ids, minlength=self.nblocks)
+		self.link_switches = evaluator.link_switches
+		self.link_neighbors = evaluator.link_neighbors
+		self.link_capacities = evaluator.link_capacities
+		num_links = len(self.link_capacities)
+		self.chunk_size = chunk_size
+		if chunk_size is None:
+			self.chunk_size = max(1, int(4000000 // max(1, num_links)))
+		ones = np.ones(num_links)
+		## outgoing[u, l] (incoming[v, l]) is 1 if the link l leaves u (enters v)
+		self.outgoing = scipy.sparse.csr_matrix((ones, (self.link_switches, np.arange(num_links))), shape=(self.num_switches, num_links))
+		self.incoming = scipy.sparse.csr_matrix((ones, (self.link_neighbors, np.arange(num_links))), shape=(self.num_switches, num_links))
+		self.adjacency = scipy.sparse.csr_matrix((ones, (self.link_switches, self.link_neighbors)), shape=(self.num_switches, self.num_switches))
+		## the index of the first link of the switch of every link, the links being sorted by switch
+		self.first_link_of_switch = np.searchsorted(self.link_switches, self.link_switches)
+		self.block_indicator = scipy.sparse.csr_matrix((np.ones(self.num_switches), (np.arange(self.num_switches), self.switch_block_ids)), shape=(self.num_switches, self.nblocks))
+		return
+
+	def get_links(self):
+		return self.evaluator.get_links()
+
+	## the traffic matrix as a numpy array or a CSC matrix, whose columns can be sliced
+	def __traffic_matrix(self, switch_to_switch_traffic_matrix):
+		if scipy.sparse.issparse(switch_to_switch_traffic_matrix):
+			return scipy.sparse.csc_matrix(switch_to_switch_traffic_matrix, dtype=float)
+		return np.asarray(switch_to_switch_traffic_matrix, dtype=float)
+
+	def __columns(self, traffic_matrix, columns):
+		if scipy.sparse.issparse(traffic_matrix):
+			return traffic_matrix[:, columns].toarray()
+		return traffic_matrix[:, columns]
+
+	def __dense(self, matrix):
+		if scipy.sparse.issparse(matrix):
+			return matrix.toarray()
+		return np.asarray(matrix)
+
+	## sums the traffic matrix over axis, as a flat numpy array
+	def __sum(self, traffic_matrix, axis):
+		return np.asarray(traffic_matrix.sum(axis=axis)).ravel()
+
+	## Returns the (num_switches x len(destinations)) hop distances from every switch to the destinations (inf if
+	## unreachable), with a BFS from all the destinations at once : a switch is one hop farther than its closest neighbor
+	def _distances_to(self, destinations):
+		distances = np.full((self.num_switches, len(destinations)), np.inf)
+		distances[destinations, np.arange(len(destinations))] = 0.
+		frontier = np.zeros((self.num_switches, len(destinations)))
+		frontier[destinations, np.arange(len(destinations))] = 1.
+		distance = 0
+		while True:
+			distance += 1
+			reached = (self.adjacency.dot(frontier) > 0.) & np.isinf(distances)
+			if not np.any(reached):
+				return distances
+			distances[reached] = distance
+			frontier = reached.astype(float)
+
+	## Routes the traffic given by demand_columns hop by hop along the shortest paths to the destinations. demand_columns
+	## maps an array of destinations to the (num_switches x len(destinations)) traffic towards them.
+	## Returns the load of every link, and the load of every link from the traffic injected at its own switch (first hops)
+	## first_hop_columns - (optional) the part of the demand that counts as injected, same as demand_columns by default
+	def _route_to_destinations(self, demand_columns, single_path=False, first_hop_columns=None):
+		loads = np.zeros(len(self.link_capacities))
+		first_hop_loads = np.zeros(len(self.link_capacities))
+		for start in range(0, self.num_switches, self.chunk_size):
+			destinations = np.arange(start, min(self.num_switches, start + self.chunk_size))
+			demand = demand_columns(destinations)
+			if not np.any(demand > 0.):
+				continue
+			distances = self._distances_to(destinations)
+			link_distances = distances[self.link_switches]
+			## split[l, d] is the fraction of the traffic towards d at the switch of l that goes over l
+			on_shortest_paths = distances[self.link_neighbors] == link_distances - 1.
+			if single_path:
+				counts = np.cumsum(on_shortest_paths, axis=0)
+				counts_before_switch = np.vstack((np.zeros((1, len(destinations)), dtype=counts.dtype), counts))[self.first_link_of_switch]
+				split = (on_shortest_paths & (counts - counts_before_switch == 1)).astype(float)
+			else:
+				split = on_shortest_paths * self.link_capacities[:, np.newaxis]
+				next_hops = self.outgoing.dot(split)
+				next_hops[next_hops == 0.] = 1.
+				split /= next_hops[self.link_switches]
+			if first_hop_columns is None:
+				first_hop_loads += (demand[self.link_switches] * split).sum(axis=1)
+			else:
+				first_hop_loads += (first_hop_columns(destinations)[self.link_switches] * split).sum(axis=1)
+			reachable_distances = link_distances[on_shortest_paths]
+			if len(reachable_distances) == 0:
+				continue
+			## the traffic through every switch, i.e. its own plus what its neighbors push to it. The shortest path DAGs
+			## have no cycles, so after k rounds it is exact at the switches k hops or less from the farthest ones.
+			traffic = demand
+			for _ in range(int(reachable_distances.max()) - 1):
+				traffic = demand + self.incoming.dot(traffic[self.link_switches] * split)
+			loads += (traffic[self.link_switches] * split).sum(axis=1)
+		return loads, first_hop_loads
+
+	## Returns the (loads, first_hop_loads) of ECMP, or of single path forwarding, see _route_to_destinations
+	def minimal_link_loads(self, switch_to_switch_traffic_matrix, single_path=False):
+		traffic_matrix = self.__traffic_matrix(switch_to_switch_traffic_matrix)
+		return self._route_to_destinations(lambda destinations: self.__columns(traffic_matrix, destinations), single_path=single_path)
+
+	## Returns the (loads, first_hop_loads) of BLOCK_VALIANT. Phase 1 carries the traffic between blocks to the
+	## intermediate switches, and phase 2 from them to the destinations, along with the traffic within blocks.
+	def valiant_link_loads(self, switch_to_switch_traffic_matrix):
+		traffic_matrix = self.__traffic_matrix(switch_to_switch_traffic_matrix)
+		if self.nblocks < 3:
+			## no block to go through
+			return self.minimal_link_loads(traffic_matrix)
+		blocks = self.switch_block_ids
+		## an intermediate switch m is picked with probability 1 / ((nblocks - 2) * size of its block)
+		intermediate_probabilities = 1. / ((self.nblocks - 2) * self.block_sizes[blocks].astype(float))
+		traffic_sent_to_each_block = self.__dense(self.block_indicator.T.dot(traffic_matrix.T)).T
+		interblock_traffic_sent = traffic_sent_to_each_block.sum(axis=1) - traffic_sent_to_each_block[np.arange(self.num_switches), blocks]
+
+		## phase 1 : the traffic from s to m is the traffic from s to the blocks other than the blocks of s and m
+		def phase_1_demand(intermediate_switches):
+			intermediate_blocks = blocks[intermediate_switches]
+			demand = (interblock_traffic_sent[:, np.newaxis] - traffic_sent_to_each_block[:, intermediate_blocks]) * intermediate_probabilities[intermediate_switches]
+			return demand * (blocks[:, np.newaxis] != intermediate_blocks)
+
+		## phase 2 : the traffic from m to d is the traffic to d from the blocks other than the blocks of m and d
+		def phase_2_demand(destinations):
+			traffic = self.__columns(traffic_matrix, destinations)
+			traffic_from_each_block = np.asarray(self.block_indicator.T.dot(traffic))
+			destination_blocks = blocks[destinations]
+			interblock_traffic_received = traffic.sum(axis=0) - traffic_from_each_block[destination_blocks, np.arange(len(destinations))]
+			is_same_block = blocks[:, np.newaxis] == destination_blocks
+			demand = (interblock_traffic_received - traffic_from_each_block[blocks]) * intermediate_probabilities[:, np.newaxis]
+			return np.where(is_same_block, traffic, demand)
+
+		## only the traffic within blocks leaves its source switch in phase 2
+		intrablock_demand = lambda destinations: self.__columns(traffic_matrix, destinations) * (blocks[:, np.newaxis] == blocks[destinations])
+		phase_1_loads, phase_1_first_hop_loads = self._route_to_destinations(phase_1_demand)
+		phase_2_loads, intrablock_first_hop_loads = self._route_to_destinations(phase_2_demand, first_hop_columns=intrablock_demand)
+		return phase_1_loads + phase_2_loads, phase_1_first_hop_loads + intrablock_first_hop_loads
+
+	## Returns the fraction in [0, 1] of the traffic sent along valiant, mixed with minimal, that minimizes the maximum
+	## utilization. The maximum of the utilizations, which are linear in the fraction, is convex : ternary search.
+	def _best_mixture(self, minimal_utilizations, valiant_utilizations):
+		max_utilization = lambda fraction: ((1. - fraction) * minimal_utilizations + fraction * valiant_utilizations).max()
+		low, high = 0., 1.
+		for _ in range(100):
+			fraction_1 = low + (high - low) / 3.
+			fraction_2 = high - (high - low) / 3.
+			if max_utilization(fraction_1) <= max_utilization(fraction_2):
+				high = fraction_2
+			else:
+				low = fraction_1
+		return 0.5 * (low + high)
+
+	## Returns the load of every link (in the order of get_links) under routing_class
+	## routing_weights - (TRAFFIC_AWARE_SRC only) the routing weights of AdaptiveRouting.route, computed with
+	##					 tolerance_fairness if not given
+	def link_loads(self, routing_class, switch_to_switch_traffic_matrix, routing_weights=None, tolerance_fairness=0.):
+		if routing_class == ROUTING.ECMP:
+			return self.minimal_link_loads(switch_to_switch_traffic_matrix)[0]
+		elif routing_class == ROUTING.SIMPLE_FORWARDING:
+			return self.minimal_link_loads(switch_to_switch_traffic_matrix, single_path=True)[0]
+		elif routing_class == ROUTING.BLOCK_VALIANT:
+			return self.valiant_link_loads(switch_to_switch_traffic_matrix)[0]
+		elif routing_class == ROUTING.UGAL_G or routing_class == ROUTING.UGAL_L:
+			minimal_loads, minimal_first_hop_loads = self.minimal_link_loads(switch_to_switch_traffic_matrix)
+			valiant_loads, valiant_first_hop_loads = self.valiant_link_loads(switch_to_switch_traffic_matrix)
+			if routing_class == ROUTING.UGAL_G:
+				fraction = self._best_mixture(minimal_loads / self.link_capacities, valiant_loads / self.link_capacities)
+			else:
+				fraction = self._best_mixture(minimal_first_hop_loads / self.link_capacities, valiant_first_hop_loads / self.link_capacities)
+			return (1. - fraction) * minimal_loads + fraction * valiant_loads
+		elif routing_class == ROUTING.TRAFFIC_AWARE_SRC:
+			if routing_weights is None:
+				router = AdaptiveRouting(tolerance_fairness)
+				routing_weights = router.route(self.evaluator.topology, self.evaluator.switch_to_block_map, switch_to_switch_traffic_matrix)
+			incidence, demands = self.evaluator.flow_classes(routing_weights, switch_to_switch_traffic_matrix)
+			return self.evaluator.link_loads(incidence, demands)
+		raise Exception("Unrecognized routing class")
+
+	## Returns the utilization of every link (in the order of get_links) at unit demand under routing_class, see link_loads
+	def link_utilizations(self, routing_class, switch_to_switch_traffic_matrix, routing_weights=None, tolerance_fairness=0.):
+		total_traffic = self.__sum(self.__traffic_matrix(switch_to_switch_traffic_matrix), None)
+		if total_traffic <= 0.:
+			return np.zeros(len(self.link_capacities))
+		loads = self.link_loads(routing_class, switch_to_switch_traffic_matrix, routing_weights=routing_weights, tolerance_fairness=tolerance_fairness)
+		return loads * (self.num_switches / total_traffic) / self.link_capacities
+
+	## Returns the saturation load of routing_class, in the load levels of routing_simulator : every server injects
+	## load_level * injection_link_capacity, spread across destinations as in the traffic matrix, and every network link
+	## carries network_link_capacity. Returns inf if no link carries traffic.
+	def saturation_load(self, routing_class, switch_to_switch_traffic_matrix, routing_weights=None, tolerance_fairness=0., network_link_capacity=1., injection_link_capacity=1., concentration=1):
+		max_utilization = self.link_utilizations(routing_class, switch_to_switch_traffic_matrix, routing_weights=routing_weights, tolerance_fairness=tolerance_fairness).max()
+		if max_utilization <= 0.:
+			return float("inf")
+		return float(network_link_capacity) / (injection_link_capacity * concentration * max_utilization)
+
+
+## Returns the saturation load of routing_class on topology (a UniformGroupDragonfly, SkewedGroupExpander, ...) under the
+## traffic matrix, see FluidModel.saturation_load
+def estimate_saturation_load(topology, switch_to_switch_traffic_matrix, routing_class, routing_weights=None, tolerance_fairness=0., network_link_capacity=1., injection_link_capacity=1., concentration=1):
+	model = FluidModel(topology.get_adjacency_list(), topology.get_switch_id_to_block_id_map())
+	return model.saturation_load(routing_class, switch_to_switch_traffic_matrix, routing_weights=routing_weights, tolerance_fairness=tolerance_fairness,
+								network_link_capacity=network_link_capacity, injection_link_capacity=injection_link_capacity, concentration=concentration)
@@ -0,0 +1,124 @@
+import numpy as np
+from lp_solver import LinearProgram
+
+'''
+The LP of AdaptiveRouting._split_traffic_between_block_pair, which splits the traffic from the switches of src_block
+towards dst_block across the entry switches :
+	minimize	sum_{s, e} traffic[s] * distance[s][e] * w[s][e]
+	subject to	sum_{e in entry_switches, e != s} w[s][e] == 1								for every switch s of src_block
+				sum_{s not in entry_switches} traffic[s] * w[s][e] <= fair_share * (1 + sigma) - traffic[e]	for every entry switch e
+				0 <= w[s][e] <= 1
+The variables and the sparsity of the constraints only depend on the entry switches and on the distances to them,
+while the traffic only shows up in the coefficients. So the LP is built once per block pair, and solving it for a new
+traffic matrix only patches the objective, the capacity coefficients and the right hand sides in place. With
+warm_start the solver keeps its model, and re-optimizes from the basis of the previous traffic matrix.
+
+An entry switch listed k times in entry_switches (k links to dst_block) counts k times in the weight sums, and only has
+one capacity row, the k identical rows being redundant.
+'''
+class SplitLPTemplate(object):
+	def __init__(self, src_block, dst_block, block_switches, entry_switches, distance_to_entry_switches):
+		self.src_block = src_block
+		self.dst_block = dst_block
+		self.layout = SplitLPLayout(dst_block, block_switches, entry_switches, distance_to_entry_switches)
+		layout = self.layout
+		self.model = LinearProgram("split traffic between blocks : {} - {}".format(src_block, dst_block))
+		self.variables = self.model.add_variables(len(layout.variable_sources), 0., 1., 0.)
+		layout.add_weight_sum_constraints(self.model, self.variables)
+
+		## Constraints type 2 : utilization of interblock links have to be more or less equal, one row per entry switch.
+		## Only the switches that are not entry switches load the links of the entry switches, the volume from the entry
+		## switch itself is moved to the right hand side. The coefficients are set by solve.
+		self.capacity_sources = layout.variable_sources[layout.in_capacity]
+		self.capacity_constraints = self.model.add_constraints(layout.entry_indices[layout.in_capacity], self.variables[layout.in_capacity], np.zeros(len(self.capacity_sources)), "<=", np.zeros(len(layout.unique_entry_switches)))
+		return
+
+	## whether the LP of this template is still the LP for the given entry switches and distances
+	def matches(self, block_switches, entry_switches, distance_to_entry_switches):
+		return self.layout.matches(block_switches, entry_switches, distance_to_entry_switches)
+
+	## Patches the traffic into the LP and solves it.
+	## Returns the routing weights as a map of (src_switch, entry_switch) to weight, or None if no optimal solution was found
+	def solve(self, total_capacity_between_blocks, traffic_sent_from_each_switch, sigma, backend=None, threads=None, warm_start=False):
+		layout = self.layout
+		traffic = np.array([traffic_sent_from_each_switch[x] for x in layout.block_switches], dtype=float)
+		traffic_sum_from_src_block = 0.
+		for switch in traffic_sent_from_each_switch.keys():
+			traffic_sum_from_src_block += traffic_sent_from_each_switch[switch]
+		optimal_fair_share = traffic_sum_from_src_block / float(total_capacity_between_blocks)
+		self.model.set_objective(traffic[layout.variable_sources] * layout.variable_distances)
+		self.model.set_constraint_coefficients(self.capacity_constraints, traffic[self.capacity_sources])
+		self.model.set_constraint_rhs(self.capacity_constraints, optimal_fair_share * (1. + sigma) - traffic[layout.entry_switch_positions])
+		solution = self.model.solve(backend=backend, threads=threads, warm_start=warm_start)
+		if solution is None:
+			return None
+		return layout.routing_weights(solution[self.variables])
+
+
+'''
+The variables of the split LP of one block pair, and which of them take part in which constraints, as flat arrays.
+Variable i is the weight from the switch block_switches[variable_sources[i]] to the entry switch
+variable_entry_switches[i], which is variable_distances[i] hops away. entry_indices[i] is the index of that entry switch
+in unique_entry_switches, which is listed multiplicities[entry_indices[i]] times in entry_switches.
+Raises a KeyError, like indexing a missing weight would, if some switch cannot reach an entry switch it has to weigh.
+'''
+class SplitLPLayout(object):
+	def __init__(self, dst_block, block_switches, entry_switches, distance_to_entry_switches):
+		self.dst_block = dst_block
+		self.block_switches = list(block_switches)
+		self.entry_switches = list(entry_switches)
+		self.variable_sources, self.variable_entry_switches, self.variable_distances = split_lp_variables(dst_block, block_switches, distance_to_entry_switches)
+		block_switch_ids = np.asarray(block_switches, dtype=np.int64)
+		self.variable_source_switches = block_switch_ids[self.variable_sources]
+		self.unique_entry_switches, self.multiplicities = np.unique(np.asarray(entry_switches, dtype=np.int64), return_counts=True)
+		## the position of every entry switch in block_switches
+		self.entry_switch_positions = np.array([self.block_switches.index(x) for x in self.unique_entry_switches.tolist()], dtype=np.int64)
+		self.is_entry_switch = np.isin(block_switch_ids, self.unique_entry_switches)
+		self.entry_indices = np.minimum(np.searchsorted(self.unique_entry_switches, self.variable_entry_switches), len(self.unique_entry_switches) - 1)
+		is_listed_entry_switch = self.unique_entry_switches[self.entry_indices] == self.variable_entry_switches
+		## the variables in the weight sum of their switch, i.e. those to the entry switches other than the switch itself
+		self.in_weight_sum = is_listed_entry_switch & (self.variable_source_switches != self.variable_entry_switches)
+		## the variables that load the links of their entry switch, i.e. those of the switches that are not entry switches
+		self.in_capacity = is_listed_entry_switch & ~self.is_entry_switch[self.variable_sources]
+		reached_entry_switches = np.bincount(self.variable_sources[self.in_weight_sum], minlength=len(block_switches))
+		required_entry_switches = len(self.unique_entry_switches) - self.is_entry_switch.astype(np.int64)
+		if np.any(reached_entry_switches != required_entry_switches):
+			src_switch = block_switches[int(np.nonzero(reached_entry_switches != required_entry_switches)[0][0])]
+			min_path_lengths = distance_to_entry_switches[(src_switch, dst_block)]
+			raise KeyError((src_switch, [x for x in entry_switches if x != src_switch and x not in min_path_lengths][0]))
+		return
+
+	def get_num_variables(self):
+		return len(self.variable_sources)
+
+	## whether this is still the layout for the given entry switches and distances
+	def matches(self, block_switches, entry_switches, distance_to_entry_switches):
+		if list(block_switches) != self.block_switches or list(entry_switches) != self.entry_switches:
+			return False
+		variable_sources, variable_entry_switches, variable_distances = split_lp_variables(self.dst_block, block_switches, distance_to_entry_switches)
+		return np.array_equal(variable_sources, self.variable_sources) and np.array_equal(variable_entry_switches, self.variable_entry_switches) and np.array_equal(variable_distances, self.variable_distances)
+
+	## Constraints type 1 : all routing weights have to add to 1, one row per switch of src_block.
+	## An entry switch listed k times counts k times in the weight sums.
+	def add_weight_sum_constraints(self, model, variables):
+		return model.add_constraints(self.variable_sources[self.in_weight_sum], variables[self.in_weight_sum], self.multiplicities[self.entry_indices[self.in_weight_sum]], "==", np.ones(len(self.block_switches)))
+
+	## maps the values of the variables to a map of (src_switch, entry_switch) to weight
+	def routing_weights(self, values):
+		return dict(zip(zip(self.variable_source_switches.tolist(), self.variable_entry_switches.tolist()), np.asarray(values).tolist()))
+
+
+## Lays out the variables of the split LP as flat arrays, in the order of block_switches and then of the reachable
+## entry switches : variable i is the weight from block_switches[variable_sources[i]] to the entry switch
+## variable_entry_switches[i], which is variable_distances[i] hops away
+def split_lp_variables(dst_block, block_switches, distance_to_entry_switches):
+	num_entry_switches = np.zeros(len(block_switches), dtype=np.int64)
+	entry_switch_arrays = []
+	distance_arrays = []
+	for index in range(len(block_switches)):
+		min_path_lengths = distance_to_entry_switches[(block_switches[index], dst_block)] ## min path length to ALL reachable entry switches
+		num_entry_switches[index] = len(min_path_lengths)
+		entry_switch_arrays.append(np.fromiter(min_path_lengths.keys(), dtype=np.int64, count=len(min_path_lengths)))
+		distance_arrays.append(np.fromiter(min_path_lengths.values(), dtype=float, count=len(min_path_lengths)))
+	variable_sources = np.repeat(np.arange(len(block_switches)), num_entry_switches)
+	return variable_sources, np.concatenate(entry_switch_arrays), np.concatenate(distance_arrays)
@@ -0,0 +1,85 @@
+import sys, os, copy, unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import numpy as np
+from adaptive_routing import AdaptiveRouting
+
+'''
+AdaptiveRouting.update_topology on a 4-block mesh, where the switches of a block form a ring and every pair of blocks is
+connected by a single link.
+'''
+NUM_BLOCKS = 4
+SWITCHES_PER_BLOCK = 4
+
+def build_mesh():
+	topology = dict([(x, []) for x in range(NUM_BLOCKS * SWITCHES_PER_BLOCK)])
+	switch_to_block_map = dict([(x, x // SWITCHES_PER_BLOCK) for x in topology.keys()])
+	for block in range(NUM_BLOCKS):
+		for index in range(SWITCHES_PER_BLOCK):
+			switch = block * SWITCHES_PER_BLOCK + index
+			neighbor = block * SWITCHES_PER_BLOCK + (index + 1) % SWITCHES_PER_BLOCK
+			topology[switch].append(neighbor)
+			topology[neighbor].append(switch)
+	## block i connects to block j through switch j - 1 of block i (and switch i of block j)
+	interblock_links = []
+	for block1 in range(NUM_BLOCKS):
+		for block2 in range(block1 + 1, NUM_BLOCKS):
+			switch1 = block1 * SWITCHES_PER_BLOCK + block2 - 1
+			switch2 = block2 * SWITCHES_PER_BLOCK + block1
+			topology[switch1].append(switch2)
+			topology[switch2].append(switch1)
+			interblock_links.append((switch1, switch2))
+	return topology, switch_to_block_map, interblock_links
+
+def build_traffic_matrix(num_switches):
+	traffic_matrix = np.random.RandomState(0).rand(num_switches, num_switches)
+	np.fill_diagonal(traffic_matrix, 0.)
+	return traffic_matrix
+
+class UpdateTopologyTest(unittest.TestCase):
+	def setUp(self):
+		self.topology, self.switch_to_block_map, self.interblock_links = build_mesh()
+		self.traffic_matrix = build_traffic_matrix(len(self.topology))
+		self.router = AdaptiveRouting(0.1)
+		self.routing_weights = self.router.route(copy.deepcopy(self.topology), self.switch_to_block_map, self.traffic_matrix)
+
+	def snapshot(self):
+		state = self.router.routing_state
+		return copy.deepcopy((state["topology"], state["inter_block_entrance_switches"], state["interblock_connectivity"].tolist(), state["distance_to_entry_switches"], state["routing_weights"]))
+
+	def test_removing_every_link_of_a_block_pair_is_rejected(self):
+		before = self.snapshot()
+		with self.assertRaises(ValueError):
+			self.router.update_topology([], [self.interblock_links[0]], self.traffic_matrix)
+		self.assertEqual(self.snapshot(), before)
+
+	def test_unknown_removed_link_is_rejected(self):
+		before = self.snapshot()
+		## the first link is valid, the second one does not exist
+		with self.assertRaises(ValueError):
+			self.router.update_topology([], [(0, 1), (0, 2)], self.traffic_matrix)
+		with self.assertRaises(ValueError):
+			self.router.update_topology([], [(0, 1), (0, 1)], self.traffic_matrix)
+		self.assertEqual(self.snapshot(), before)
+
+	def test_unknown_switch_is_rejected(self):
+		before = self.snapshot()
+		with self.assertRaises(ValueError):
+			self.router.update_topology([(0, len(self.topology))], [], self.traffic_matrix)
+		self.assertEqual(self.snapshot(), before)
+
+	def test_removing_a_link_of_a_block_pair_with_a_spare_link(self):
+		(switch1, switch2) = self.interblock_links[0]
+		spare_link = (switch1 + 1, switch2 + 1)
+		routing_weights = self.router.update_topology([spare_link], [(switch1, switch2)], self.traffic_matrix)
+		self.topology[switch1].remove(switch2)
+		self.topology[switch2].remove(switch1)
+		self.topology[spare_link[0]].append(spare_link[1])
+		self.topology[spare_link[1]].append(spare_link[0])
+		expected_routing_weights = AdaptiveRouting(0.1).route(self.topology, self.switch_to_block_map, self.traffic_matrix)
+		self.assertEqual(sorted(routing_weights.keys()), sorted(expected_routing_weights.keys()))
+		for block_pair in expected_routing_weights.keys():
+			for key in expected_routing_weights[block_pair].keys():
+				self.assertAlmostEqual(routing_weights[block_pair][key], expected_routing_weights[block_pair][key], places=6)
+
+if __name__ == "__main__":
+	unittest.main()
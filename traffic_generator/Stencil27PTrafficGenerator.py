@@ -3,13 +3,14 @@ sys.path.append('../')
 import UniformGroupDragonfly
 import numpy as np
 import copy
+from traffic_matrix_util import coo_traffic_matrix
 
 class Stencil27PTrafficGenerator(TrafficGenerator.TrafficGenerator):
 	'''
 	# nx - a tuple or list of number of entries in each dimension
 	'''
-	def __init__(self, topology, dimensions):
-		TrafficGenerator.TrafficGenerator.__init__(self, topology)
+	def __init__(self, topology, dimensions, sparse=False):
+		TrafficGenerator.TrafficGenerator.__init__(self, topology, sparse=sparse)
 		assert(len(dimensions) == 3)
 		self.dimensions = dimensions
 		self.total_grid_points = 1
@@ -28,38 +29,6 @@ class Stencil27PTrafficGenerator(TrafficGenerator.TrafficGenerator):
 			str_builder += "\n"
 		print(str_builder)
 
-	'''
-	Given a orig_size x orig_size matrix, rescales it to a new_size x new_size matrix
-	'''
-	def _rescale_square_matrix(self, orig_matrix, new_size):
-		orig_size = len(orig_matrix)
-		# if new_size is the same as original size, then do nothing
-		if (new_size == orig_size):
-			return orig_matrix
-		new_matrix = [0] * new_size
-		for i in range(new_size):
-			new_matrix[i] = [0] * new_size
-		if new_size > orig_size:
-			ratio = float(new_size) / float(orig_size)
-			for i in range(new_size):
-				x_val = int(float(i) / ratio)
-				for j in range(new_size):
-					y_val = int(float(j) / ratio)
-					#print "(i, j) = ({}, {})".format(i, j)
-					#print "(x_val, y_val) = ({}, {})".format(x_val, y_val)
-					new_matrix[i][j] = orig_matrix[x_val][y_val] / (ratio * ratio)
-		else:
-			# compression
-			ratio = float(orig_size) / float(new_size)
-			for i in range(orig_size):
-				x_val = int(float(i) / ratio)
-				for j in range(orig_size):
-					y_val = int(float(j) / ratio)
-					new_matrix[x_val][y_val] += orig_matrix[i][j]
-		for i in range(new_size):
-			new_matrix[i][i] = 0.
-		return new_matrix
-
 	def __increment_grid_point(self, current_point, dimensions):
 		next_point = list(copy.deepcopy(current_point))
 		current_dim = 2
@@ -135,24 +104,23 @@ class Stencil27PTrafficGenerator(TrafficGenerator.TrafficGenerator):
 	def generate_traffic(self):
 		num_switches = self.topology.get_total_num_switches()
 		num_blocks = self.topology.get_num_blocks()
-		## Step 1 : initialize the node to node traffic matrix, which is different from the final switch to switch traffic matrix
-		n2n_tm = np.zeros((self.total_grid_points, self.total_grid_points))
+		## Step 1 : initialize the node to node traffic matrix, which is different from the final switch to switch traffic matrix.
+		## Every node only talks to its (at most 26) neighbors, so it is built sparse
 		neighbors_of_node = self._find_neighbors_in_grids()
+		n2n_src_nodes, n2n_dst_nodes = [], []
 		for src_node in neighbors_of_node.keys():
 			all_neighbors = neighbors_of_node[src_node]
 			for neighbor_node in all_neighbors:
 				if neighbor_node != src_node:
-					n2n_tm[neighbor_node][src_node] += 1.
-		#self.print_matrix(n2n_tm)
+					n2n_src_nodes.append(neighbor_node)
+					n2n_dst_nodes.append(src_node)
+		n2n_tm = coo_traffic_matrix(n2n_src_nodes, n2n_dst_nodes, np.ones(len(n2n_src_nodes)), self.total_grid_points)
+		#self.print_matrix(n2n_tm.toarray())
 		## Step 2 : convert the node 2 node TM into a switch to switch TM.
 		traffic_matrix = self._rescale_square_matrix(n2n_tm, num_switches)
 		## Step 3 : finally, normalize the traffic matrix
-		traffic_sum = sum([sum(x) for x in traffic_matrix])
-		for i in range(num_switches):
-			for j in range(num_switches):
-				traffic_matrix[i][j] /= traffic_sum
-
-		return traffic_matrix
+		traffic_matrix = traffic_matrix / traffic_matrix.sum()
+		return self._finish_traffic_matrix(traffic_matrix)
 
 	def to_string(self):
 		return "stencil27P_{}_{}_{}".format(self.dimensions[0], self.dimensions[1], self.dimensions[2])
@@ -5,6 +5,7 @@ import TrafficGenerator, sys, os, math, copy, random
 sys.path.append('../')
 import UniformGroupDragonfly
 import numpy as np
+from traffic_matrix_util import coo_traffic_matrix
 #import matplotlib as mpl
 #import matplotlib.pyplot as plt
 #import matplotlib.image as img
@@ -15,8 +16,8 @@ import numpy as np
 SEED = 12538
 
 class TraceBasedTrafficGenerator(TrafficGenerator.TrafficGenerator):
-	def __init__(self, topology, trace_files, trace_alias, randomize_job_mapping=False):
-		TrafficGenerator.TrafficGenerator.__init__(self, topology)
+	def __init__(self, topology, trace_files, trace_alias, randomize_job_mapping=False, sparse=False):
+		TrafficGenerator.TrafficGenerator.__init__(self, topology, sparse=sparse)
 		self.trace_file_list = trace_files
 		self.trace_aliases = trace_alias
 		assert(len(trace_files) == len(trace_alias))
@@ -73,7 +74,6 @@ class TraceBasedTrafficGenerator(TrafficGenerator.TrafficGenerator):
 			total_ranks += len(traffic_entries.keys())
 			trace_traffic_entries.append(traffic_entries)
 		all_global_ranks_vector = range(total_ranks)	
-		rank2rank_tm = np.zeros((total_ranks, total_ranks))
 		if self.randomize_job_mapping:
 			random.seed(SEED)
 			random.shuffle(all_global_ranks_vector)
@@ -90,20 +90,22 @@ class TraceBasedTrafficGenerator(TrafficGenerator.TrafficGenerator):
 				trace_rank_pairs_to_global_rank_map[trace_rank_pair] = global_id
 				offset += 1
 
-		## finally, go and occupy the traffic matrix
+		## finally, go and occupy the traffic matrix. It only holds the rank pairs that appear in the traces, so it is
+		## built sparse : a dense total_ranks x total_ranks matrix does not fit in memory for large traces
+		src_ranks, dst_ranks, traffic_sizes = [], [], []
 		for trace_id in range(len(self.trace_file_list)):
 			for rank in range(len(trace_traffic_entries[trace_id].keys())):
 				src = trace_rank_pairs_to_global_rank_map[(trace_id, rank)]
 				for dst_rank in trace_traffic_entries[trace_id][rank].keys():
 					dst = trace_rank_pairs_to_global_rank_map[(trace_id, dst_rank)]
-					rank2rank_tm[src][dst] = trace_traffic_entries[trace_id][rank][dst_rank]
+					src_ranks.append(src)
+					dst_ranks.append(dst)
+					traffic_sizes.append(trace_traffic_entries[trace_id][rank][dst_rank])
+		rank2rank_tm = coo_traffic_matrix(src_ranks, dst_ranks, traffic_sizes, total_ranks)
 		switch2switch_tm = self._rescale_square_matrix(rank2rank_tm, num_switches)
 		## finally, normalize the traffic matrix
-		traffic_sum = sum([sum(x) for x in switch2switch_tm])
-		for i in range(num_switches):
-			for j in range(num_switches):
-				switch2switch_tm[i][j] /= traffic_sum
-		return switch2switch_tm
+		switch2switch_tm = switch2switch_tm / switch2switch_tm.sum()
+		return self._finish_traffic_matrix(switch2switch_tm)
 
 	def to_string(self):
 		name = ""
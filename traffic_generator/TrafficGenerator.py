@@ -1,15 +1,40 @@
+import sys
 import numpy as np
+import scipy.sparse
+sys.path.append('../')
+from traffic_matrix_util import rescale_sparse_square_matrix, group_traffic_matrix
 #import UniformGroupDragonfly
 
 class TrafficGenerator(object):
-	def __init__(self, topology_instance):
+	## sparse - if True, generate_traffic returns a scipy.sparse CSR matrix instead of a dense numpy array
+	def __init__(self, topology_instance, sparse=False):
 		self.topology = topology_instance
+		self.sparse = sparse
 		return
 
+	## Returns an empty num_switches x num_switches traffic matrix to fill in entry by entry with [i, j] : a DOK matrix
+	## when generating sparse traffic, which only stores the entries that are set
+	def _empty_traffic_matrix(self, num_switches):
+		if self.sparse:
+			return scipy.sparse.dok_matrix((num_switches, num_switches))
+		return np.zeros((num_switches, num_switches))
+
+	## Returns the traffic matrix in the representation generate_traffic returns : CSR when generating sparse traffic,
+	## otherwise a dense numpy array
+	def _finish_traffic_matrix(self, traffic_matrix):
+		if self.sparse:
+			return scipy.sparse.csr_matrix(traffic_matrix, dtype=float)
+		if scipy.sparse.issparse(traffic_matrix):
+			return traffic_matrix.toarray()
+		return np.asarray(traffic_matrix, dtype=float)
+
 	'''
 	Given a orig_size x orig_size matrix, rescales it to a new_size x new_size matrix
+	A scipy.sparse matrix is rescaled in sparse form.
 	'''
 	def _rescale_square_matrix(self, orig_matrix, new_size):
+		if scipy.sparse.issparse(orig_matrix):
+			return rescale_sparse_square_matrix(orig_matrix, new_size)
 		orig_size = len(orig_matrix)
 		# if new_size is the same as original size, then do nothing
 		if (new_size == orig_size):
@@ -40,20 +65,20 @@ class TrafficGenerator(object):
 
 	## generates a zero traffic matrix for now
 	def generate_traffic(self):
-		num_switches = topology.get_total_num_switches()
-		traffic_matrix = np.zeros((num_switches, num_switches))
-		return traffic_matrix
+		num_switches = self.topology.get_total_num_switches()
+		traffic_matrix = self._empty_traffic_matrix(num_switches)
+		return self._finish_traffic_matrix(traffic_matrix)
 
+	## traffic_matrix - the switch to switch traffic matrix, dense or scipy.sparse
+	## Returns the dense num_blocks x num_blocks traffic between different blocks
 	def compute_interblock_traffic_from_switch_traffic(self, traffic_matrix, block_to_switches_map):
 		num_blocks = len(block_to_switches_map.keys())
-		block_traffic_matrix = np.zeros((num_blocks, num_blocks))
-		for i in range(num_blocks):
-			for j in range(num_blocks):
-				if i != j:
-					for src_switch in block_to_switches_map[i]:
-						for dst_switch in block_to_switches_map[j]:
-							block_traffic_matrix[i][j] += traffic_matrix[src_switch][dst_switch]
-		return block_traffic_matrix
+		if not scipy.sparse.issparse(traffic_matrix):
+			traffic_matrix = np.asarray(traffic_matrix, dtype=float)
+		switch_block_ids = np.zeros(traffic_matrix.shape[0], dtype=np.int64)
+		for block in range(num_blocks):
+			switch_block_ids[block_to_switches_map[block]] = block
+		return group_traffic_matrix(traffic_matrix, switch_block_ids, num_blocks, exclude_diagonal=True)
 
 	def to_string(self):
 		return "original_traffic_generator"
\ No newline at end of file
@@ -0,0 +1,93 @@
+import numpy as np
+import scipy.sparse
+
+'''
+Traffic matrices are accepted either dense (a list of lists, or a numpy array) or sparse (any scipy.sparse matrix).
+Sparse traffic matrices are kept sparse all the way through, so that memory and time scale with the number of switch
+pairs that actually exchange traffic rather than with num_switches^2 : HPC traces and adversarial patterns only have a
+handful of destinations per switch. A COO triple (rows, columns, values) is turned into one with coo_traffic_matrix.
+'''
+
+## Returns the num_switches x num_switches CSR traffic matrix with the entries values[i] at (rows[i], columns[i]).
+## Repeated (row, column) entries add up.
+def coo_traffic_matrix(rows, columns, values, num_switches):
+	traffic_matrix = scipy.sparse.coo_matrix((np.asarray(values, dtype=float), (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64))), shape=(num_switches, num_switches)).tocsr()
+	traffic_matrix.sum_duplicates()
+	return traffic_matrix
+
+## Returns the traffic matrix as a float numpy array if it is dense, or as a CSR matrix with sorted and unique
+## entries if it is sparse.
+## copy - if True, the returned matrix never shares its data with switch_to_switch_traffic_matrix
+def as_traffic_matrix(switch_to_switch_traffic_matrix, copy=False):
+	if scipy.sparse.issparse(switch_to_switch_traffic_matrix):
+		traffic_matrix = scipy.sparse.csr_matrix(switch_to_switch_traffic_matrix, dtype=float, copy=copy)
+		if not traffic_matrix.has_canonical_format:
+			if not copy:
+				traffic_matrix = traffic_matrix.copy()
+			traffic_matrix.sum_duplicates()
+		return traffic_matrix
+	if copy:
+		return np.array(switch_to_switch_traffic_matrix, dtype=float)
+	return np.asarray(switch_to_switch_traffic_matrix, dtype=float)
+
+## Returns the dense len(rows) x len(columns) block of the traffic matrix
+def submatrix(traffic_matrix, rows, columns):
+	if scipy.sparse.issparse(traffic_matrix):
+		return traffic_matrix[rows][:, columns].toarray()
+	return traffic_matrix[np.ix_(rows, columns)]
+
+## Returns the (rows, columns, values) of the nonzero entries, in row major order
+def nonzero_entries(switch_to_switch_traffic_matrix):
+	traffic_matrix = as_traffic_matrix(switch_to_switch_traffic_matrix)
+	if scipy.sparse.issparse(traffic_matrix):
+		traffic_matrix = traffic_matrix.tocoo()
+		nonzero = traffic_matrix.data != 0.
+		return traffic_matrix.row[nonzero], traffic_matrix.col[nonzero], traffic_matrix.data[nonzero]
+	rows, columns = np.nonzero(traffic_matrix)
+	return rows, columns, traffic_matrix[rows, columns]
+
+## Returns the (rows, columns) of the entries that differ between the two traffic matrices, in row major order
+def changed_entries(traffic_matrix1, traffic_matrix2):
+	if scipy.sparse.issparse(traffic_matrix1) or scipy.sparse.issparse(traffic_matrix2):
+		difference = as_traffic_matrix(scipy.sparse.csr_matrix(traffic_matrix1) - scipy.sparse.csr_matrix(traffic_matrix2))
+		return nonzero_entries(difference)[:2]
+	return np.nonzero(np.asarray(traffic_matrix1) != np.asarray(traffic_matrix2))
+
+## Sums up the columns of the traffic matrix by group : column_groups[j] is the group of column j.
+## Returns the dense (num_rows x num_groups) sums.
+def sum_columns_by_group(traffic_matrix, column_groups, num_groups):
+	num_columns = len(column_groups)
+	group_indicator = scipy.sparse.csr_matrix((np.ones(num_columns), (np.arange(num_columns), column_groups)), shape=(num_columns, num_groups))
+	if scipy.sparse.issparse(traffic_matrix):
+		return traffic_matrix.dot(group_indicator).toarray()
+	## the transposes keep the sparse matrix on the left of the product
+	return np.asarray(group_indicator.T.dot(np.asarray(traffic_matrix).T).T)
+
+## Sums up the traffic between groups of switches : switch_groups[i] is the group of switch i.
+## Returns the dense num_groups x num_groups matrix, without the traffic within every group if exclude_diagonal.
+def group_traffic_matrix(traffic_matrix, switch_groups, num_groups, exclude_diagonal=False):
+	traffic_sent_to_each_group = sum_columns_by_group(traffic_matrix, switch_groups, num_groups)
+	group_traffic = sum_columns_by_group(traffic_sent_to_each_group.T, switch_groups, num_groups).T
+	if exclude_diagonal:
+		np.fill_diagonal(group_traffic, 0.)
+	return group_traffic
+
+## Rescales the sparse orig_size x orig_size traffic matrix to new_size x new_size, like
+## routing_simulation_util.rescale_square_matrix : with ratio = new_size / orig_size, when expanding, entry (i, j) takes
+## the entry (int(i / ratio), int(j / ratio)) divided by ratio^2, and when compressing, entry (i, j) adds up to entry
+## (int(i / ratio), int(j / ratio)). The diagonal is cleared. Returns a CSR matrix.
+def rescale_sparse_square_matrix(orig_matrix, new_size):
+	orig_size = orig_matrix.shape[0]
+	if new_size == orig_size:
+		return orig_matrix
+	if new_size > orig_size:
+		ratio = float(new_size) / float(orig_size)
+		## new entry i comes from the original entry int(i / ratio)
+		spread = scipy.sparse.csr_matrix((np.full(new_size, 1. / ratio), (np.arange(new_size), (np.arange(new_size) / ratio).astype(np.int64))), shape=(new_size, orig_size))
+	else:
+		ratio = float(orig_size) / float(new_size)
+		## original entry i adds up to the new entry int(i / ratio)
+		spread = scipy.sparse.csr_matrix((np.ones(orig_size), ((np.arange(orig_size) / ratio).astype(np.int64), np.arange(orig_size))), shape=(new_size, orig_size))
+	new_matrix = spread.dot(scipy.sparse.csr_matrix(orig_matrix, dtype=float)).dot(spread.T).tocoo()
+	off_diagonal = (new_matrix.row != new_matrix.col) & (new_matrix.data != 0.)
+	return coo_traffic_matrix(new_matrix.row[off_diagonal], new_matrix.col[off_diagonal], new_matrix.data[off_diagonal], new_size)